@@ -4,17 +4,22 @@ from flask_jwt_extended import JWTManager
 from datetime import timedelta
 from config import Config
 from database import db
+from utils.http_cache import finalize_response
+from utils.scheduler import scheduler
+from utils.jobs import job_manager
+from utils.notifications import notification_queue
 
 # Import routes
 from routes.auth import auth_bp
 from routes.employee import employee_bp
 from routes.attendance import attendance_bp
-from routes.timesheet import timesheet_bp
+from routes.timesheet import timesheet_bp, queue_scheduled_drafts
 from routes.leave import leave_bp
 from routes.admin import admin_bp
 from routes.documents import documents_bp
 from routes.payroll import payroll_bp
 from routes.ai import ai_bp
+from routes.reports import reports_bp
 
 
 def create_app():
@@ -30,13 +35,17 @@ def create_app():
         r"/api/*": {
             "origins": ["http://localhost:5173", "http://localhost:5174", "http://127.0.0.1:5173", "http://127.0.0.1:5174"],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+            "expose_headers": ["ETag"],
             "supports_credentials": True
         }
     })
     
     jwt = JWTManager(app)
     
+    # ETag/304 handling and gzip/brotli compression for JSON responses
+    app.after_request(finalize_response)
+    
     # JWT error handlers
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -60,6 +69,36 @@ def create_app():
     app.register_blueprint(documents_bp, url_prefix='/api/documents')
     app.register_blueprint(payroll_bp, url_prefix='/api/payroll')
     app.register_blueprint(ai_bp, url_prefix='/api/ai')
+    app.register_blueprint(reports_bp, url_prefix='/api/reports')
+    
+    # Scheduled tasks; the thread starts with the first request, so CLI commands don't run it
+    scheduler.daily('draft_timesheets', Config.DRAFT_TIMESHEETS_AT, queue_scheduled_drafts)
+    scheduler.every('job_heartbeat', Config.JOB_HEARTBEAT_SECONDS, job_manager.heartbeat)
+    scheduler.every('recover_stale_jobs', Config.JOB_RECOVERY_INTERVAL, job_manager.recover_stale_jobs)
+    scheduler.every('redeliver_notifications', Config.NOTIFICATION_RETRY_MINUTES * 60, notification_queue.redeliver_pending)
+    if Config.SCHEDULER_ENABLED:
+        app.before_request(scheduler.start)
+    
+    # Manual or external cron entry point: `flask --app app:create_app draft-timesheets`
+    @app.cli.command('draft-timesheets')
+    def draft_timesheets_command():
+        """Pre-aggregate this week's attendance into draft timesheets"""
+        from routes.timesheet import draft_timesheets
+        print(draft_timesheets())
+    
+    # One-off migration: `flask --app app:create_app backfill-managers`
+    @app.cli.command('backfill-managers')
+    def backfill_managers_command():
+        """Assign unassigned employees and their leaves to a manager from timesheet history"""
+        from utils.managers import backfill_manager_ids
+        print(backfill_manager_ids())
+    
+    # One-off migration: `flask --app app:create_app seed-leave-balances`
+    @app.cli.command('seed-leave-balances')
+    def seed_leave_balances_command():
+        """Open ledger balances for employees that have none, consuming their approved leaves"""
+        from utils.leave_ledger import seed_balances
+        print(seed_balances())
     
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
@@ -91,4 +130,5 @@ if __name__ == '__main__':
     print("  - Timesheet: /api/timesheet (submit, status, history, manager/*)")
     print("  - Leave: /api/leave (apply, my-leaves, admin/*)")
     print("  - Admin: /api/admin (employees, attendance, dashboard)")
+    print("  - Reports: /api/reports (background report jobs)")
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -19,11 +19,66 @@ class Config:
     EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
     EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
     
+    NOTIFICATION_WORKERS = 2  # background threads sending emails
+    NOTIFICATION_RETRY_MINUTES = 10  # unsent outbox entries older than this are queued again
+    NOTIFICATION_RETENTION_DAYS = 7  # outbox entries are kept this long
+    
     # Google Cloud Storage Configuration
     GCS_PROJECT_ID = os.getenv('x-goog-project-id')
     GCS_SERVICE_ACCOUNT = os.getenv('google_cloud_storage_account')
     GCS_BUCKET_NAME = 'hrms-documents-bucket'
     
+    # Leave entitlements (opening balance) and default monthly accrual, in days
+    LEAVE_ENTITLEMENTS = {'paid_leave': 12, 'sick_leave': 6, 'unpaid_leave': 10}
+    LEAVE_MONTHLY_ACCRUAL = {'paid_leave': 1, 'sick_leave': 0.5}
+    
+    # Holiday calendars
+    DEFAULT_LOCATION = 'default'
+    HOLIDAY_CACHE_TTL = 3600  # seconds a compiled year calendar is reused
+    HOLIDAY_VERSION_CHECK_INTERVAL = 10  # seconds between checks for holiday changes made by other processes
+    MANAGER_CACHE_TTL = 300  # seconds the active managers list is reused
+    
+    # Response compression (bodies smaller than this are sent as-is)
+    COMPRESSION_MIN_SIZE = 1024
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+    
+    # Background jobs
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_MODULES = ['routes.reports', 'routes.timesheet', 'routes.payroll']  # modules that register job builders
+    JOB_HEARTBEAT_SECONDS = 60  # how often a process marks the jobs it owns as alive
+    JOB_STALE_MINUTES = 5  # jobs without a heartbeat for this long are requeued
+    JOB_RECOVERY_INTERVAL = 300  # seconds between stale job checks
+    JOB_PROGRESS_INTERVAL = 500  # rows between progress updates
+    JOB_RESULT_CHUNK_SIZE = 255 * 1024
+    
+    # Scheduled tasks (run by a background thread in each web process)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_POLL_SECONDS = 60
+    DRAFT_TIMESHEETS_AT = os.getenv('DRAFT_TIMESHEETS_AT', '01:00')  # local time of the nightly draft run
+    
+    # Payroll runs
+    PAYROLL_INSERT_CHUNK_SIZE = 1000  # payslips per insert_many
+    PAYROLL_PRERENDER_PDFS = True  # render payslip PDFs at the end of a payroll run
+    PAYROLL_PRORATE_ABSENCES = os.getenv('PAYROLL_PRORATE_ABSENCES', 'false').lower() == 'true'  # deduct unrecorded working days
+    PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', 2))
+    PDF_RENDER_TIMEOUT = 30  # seconds
+    MAX_PAYMENT_FILE_ROWS = 100000
+    EXPORT_BATCH_SIZE = 2000  # cursor batch size for streaming exports
+    COMPENSATION_TABLE_TTL = 900  # seconds the what-if salary table is reused
+    
+    # AI assistant
+    AI_CONTEXT_TTL = 300  # seconds a role/subject context is reused between chat turns
+    AI_CONTEXT_MAX_ENTRIES = 2048
+    AI_CONTEXT_TOKEN_BUDGET = int(os.getenv('AI_CONTEXT_TOKEN_BUDGET', 1500))  # estimated tokens of chat context
+    AI_INSIGHTS_TOKEN_BUDGET = int(os.getenv('AI_INSIGHTS_TOKEN_BUDGET', 3000))  # estimated tokens of insights data
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 3600))
+    LLM_CACHE_MAX_ENTRIES = 512
+    LLM_CACHE_MAX_TEMPERATURE = 0.5  # higher-temperature requests are not cached by default
+    LLM_CACHE_HIGH_TEMPERATURE = os.getenv('LLM_CACHE_HIGH_TEMPERATURE', 'false').lower() == 'true'
+    LLM_CACHE_SHARED = os.getenv('LLM_CACHE_SHARED', 'false').lower() == 'true'  # share responses across processes via MongoDB
+    
     # Security
     BCRYPT_ROUNDS = 12
     OTP_EXPIRY_MINUTES = 10
@@ -1,6 +1,7 @@
 from pymongo import MongoClient
-from pymongo.errors import CollectionInvalid, ServerSelectionTimeoutError, ConfigurationError
+from pymongo.errors import CollectionInvalid, ServerSelectionTimeoutError, ConfigurationError, OperationFailure
 import certifi
+import multiprocessing
 import ssl
 import os
 from config import Config
@@ -32,7 +33,10 @@ class Database:
                 cls._client.admin.command('ping')
                 print("Successfully connected to MongoDB!")
                 cls._db = cls._client[Config.DATABASE_NAME]
-                cls._instance._initialize_collections()
+                # Schema, indexes and seed accounts are set up once by the main
+                # process; spawned pool workers (jobs, PDF rendering) only connect
+                if multiprocessing.parent_process() is None:
+                    cls._instance._initialize_collections()
             except (ServerSelectionTimeoutError, ConfigurationError) as e:
                 print(f"MongoDB connection failed: {e}")
                 print("\n=== TROUBLESHOOTING ===")
@@ -69,6 +73,8 @@ class Database:
                             'is_verified': {'bsonType': 'bool'},
                             'name': {'bsonType': 'string'},
                             'department': {'bsonType': 'string'},
+                            'manager_id': {'bsonType': ['string', 'null']},
+                            'location': {'bsonType': ['string', 'null']},
                             'phone': {'bsonType': 'string'},
                             'address': {'bsonType': 'string'},
                             'job_title': {'bsonType': 'string'},
@@ -126,7 +132,7 @@ class Database:
                             'week_end': {'bsonType': 'string'},
                             'manager_id': {'bsonType': ['string', 'null']},
                             'manager_name': {'bsonType': ['string', 'null']},
-                            'status': {'enum': ['pending', 'approved', 'rejected']},
+                            'status': {'enum': ['draft', 'pending', 'approved', 'rejected']},
                             'total_hours': {'bsonType': ['double', 'int', 'long']},
                             'attendance_records': {'bsonType': 'array'},
                             'submitted_at': {'bsonType': ['date', 'null']},
@@ -148,7 +154,10 @@ class Database:
                             'start_date': {'bsonType': 'string'},
                             'end_date': {'bsonType': 'string'},
                             'reason': {'bsonType': ['string', 'null']},
-                            'status': {'enum': ['Pending', 'Approved', 'Rejected']},
+                            'days': {'bsonType': ['double', 'int', 'long', 'null']},
+                            'department': {'bsonType': ['string', 'null']},
+                            'manager_id': {'bsonType': ['string', 'null']},
+                            'status': {'enum': ['Pending', 'Approved', 'Rejected', 'Cancelled']},
                             'comment': {'bsonType': ['string', 'null']},
                             'created_at': {'bsonType': ['date', 'null']},
                             'updated_at': {'bsonType': ['date', 'null']}
@@ -205,6 +214,12 @@ class Database:
         # Users indexes
         self._db.users.create_index('email', unique=True)
         self._db.users.create_index('employee_id', unique=True, sparse=True)
+        # Keyset pagination over the employee directory
+        self._db.users.create_index([('role', 1), ('name', 1), ('_id', 1)])
+        self._db.users.create_index([('role', 1), ('employee_id', 1), ('_id', 1)])
+        self._db.users.create_index([('manager_id', 1), ('role', 1)])
+        # Payroll summaries group employees by department over their salary
+        self._db.users.create_index([('role', 1), ('department', 1), ('salary.net', 1)])
         
         # OTP indexes
         self._db.otp_verifications.create_index('email')
@@ -213,20 +228,90 @@ class Database:
         # Attendance indexes
         self._db.attendance.create_index([('employee_id', 1), ('date', 1)], unique=True)
         self._db.attendance.create_index('week_start')
+        # Month-wide status rollups for payroll proration
+        self._db.attendance.create_index([('date', 1), ('employee_id', 1), ('status', 1)])
         
         # Timesheets indexes
         self._db.timesheets.create_index([('employee_id', 1), ('week_start', 1)], unique=True)
+        # Covers the current/previous week eligibility lookup
+        self._db.timesheets.create_index([('employee_id', 1), ('week_start', 1), ('status', 1)])
         self._db.timesheets.create_index('manager_id')
         self._db.timesheets.create_index('status')
         
         # Leaves indexes
         self._db.leaves.create_index('employee_id')
         self._db.leaves.create_index('status')
+        # Pending queues: keyset pagination on created_at, optionally scoped by team
+        self._db.leaves.create_index([('status', 1), ('created_at', -1), ('_id', -1)])
+        self._db.leaves.create_index([('status', 1), ('manager_id', 1), ('created_at', -1), ('_id', -1)])
+        self._db.leaves.create_index([('status', 1), ('department', 1), ('created_at', -1), ('_id', -1)])
+        # Latest leave requests (AI admin context)
+        self._db.leaves.create_index([('created_at', -1)])
+        # Per-employee interval index for overlap checks
+        self._db.leaves.create_index([('employee_id', 1), ('start_date', 1), ('end_date', 1), ('status', 1)])
+        
+        # Payslips indexes (one payslip per employee and month)
+        if 'employee_id_1_month_year_1' not in self._db.payslips.index_information():
+            self._dedupe_payslips()
+        try:
+            self._db.payslips.create_index([('employee_id', 1), ('month_year', 1)], unique=True)
+        except OperationFailure as e:
+            print(f"Could not create unique payslip index, duplicates remain: {e}")
+        self._db.payslips.create_index([('month_year', 1), ('status', 1)])
+        # Register export walks a month in employee order
+        self._db.payslips.create_index([('month_year', 1), ('employee_id', 1)])
+        
+        # Cached payslip PDFs (GridFS indexes filename itself)
+        self._db['payslip_pdfs.files'].create_index('metadata.payslip_id')
+        
+        # Leave ledger indexes
+        self._db.leave_ledger.create_index('entry_key', unique=True)
+        self._db.leave_ledger.create_index([('employee_id', 1), ('created_at', -1)])
+        self._db.leave_balances.create_index('employee_id', unique=True)
+        
+        # Holidays indexes
+        self._db.holidays.create_index([('location', 1), ('date', 1)], unique=True)
+        self._db.holidays.create_index('date')
+        
+        # Jobs indexes
+        self._db.jobs.create_index([('type', 1), ('created_at', -1)])
+        self._db.jobs.create_index([('status', 1), ('heartbeat_at', 1)])
+        
+        # Notification outbox
+        self._db.notifications.create_index([('status', 1), ('queued_at', 1)])
+        self._db.notifications.create_index('created_at', expireAfterSeconds=Config.NOTIFICATION_RETENTION_DAYS * 86400)
+        
+        # Shared LLM response cache
+        self._db.llm_cache.create_index('expires_at', expireAfterSeconds=0)
         
         # Managers indexes
         self._db.managers.create_index('manager_id', unique=True)
         self._db.managers.create_index('email', unique=True)
 
+    def _dedupe_payslips(self):
+        """Remove duplicate payslips left by the old check-then-insert generation.
+
+        Runs once, before the unique (employee_id, month_year) index exists.
+        Per employee and month the paid payslip is kept, otherwise the most
+        recently created one.
+        """
+        duplicates = self._db.payslips.aggregate([
+            {'$sort': {'employee_id': 1, 'month_year': 1, 'paid_on': -1, 'created_at': -1}},
+            {'$group': {
+                '_id': {'employee_id': '$employee_id', 'month_year': '$month_year'},
+                'ids': {'$push': '$_id'},
+                'count': {'$sum': 1}
+            }},
+            {'$match': {'count': {'$gt': 1}}}
+        ], allowDiskUse=True)
+        
+        removed = 0
+        for group in duplicates:
+            result = self._db.payslips.delete_many({'_id': {'$in': group['ids'][1:]}})
+            removed += result.deleted_count
+        if removed:
+            print(f"Removed {removed} duplicate payslips")
+
     def _initialize_managers(self):
         """Initialize default managers if they don't exist"""
         import bcrypt
@@ -2,8 +2,17 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 import bcrypt
+import json
 from database import db
 from config import Config
+from utils.cache import TTLCache
+from utils.pagination import paginate, page_limit, InvalidCursor, InvalidLimit
+from utils.work_calendar import count_working_days, invalidate_calendars
+from utils.http_cache import bump_version
+from utils.ai_context import invalidate_ai_context
+from utils.managers import restamp_leaves, backfill_manager_ids
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -20,10 +29,40 @@ def admin_required(f):
     return decorated_function
 
 
+# Directory fields a client may request with ?fields=, mapped to the Mongo
+# projection needed to produce them. Salary and the raw documents array are
+# deliberately not exposed here; use GET /employees/<id> for full details.
+EMPLOYEE_LIST_FIELDS = {
+    'employee_id': {'employee_id': 1},
+    'name': {'name': 1},
+    'email': {'email': 1},
+    'department': {'department': 1},
+    'job_title': {'job_title': 1},
+    'phone': {'phone': 1},
+    'status': {'is_verified': 1},
+    'is_verified': {'is_verified': 1},
+    'profile_picture': {'profile_picture': 1},
+    'document_count': {'document_count': {'$size': {'$ifNull': ['$documents', []]}}},
+    'pending_doc_requests': {},
+    'created_at': {'created_at': 1}
+}
+
+EMPLOYEE_SORT_KEYS = ['name', 'employee_id']
+
+# Cached directory totals keyed by the normalized query
+employee_count_cache = TTLCache(ttl=60, max_entries=256)
+
+
+def _employee_count(query):
+    """Total employees matching query, served from a short-lived counter cache"""
+    key = json.dumps(query, sort_keys=True, default=str)
+    return employee_count_cache.get_or_set(key, lambda: db.users.count_documents(query))
+
+
 @admin_bp.route('/employees', methods=['GET'])
 @jwt_required()
 def get_all_employees():
-    """Get all employees"""
+    """Get employees (keyset-paginated, with optional sparse fieldsets)"""
     try:
         identity = get_jwt_identity()
         
@@ -32,7 +71,31 @@ def get_all_employees():
         
         search = request.args.get('search', '')
         department = request.args.get('department', '')
-        limit = int(request.args.get('limit', 100))
+        try:
+            limit = page_limit(request.args.get('limit'), 100, 500)
+        except InvalidLimit as e:
+            return jsonify({'error': str(e)}), 400
+        cursor = request.args.get('cursor')
+        sort_by = request.args.get('sort', 'name')
+        include_total = request.args.get('count', '').lower() in ['1', 'true', 'yes']
+        
+        if sort_by not in EMPLOYEE_SORT_KEYS:
+            return jsonify({'error': f'Invalid sort. Must be one of: {", ".join(EMPLOYEE_SORT_KEYS)}'}), 400
+        
+        fields_param = request.args.get('fields', '')
+        if fields_param:
+            fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+            unknown = [f for f in fields if f not in EMPLOYEE_LIST_FIELDS]
+            if unknown:
+                return jsonify({'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+            if 'employee_id' not in fields:
+                fields.insert(0, 'employee_id')
+        else:
+            fields = list(EMPLOYEE_LIST_FIELDS.keys())
+        
+        projection = {'employee_id': 1, sort_by: 1}
+        for field in fields:
+            projection.update(EMPLOYEE_LIST_FIELDS[field])
         
         query = {'role': 'employee'}
         
@@ -46,36 +109,49 @@ def get_all_employees():
         if department:
             query['department'] = department
         
-        employees = list(db.users.find(query).limit(limit))
+        try:
+            employees, next_cursor = paginate(
+                db.users, query, sort_by, limit, cursor=cursor, projection=projection
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Count pending document requests for the whole page in one query
+        pending_counts = {}
+        if 'pending_doc_requests' in fields and employees:
+            pending_counts = {
+                row['_id']: row['count'] for row in db.document_requests.aggregate([
+                    {'$match': {
+                        'employee_id': {'$in': [e['employee_id'] for e in employees]},
+                        'status': 'pending'
+                    }},
+                    {'$group': {'_id': '$employee_id', 'count': {'$sum': 1}}}
+                ])
+            }
         
         result = []
         for emp in employees:
-            # Count documents for this employee
-            documents = emp.get('documents', [])
-            doc_count = len(documents) if documents else 0
-            
-            # Count pending document requests
-            pending_requests = db.document_requests.count_documents({
-                'employee_id': emp['employee_id'],
-                'status': 'pending'
-            })
-            
-            result.append({
+            row = {
                 'employee_id': emp['employee_id'],
                 'name': emp.get('name', ''),
-                'email': emp['email'],
+                'email': emp.get('email', ''),
                 'department': emp.get('department', ''),
                 'job_title': emp.get('job_title', ''),
                 'phone': emp.get('phone', ''),
                 'status': 'Active' if emp.get('is_verified') else 'Pending',
                 'is_verified': emp.get('is_verified', False),
                 'profile_picture': emp.get('profile_picture', ''),
-                'document_count': doc_count,
-                'pending_doc_requests': pending_requests,
+                'document_count': emp.get('document_count', 0),
+                'pending_doc_requests': pending_counts.get(emp['employee_id'], 0),
                 'created_at': emp.get('created_at').isoformat() if emp.get('created_at') else None
-            })
+            }
+            result.append({field: row[field] for field in fields})
+        
+        response = {'employees': result, 'next_cursor': next_cursor}
+        if include_total:
+            response['total'] = _employee_count(query)
         
-        return jsonify({'employees': result}), 200
+        return jsonify(response), 200
         
     except Exception as e:
         print(f"Get employees error: {e}")
@@ -148,7 +224,7 @@ def update_employee(employee_id):
         data = request.get_json()
         
         # Fields that admin can update
-        allowed_fields = ['name', 'department', 'job_title', 'phone', 'address', 'salary']
+        allowed_fields = ['name', 'department', 'manager_id', 'location', 'job_title', 'phone', 'address', 'salary']
         update_data = {}
         
         for field in allowed_fields:
@@ -167,6 +243,11 @@ def update_employee(employee_id):
         
         if result.matched_count == 0:
             return jsonify({'error': 'Employee not found'}), 404
+        if 'manager_id' in update_data:
+            # Pending leaves move to the new manager's queue
+            restamp_leaves(employee_id, update_data['manager_id'])
+        bump_version('users')
+        invalidate_ai_context([employee_id])
         
         return jsonify({'message': 'Employee updated successfully'}), 200
         
@@ -209,6 +290,8 @@ def update_salary(employee_id):
         
         if result.matched_count == 0:
             return jsonify({'error': 'Employee not found'}), 404
+        bump_version('users')
+        invalidate_ai_context([employee_id])
         
         return jsonify({'message': 'Salary updated successfully'}), 200
         
@@ -217,6 +300,47 @@ def update_salary(employee_id):
         return jsonify({'error': 'An error occurred'}), 500
 
 
+def build_attendance_query(date=None, employee_id=None, start_date=None, end_date=None):
+    """Build the attendance filter shared by the admin list and reports"""
+    query = {}
+    
+    if date:
+        query['date'] = date
+    elif start_date or end_date:
+        query['date'] = {}
+        if start_date:
+            query['date']['$gte'] = start_date
+        if end_date:
+            query['date']['$lte'] = end_date
+    
+    if employee_id:
+        query['employee_id'] = employee_id
+    
+    return query
+
+
+def format_attendance_record(record, employee_names):
+    """Serialize an attendance record for admin views"""
+    return {
+        'employee_id': record['employee_id'],
+        'employee_name': employee_names.get(record['employee_id'], 'Unknown'),
+        'date': record['date'],
+        'check_in': record.get('check_in'),
+        'check_out': record.get('check_out'),
+        'total_hours': record.get('total_hours', 0),
+        'status': record.get('status', 'Absent'),
+        'mode': record.get('mode', '')
+    }
+
+
+def get_employee_names(employee_ids):
+    """Map employee IDs to names with a single projected query"""
+    return {
+        e['employee_id']: e.get('name', '')
+        for e in db.users.find({'employee_id': {'$in': list(employee_ids)}}, {'employee_id': 1, 'name': 1})
+    }
+
+
 @admin_bp.route('/attendance/all', methods=['GET'])
 @jwt_required()
 def get_all_attendance():
@@ -231,32 +355,14 @@ def get_all_attendance():
         employee_id = request.args.get('employee_id')
         limit = int(request.args.get('limit', 100))
         
-        query = {}
-        
-        if date:
-            query['date'] = date
-        
-        if employee_id:
-            query['employee_id'] = employee_id
+        query = build_attendance_query(date=date, employee_id=employee_id)
         
         attendance_records = list(db.attendance.find(query).sort('date', -1).limit(limit))
         
         # Get employee names
-        employee_ids = list(set(a['employee_id'] for a in attendance_records))
-        employees = {e['employee_id']: e['name'] for e in db.users.find({'employee_id': {'$in': employee_ids}})}
+        employees = get_employee_names(set(a['employee_id'] for a in attendance_records))
         
-        result = []
-        for record in attendance_records:
-            result.append({
-                'employee_id': record['employee_id'],
-                'employee_name': employees.get(record['employee_id'], 'Unknown'),
-                'date': record['date'],
-                'check_in': record.get('check_in'),
-                'check_out': record.get('check_out'),
-                'total_hours': record.get('total_hours', 0),
-                'status': record.get('status', 'Absent'),
-                'mode': record.get('mode', '')
-            })
+        result = [format_attendance_record(record, employees) for record in attendance_records]
         
         return jsonify({'attendance': result}), 200
         
@@ -323,3 +429,145 @@ def get_departments():
     except Exception as e:
         print(f"Get departments error: {e}")
         return jsonify({'error': 'An error occurred'}), 500
+
+
+@admin_bp.route('/holidays', methods=['GET'])
+@jwt_required()
+def get_holidays_list():
+    """List holidays for a year and location"""
+    try:
+        year = request.args.get('year', str(datetime.now().year))
+        location = request.args.get('location')
+        
+        query = {'date': {'$gte': f'{year}-01-01', '$lte': f'{year}-12-31'}}
+        if location:
+            query['location'] = {'$in': [location, None]}
+        
+        holidays = db.holidays.find(query).sort('date', 1)
+        
+        return jsonify({'holidays': [{
+            'id': str(h['_id']),
+            'date': h['date'],
+            'name': h.get('name', ''),
+            'location': h.get('location')
+        } for h in holidays]}), 200
+        
+    except Exception as e:
+        print(f"Get holidays error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@admin_bp.route('/holidays', methods=['POST'])
+@jwt_required()
+def add_holiday():
+    """Add a public holiday (omit location for a company-wide holiday)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        data = request.get_json() or {}
+        date = data.get('date')
+        name = data.get('name', '').strip()
+        location = data.get('location') or None
+        
+        if not date or not name:
+            return jsonify({'error': 'Date and name are required'}), 400
+        
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        try:
+            result = db.holidays.insert_one({
+                'date': date,
+                'name': name,
+                'location': location,
+                'created_at': datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            return jsonify({'error': f'A holiday already exists on {date} for this location'}), 400
+        
+        invalidate_calendars()
+        
+        return jsonify({'message': 'Holiday added successfully', 'id': str(result.inserted_id)}), 201
+        
+    except Exception as e:
+        print(f"Add holiday error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@admin_bp.route('/holidays/<holiday_id>', methods=['DELETE'])
+@jwt_required()
+def delete_holiday(holiday_id):
+    """Remove a holiday"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        result = db.holidays.delete_one({'_id': ObjectId(holiday_id)})
+        
+        if result.deleted_count == 0:
+            return jsonify({'error': 'Holiday not found'}), 404
+        
+        invalidate_calendars()
+        
+        return jsonify({'message': 'Holiday deleted successfully'}), 200
+        
+    except Exception as e:
+        print(f"Delete holiday error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@admin_bp.route('/working-days', methods=['GET'])
+@jwt_required()
+def get_working_days():
+    """Count working days between two dates for a location"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        location = request.args.get('location')
+        
+        if not start_date or not end_date:
+            return jsonify({'error': 'Start date and end date are required'}), 400
+        
+        try:
+            working_days = count_working_days(start_date, end_date, location)
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        return jsonify({
+            'start_date': start_date,
+            'end_date': end_date,
+            'location': location or Config.DEFAULT_LOCATION,
+            'working_days': working_days
+        }), 200
+        
+    except Exception as e:
+        print(f"Get working days error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@admin_bp.route('/managers/backfill', methods=['POST'])
+@jwt_required()
+def backfill_managers():
+    """Assign unassigned employees to the manager of their latest timesheet (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        result = backfill_manager_ids()
+        if result['users_assigned']:
+            bump_version('users')
+        
+        return jsonify({'message': 'Manager assignments backfilled', **result}), 200
+        
+    except Exception as e:
+        print(f"Backfill managers error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
@@ -1,8 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import json
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from database import db
+from config import Config
 from utils.azure_openai import azure_openai_service
+from utils.leave_ledger import get_balance
+from utils.ai_context import cached_context
+from utils.prompt_context import prompt_usage
 
 ai_bp = Blueprint('ai', __name__)
 
@@ -23,11 +28,7 @@ def get_employee_context(employee_id):
             'date_of_joining': user.get('date_of_joining', '')
         }
         context['salary'] = user.get('salary', {})
-        context['leave_balance'] = user.get('leave_balance', {
-            'paid_leave': 12,
-            'sick_leave': 6,
-            'unpaid_leave': 10
-        })
+        context['leave_balance'] = get_balance(employee_id)
     
     # Get recent attendance (last 30 days)
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
@@ -63,16 +64,12 @@ def get_manager_context(manager_id):
     """Get context data for a manager (team data)"""
     context = {}
     
-    # Get manager info
-    manager = db.users.find_one({'employee_id': manager_id})
-    if not manager:
+    if not manager_id:
         return context
     
-    manager_department = manager.get('department', '')
-    
-    # Get team members (employees in same department)
+    # Get team members (employees assigned to this manager)
     team_members = list(db.users.find({
-        'department': manager_department,
+        'manager_id': manager_id,
         'role': 'employee'
     }))
     
@@ -125,68 +122,103 @@ def get_manager_context(manager_id):
     return context
 
 
+RECENT_LEAVE_REQUESTS = 10
+
+
+def admin_context_pipeline(attendance_since):
+    """One pipeline over users, attendance and leaves returning only counts and top-N rows.
+
+    Each collection is reduced inside its own branch (employees per
+    department, attendance and leave status counts, the latest leave
+    requests), then $facet splits the few resulting rows into one document.
+    """
+    return [
+        {'$match': {'role': 'employee'}},
+        {'$group': {
+            '_id': {'$ifNull': ['$department', '']},
+            'employees': {'$sum': 1},
+            'configured': {'$sum': {'$cond': [{'$gt': ['$salary.net', 0]}, 1, 0]}},
+            'total_net': {'$sum': {'$cond': [{'$gt': ['$salary.net', 0]}, '$salary.net', 0]}}
+        }},
+        {'$set': {'_src': 'department'}},
+        {'$unionWith': {'coll': 'attendance', 'pipeline': [
+            {'$match': {'date': {'$gte': attendance_since}}},
+            {'$group': {'_id': '$status', 'count': {'$sum': 1}}},
+            {'$set': {'_src': 'attendance'}}
+        ]}},
+        {'$unionWith': {'coll': 'leaves', 'pipeline': [
+            {'$group': {'_id': '$status', 'count': {'$sum': 1}}},
+            {'$set': {'_src': 'leave_status'}}
+        ]}},
+        {'$unionWith': {'coll': 'leaves', 'pipeline': [
+            {'$sort': {'created_at': -1}},
+            {'$limit': RECENT_LEAVE_REQUESTS},
+            {'$project': {'_id': 0, 'employee_id': 1, 'leave_type': 1, 'status': 1, 'start_date': 1, 'created_at': 1}},
+            {'$set': {'_src': 'recent_leave'}}
+        ]}},
+        {'$facet': {
+            'departments': [{'$match': {'_src': 'department'}}, {'$sort': {'total_net': -1}}],
+            'attendance': [{'$match': {'_src': 'attendance'}}],
+            'leaves': [{'$match': {'_src': 'leave_status'}}],
+            'recent_leaves': [{'$match': {'_src': 'recent_leave'}}, {'$sort': {'created_at': -1}}]
+        }}
+    ]
+
+
 def get_admin_context():
     """Get context data for admin (organization-wide)"""
     context = {}
     
-    # Total employees
-    total_employees = db.users.count_documents({'role': 'employee'})
-    context['total_employees'] = total_employees
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    result = next(db.users.aggregate(admin_context_pipeline(thirty_days_ago.strftime('%Y-%m-%d'))))
     
-    # Get departments
-    departments = db.users.distinct('department', {'role': 'employee'})
-    context['departments'] = [d for d in departments if d]
+    # Employees and departments
+    departments = result['departments']
+    context['total_employees'] = sum(d['employees'] for d in departments)
+    context['departments'] = [d['_id'] for d in departments if d['_id']]
     
     # Attendance summary (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    attendance = list(db.attendance.find({
-        'date': {'$gte': thirty_days_ago.strftime('%Y-%m-%d')}
-    }))
-    
-    present_count = sum(1 for a in attendance if a.get('status') == 'Present')
-    absent_count = sum(1 for a in attendance if a.get('status') == 'Absent')
+    attendance = {row['_id']: row['count'] for row in result['attendance']}
+    total_records = sum(attendance.values())
+    present_count = attendance.get('Present', 0)
     
     context['attendance_summary'] = {
-        'total_records': len(attendance),
+        'total_records': total_records,
         'present': present_count,
-        'absent': absent_count,
-        'attendance_rate': round(present_count / len(attendance) * 100, 1) if attendance else 0
+        'absent': attendance.get('Absent', 0),
+        'attendance_rate': round(present_count / total_records * 100, 1) if total_records else 0
     }
     
     # Leave summary
-    all_leaves = list(db.leaves.find({}))
-    pending_leaves = sum(1 for l in all_leaves if l.get('status') == 'Pending')
-    approved_leaves = sum(1 for l in all_leaves if l.get('status') == 'Approved')
-    rejected_leaves = sum(1 for l in all_leaves if l.get('status') == 'Rejected')
+    leaves = {row['_id']: row['count'] for row in result['leaves']}
     
     context['leave_summary'] = {
-        'total': len(all_leaves),
-        'pending': pending_leaves,
-        'approved': approved_leaves,
-        'rejected': rejected_leaves
+        'total': sum(leaves.values()),
+        'pending': leaves.get('Pending', 0),
+        'approved': leaves.get('Approved', 0),
+        'rejected': leaves.get('Rejected', 0)
     }
     
     # Payroll summary
-    employees_with_salary = list(db.users.find({
-        'role': 'employee',
-        'salary.net': {'$exists': True, '$gt': 0}
-    }))
-    
-    total_payroll = sum(e.get('salary', {}).get('net', 0) for e in employees_with_salary)
+    configured = sum(d['configured'] for d in departments)
+    total_payroll = sum(d['total_net'] for d in departments)
     context['payroll_summary'] = {
-        'employees_configured': len(employees_with_salary),
+        'employees_configured': configured,
         'total': total_payroll,
-        'average': round(total_payroll / len(employees_with_salary), 0) if employees_with_salary else 0
+        'average': round(total_payroll / configured, 0) if configured else 0,
+        'by_department': [
+            {'department': d['_id'], 'employees': d['configured'], 'total': d['total_net']}
+            for d in departments if d['configured']
+        ]
     }
     
     # Recent activities
-    recent_leaves = list(db.leaves.find({}).sort('created_at', -1).limit(10))
     context['recent_leave_requests'] = [{
         'employee_id': l.get('employee_id'),
         'leave_type': l.get('leave_type'),
         'status': l.get('status'),
         'start_date': l.get('start_date')
-    } for l in recent_leaves]
+    } for l in result['recent_leaves']]
     
     return context
 
@@ -199,6 +231,7 @@ def ai_chat():
         identity = get_jwt_identity()
         role = identity.get('role', 'employee')
         employee_id = identity.get('employee_id')
+        manager_id = identity.get('manager_id')
         
         data = request.get_json()
         user_message = data.get('message', '')
@@ -206,13 +239,13 @@ def ai_chat():
         if not user_message:
             return jsonify({'error': 'Message is required'}), 400
         
-        # Get context based on role
+        # Get context based on role (cached between chat turns)
         if role == 'admin':
-            context = get_admin_context()
+            context = cached_context('admin', None, get_admin_context)
         elif role == 'manager':
-            context = get_manager_context(employee_id)
+            context = cached_context('manager', manager_id, lambda: get_manager_context(manager_id))
         else:
-            context = get_employee_context(employee_id)
+            context = cached_context('employee', employee_id, lambda: get_employee_context(employee_id))
         
         # Get AI response
         response = azure_openai_service.get_hr_assistant_response(
@@ -226,7 +259,8 @@ def ai_chat():
         
         return jsonify({
             'response': response.get('content', ''),
-            'usage': response.get('usage', {})
+            'usage': response.get('usage', {}),
+            'cached': response.get('cached', False)
         }), 200
         
     except Exception as e:
@@ -234,6 +268,66 @@ def ai_chat():
         return jsonify({'error': str(e)}), 500
 
 
+def sse_event(data, event=None):
+    """Format one Server-Sent Events message"""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(data)}\n\n'
+
+
+@ai_bp.route('/chat/stream', methods=['POST'])
+@jwt_required()
+def ai_chat_stream():
+    """AI chat endpoint streaming the reply as Server-Sent Events"""
+    try:
+        identity = get_jwt_identity()
+        role = identity.get('role', 'employee')
+        employee_id = identity.get('employee_id')
+        manager_id = identity.get('manager_id')
+        
+        data = request.get_json()
+        user_message = data.get('message', '')
+        
+        if not user_message:
+            return jsonify({'error': 'Message is required'}), 400
+        
+        if not azure_openai_service.client:
+            return jsonify({'error': 'Azure OpenAI client not initialized'}), 503
+        
+        # Get context based on role (cached between chat turns)
+        if role == 'admin':
+            context = cached_context('admin', None, get_admin_context)
+        elif role == 'manager':
+            context = cached_context('manager', manager_id, lambda: get_manager_context(manager_id))
+        else:
+            context = cached_context('employee', employee_id, lambda: get_employee_context(employee_id))
+        
+        def generate():
+            deltas = azure_openai_service.stream_hr_assistant_response(
+                user_query=user_message,
+                context_data=context,
+                role=role
+            )
+            try:
+                for delta in deltas:
+                    yield sse_event({'delta': delta})
+                yield sse_event({}, event='done')
+            except Exception as e:
+                print(f"AI chat stream error: {e}")
+                yield sse_event({'error': 'The response was interrupted'}, event='error')
+            finally:
+                # Runs on client disconnect too, releasing the upstream connection
+                deltas.close()
+        
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+        
+    except Exception as e:
+        print(f"AI chat stream error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
 @ai_bp.route('/insights', methods=['POST'])
 @jwt_required()
 def generate_insights():
@@ -242,6 +336,7 @@ def generate_insights():
         identity = get_jwt_identity()
         role = identity.get('role', 'employee')
         employee_id = identity.get('employee_id')
+        manager_id = identity.get('manager_id')
         
         if role not in ['admin', 'manager']:
             return jsonify({'error': 'Admin or Manager access required'}), 403
@@ -251,9 +346,9 @@ def generate_insights():
         
         # Get data based on role
         if role == 'admin':
-            context = get_admin_context()
+            context = cached_context('admin', None, get_admin_context)
         else:
-            context = get_manager_context(employee_id)
+            context = cached_context('manager', manager_id, lambda: get_manager_context(manager_id))
         
         # Generate insights
         response = azure_openai_service.generate_insights(
@@ -268,7 +363,8 @@ def generate_insights():
             'insights': response.get('content', ''),
             'type': insight_type,
             'generated_at': datetime.utcnow().isoformat(),
-            'usage': response.get('usage', {})
+            'usage': response.get('usage', {}),
+            'cached': response.get('cached', False)
         }), 200
         
     except Exception as e:
@@ -287,7 +383,7 @@ def quick_insights():
         if role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         
-        context = get_admin_context()
+        context = cached_context('admin', None, get_admin_context)
         
         # Generate quick insights
         quick_prompt = f"""Based on this HR data, provide 3-4 brief bullet points of key insights:
@@ -304,7 +400,8 @@ Keep each point under 15 words. Focus on actionable insights."""
                 {"role": "user", "content": quick_prompt}
             ],
             max_tokens=300,
-            temperature=0.5
+            temperature=0.5,
+            endpoint='quick_insights'
         )
         
         if 'error' in response:
@@ -317,9 +414,48 @@ Keep each point under 15 words. Focus on actionable insights."""
                 'attendance_rate': context.get('attendance_summary', {}).get('attendance_rate', 0),
                 'pending_leaves': context.get('leave_summary', {}).get('pending', 0),
                 'monthly_payroll': context.get('payroll_summary', {}).get('total', 0)
-            }
+            },
+            'cached': response.get('cached', False)
         }), 200
         
     except Exception as e:
         print(f"Quick insights error: {e}")
         return jsonify({'error': str(e)}), 500
+
+
+@ai_bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """LLM response cache hit rate and tokens saved (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        return jsonify(azure_openai_service.response_cache.stats()), 200
+        
+    except Exception as e:
+        print(f"Get cache stats error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@ai_bp.route('/usage-stats', methods=['GET'])
+@jwt_required()
+def get_usage_stats():
+    """Prompt size and token usage per AI endpoint (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        return jsonify({
+            'context_token_budget': Config.AI_CONTEXT_TOKEN_BUDGET,
+            'insights_token_budget': Config.AI_INSIGHTS_TOKEN_BUDGET,
+            'endpoints': prompt_usage.stats()
+        }), 200
+        
+    except Exception as e:
+        print(f"Get usage stats error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
@@ -3,6 +3,9 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from database import db
 from config import Config
+from utils.work_calendar import is_working_day
+from routes.timesheet import get_active_managers, get_week_statuses, mark_drafts_stale
+from utils.ai_context import invalidate_ai_context
 
 attendance_bp = Blueprint('attendance', __name__)
 
@@ -79,9 +82,10 @@ def check_in():
         current_time = datetime.now().strftime('%I:%M %p')
         week_start, week_end = get_week_dates(target_date)
         
-        # Check if target date is Saturday (5) or Sunday (6)
-        if target_date.weekday() in [5, 6]:
-            return jsonify({'error': 'Check-in is not available on weekends'}), 400
+        # Check against the employee's working-day calendar (weekends and holidays)
+        user = db.users.find_one({'employee_id': employee_id}, {'location': 1}) or {}
+        if not is_working_day(target_date, user.get('location')):
+            return jsonify({'error': 'Check-in is not available on weekends or holidays'}), 400
         
         # Check if already checked in for that date
         existing = db.attendance.find_one({
@@ -100,7 +104,8 @@ def check_in():
                     'check_in': current_time,
                     'status': 'Present',
                     'week_start': week_start,
-                    'week_end': week_end
+                    'week_end': week_end,
+                    'updated_at': datetime.utcnow()
                 }}
             )
         else:
@@ -113,8 +118,11 @@ def check_in():
                 'status': 'Present',
                 'mode': 'Office',
                 'week_start': week_start,
-                'week_end': week_end
+                'week_end': week_end,
+                'updated_at': datetime.utcnow()
             })
+        mark_drafts_stale([(employee_id, target_date_str)])
+        invalidate_ai_context([employee_id])
         
         return jsonify({
             'message': 'Check-in successful',
@@ -170,9 +178,12 @@ def check_out():
             {'$set': {
                 'check_out': current_time,
                 'total_hours': total_hours,
-                'status': status
+                'status': status,
+                'updated_at': datetime.utcnow()
             }}
         )
+        mark_drafts_stale([(employee_id, target_date_str)])
+        invalidate_ai_context([employee_id])
         
         return jsonify({
             'message': 'Check-out successful',
@@ -335,15 +346,7 @@ def get_attendance_history():
 def get_managers():
     """Get list of managers for timesheet submission"""
     try:
-        managers = list(db.managers.find({'is_active': True}))
-        
-        result = []
-        for manager in managers:
-            result.append({
-                'manager_id': manager['manager_id'],
-                'name': manager['name'],
-                'email': manager['email']
-            })
+        result = list(get_active_managers().values())
         
         return jsonify({'managers': result}), 200
         
@@ -369,29 +372,24 @@ def can_submit_timesheet():
         
         can_submit = day_of_week >= 4  # Friday or later
         
-        # Check if already submitted for this week
-        existing_timesheet = db.timesheets.find_one({
-            'employee_id': employee_id,
-            'week_start': week_start
-        })
+        # Current and previous week in one query
+        prev_week_start, prev_week_end = get_week_dates(today - timedelta(days=7))
+        statuses = get_week_statuses(employee_id, week_start, prev_week_start)
+        status = statuses.get(week_start)
+        prev_status = statuses.get(prev_week_start)
         
-        if existing_timesheet:
+        # Check if already submitted for this week
+        if status and status != 'draft':
             return jsonify({
                 'can_submit': False,
-                'reason': f'Timesheet already submitted. Status: {existing_timesheet["status"]}',
-                'timesheet_status': existing_timesheet['status'],
+                'reason': f'Timesheet already submitted. Status: {status}',
+                'timesheet_status': status,
                 'week_start': week_start,
                 'week_end': week_end
             }), 200
         
         # Check if previous week timesheet is approved (if exists)
-        prev_week_start, prev_week_end = get_week_dates(today - timedelta(days=7))
-        prev_timesheet = db.timesheets.find_one({
-            'employee_id': employee_id,
-            'week_start': prev_week_start
-        })
-        
-        if prev_timesheet and prev_timesheet.get('status') != 'approved':
+        if prev_status and prev_status not in ['approved', 'draft']:
             return jsonify({
                 'can_submit': False,
                 'reason': 'Previous week timesheet not approved yet',
@@ -6,6 +6,8 @@ import re
 from database import db
 from config import Config
 from utils.email_service import generate_otp, send_otp_email
+from utils.http_cache import bump_version
+from utils.leave_ledger import open_balance
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -148,6 +150,9 @@ def verify_otp():
         }
         
         db.users.insert_one(user)
+        bump_version('users')
+        if user['role'] == 'employee':
+            open_balance(user['employee_id'])
         
         # Delete OTP record
         db.otp_verifications.delete_many({'email': email})
@@ -5,6 +5,7 @@ from bson import ObjectId
 from database import db
 from utils.email_service import send_document_request_email
 from utils.azure_storage import azure_storage
+from utils.http_cache import conditional_get, bump_version
 
 documents_bp = Blueprint('documents', __name__)
 
@@ -53,6 +54,7 @@ def request_document():
         }
         
         result = db.document_requests.insert_one(doc_request)
+        bump_version('document_requests')
         
         # Send email notification to employee
         try:
@@ -204,6 +206,7 @@ def upload_document(request_id):
                 'uploaded_at': datetime.utcnow()
             }}
         )
+        bump_version('document_requests')
         
         return jsonify({
             'message': 'Document uploaded successfully',
@@ -217,6 +220,7 @@ def upload_document(request_id):
 
 @documents_bp.route('/admin/requests', methods=['GET'])
 @jwt_required()
+@conditional_get('document_requests')
 def admin_get_all_requests():
     """Admin gets all document requests"""
     try:
@@ -352,6 +356,8 @@ def admin_review_document():
                 'status': 'pending'
             })
         
+        bump_version('document_requests')
+        
         # If approved, add to employee's documents array
         if action == 'approved' and doc_request.get('document_url'):
             db.users.update_one(
@@ -1,11 +1,159 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+from datetime import datetime, timedelta
 from database import db
+from config import Config
 from bson import ObjectId
+from pymongo import UpdateOne
+from utils.cache import TTLCache
+from utils.pagination import paginate, page_limit, InvalidCursor, InvalidLimit
+from utils.work_calendar import iter_working_days
+from routes.timesheet import mark_drafts_stale
+from utils.ai_context import invalidate_ai_context
+from utils.http_cache import bump_version, get_versions
+from utils.leave_ledger import (
+    LEAVE_TYPE_KEYS, InsufficientBalance, leave_days, get_balance, pending_days, consume, reverse, accrue,
+    rebuild_balance, seed_balances
+)
 
 leave_bp = Blueprint('leave', __name__)
 
+# Team calendars keyed by (range, team, leaves version). Leave writes bump the
+# shared version, so workers that did not handle the write stop serving stale calendars.
+leave_calendar_cache = TTLCache(ttl=60, max_entries=256)
+
+
+def invalidate_leave_calendars():
+    """Drop cached team calendars in this and every other process"""
+    bump_version('leaves')
+    leave_calendar_cache.clear()
+
+
+def build_leave_query(status=None, start_date=None, end_date=None, employee_id=None):
+    """Build the leave filter shared by the admin list and reports.
+
+    start_date/end_date select leaves that overlap the given range.
+    """
+    query = {}
+    if status:
+        query['status'] = status
+    if employee_id:
+        query['employee_id'] = employee_id
+    if end_date:
+        query['start_date'] = {'$lte': end_date}
+    if start_date:
+        query['end_date'] = {'$gte': start_date}
+    return query
+
+
+def manager_scope(identity):
+    """Leave filter limiting a manager to their team.
+
+    Leaves are stamped with the employee's manager_id when applied for.
+    Existing data is assigned by utils.managers.backfill_manager_ids, and
+    submitting a timesheet assigns an unassigned employee to that manager.
+    Leaves of employees with no assignment are left to admins (list them
+    with manager_id=unassigned). The $ne keeps an identity without a
+    manager_id from matching those unassigned leaves.
+    """
+    return {'manager_id': {'$eq': identity.get('manager_id'), '$ne': None}}
+
+
+def mark_leave_attendance(leaves):
+    """Mark every working day of the given leaves as 'Leave' in attendance.
+
+    All affected days are written in a single unordered bulk_write. Weekends
+    and holidays of the leave's location are skipped using the compiled
+    calendar, so no per-day lookups are needed.
+    """
+    if not leaves:
+        return 0
+    
+    operations = []
+    days = []
+    for leave in leaves:
+        for date_str in iter_working_days(leave['start_date'], leave['end_date'], leave.get('location')):
+            days.append((leave['employee_id'], date_str))
+            operations.append(UpdateOne(
+                {'employee_id': leave['employee_id'], 'date': date_str},
+                {'$set': {
+                    'status': 'Leave',
+                    'check_in': None,
+                    'check_out': None,
+                    'total_hours': 0,
+                    'updated_at': datetime.utcnow()
+                }},
+                upsert=True
+            ))
+    
+    if operations:
+        db.attendance.bulk_write(operations, ordered=False)
+        mark_drafts_stale(days)
+    
+    return len(operations)
+
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+
+def leave_days_pipeline(match, start_date, end_date):
+    """Aggregation stages expanding matching leaves into one row per day.
+
+    Each leave is clipped to [start_date, end_date] and unwound into rows of
+    {employee_id, employee_name, leave_type, status, date} so callers can
+    group by day in the same pipeline.
+    """
+    return [
+        {'$match': match},
+        {'$project': {
+            'employee_id': 1,
+            'employee_name': 1,
+            'leave_type': 1,
+            'status': 1,
+            'first': {'$dateFromString': {'dateString': {'$max': ['$start_date', start_date]}, 'format': '%Y-%m-%d'}},
+            'last': {'$dateFromString': {'dateString': {'$min': ['$end_date', end_date]}, 'format': '%Y-%m-%d'}}
+        }},
+        {'$project': {
+            'employee_id': 1,
+            'employee_name': 1,
+            'leave_type': 1,
+            'status': 1,
+            'first': 1,
+            'offset': {'$range': [0, {'$add': [
+                {'$toInt': {'$divide': [{'$subtract': ['$last', '$first']}, MS_PER_DAY]}}, 1
+            ]}]}
+        }},
+        {'$unwind': '$offset'},
+        {'$project': {
+            'employee_id': 1,
+            'employee_name': 1,
+            'leave_type': 1,
+            'status': 1,
+            'date': {'$dateToString': {
+                'format': '%Y-%m-%d',
+                'date': {'$add': ['$first', {'$multiply': ['$offset', MS_PER_DAY]}]}
+            }}
+        }}
+    ]
+
+
+def format_leave(leave):
+    """Serialize a leave request for admin views"""
+    return {
+        'id': str(leave['_id']),
+        'employee_id': leave['employee_id'],
+        'employee_name': leave.get('employee_name', ''),
+        'leave_type': leave['leave_type'],
+        'start_date': leave['start_date'],
+        'end_date': leave['end_date'],
+        'reason': leave.get('reason', ''),
+        'status': leave['status'],
+        'comment': leave.get('comment', ''),
+        'reviewed_by': leave.get('reviewed_by', ''),
+        'created_at': leave.get('created_at').isoformat() if leave.get('created_at') else None,
+        'updated_at': leave.get('updated_at').isoformat() if leave.get('updated_at') else None
+    }
+
 
 @leave_bp.route('/apply', methods=['POST'])
 @jwt_required()
@@ -18,6 +166,9 @@ def apply_leave():
         
         data = request.get_json()
         
+        # Team fields are denormalized onto the leave for scoped, indexed queues
+        user = db.users.find_one({'employee_id': employee_id}, {'department': 1, 'manager_id': 1, 'location': 1}) or {}
+        
         leave_type = data.get('leave_type')
         start_date = data.get('start_date')
         end_date = data.get('end_date')
@@ -44,18 +195,26 @@ def apply_leave():
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
         
-        # Check for overlapping leave requests
+        # Check for overlapping leave requests (served by the employee interval index)
         overlapping = db.leaves.find_one({
             'employee_id': employee_id,
-            'status': {'$ne': 'Rejected'},
-            '$or': [
-                {'start_date': {'$lte': end_date}, 'end_date': {'$gte': start_date}}
-            ]
-        })
+            'start_date': {'$lte': end_date},
+            'end_date': {'$gte': start_date},
+            'status': {'$nin': ['Rejected', 'Cancelled']}
+        }, {'_id': 1})
         
         if overlapping:
             return jsonify({'error': 'You already have a leave request for overlapping dates'}), 400
         
+        # Check balance (materialized ledger balance, less days already requested by pending leaves)
+        days = leave_days(start_date, end_date, user.get('location'))
+        if days == 0:
+            return jsonify({'error': 'Selected dates contain no working days'}), 400
+        
+        available = get_balance(employee_id)[LEAVE_TYPE_KEYS[leave_type]] - pending_days(employee_id, leave_type)
+        if days > available:
+            return jsonify({'error': f'Insufficient {leave_type} balance: {available} day(s) available, {days} requested'}), 400
+        
         # Create leave request
         leave = {
             'employee_id': employee_id,
@@ -63,6 +222,10 @@ def apply_leave():
             'leave_type': leave_type,
             'start_date': start_date,
             'end_date': end_date,
+            'days': days,
+            'department': user.get('department', ''),
+            'manager_id': user.get('manager_id'),
+            'location': user.get('location'),
             'reason': reason,
             'status': 'Pending',
             'comment': '',
@@ -71,6 +234,8 @@ def apply_leave():
         }
         
         result = db.leaves.insert_one(leave)
+        invalidate_leave_calendars()
+        invalidate_ai_context([employee_id])
         
         return jsonify({
             'message': 'Leave request submitted successfully',
@@ -136,10 +301,37 @@ def cancel_leave(leave_id):
         if not leave:
             return jsonify({'error': 'Leave request not found'}), 404
         
+        if leave['status'] == 'Approved':
+            # Approved leave can be cancelled until it starts; days go back to the balance
+            if leave['start_date'] <= datetime.now().strftime('%Y-%m-%d'):
+                return jsonify({'error': 'Cannot cancel leave that has already started'}), 400
+            
+            result = db.leaves.update_one(
+                {'_id': ObjectId(leave_id), 'status': 'Approved'},
+                {'$set': {'status': 'Cancelled', 'updated_at': datetime.utcnow()}}
+            )
+            if result.modified_count:
+                invalidate_leave_calendars()
+                invalidate_ai_context([employee_id])
+                reverse(leave, created_by=employee_id)
+                db.attendance.delete_many({
+                    'employee_id': employee_id,
+                    'date': {'$gte': leave['start_date'], '$lte': leave['end_date']},
+                    'status': 'Leave'
+                })
+                mark_drafts_stale(
+                    (employee_id, date_str)
+                    for date_str in iter_working_days(leave['start_date'], leave['end_date'], leave.get('location'))
+                )
+            
+            return jsonify({'message': 'Leave cancelled successfully'}), 200
+        
         if leave['status'] != 'Pending':
-            return jsonify({'error': 'Can only cancel pending leave requests'}), 400
+            return jsonify({'error': 'Can only cancel pending or upcoming approved leave requests'}), 400
         
         db.leaves.delete_one({'_id': ObjectId(leave_id)})
+        invalidate_leave_calendars()
+        invalidate_ai_context([employee_id])
         
         return jsonify({'message': 'Leave request cancelled successfully'}), 200
         
@@ -162,28 +354,11 @@ def get_all_leaves():
         status = request.args.get('status')
         limit = int(request.args.get('limit', 50))
         
-        query = {}
-        if status:
-            query['status'] = status
+        query = build_leave_query(status=status)
         
         leaves = list(db.leaves.find(query).sort('created_at', -1).limit(limit))
         
-        result = []
-        for leave in leaves:
-            result.append({
-                'id': str(leave['_id']),
-                'employee_id': leave['employee_id'],
-                'employee_name': leave.get('employee_name', ''),
-                'leave_type': leave['leave_type'],
-                'start_date': leave['start_date'],
-                'end_date': leave['end_date'],
-                'reason': leave.get('reason', ''),
-                'status': leave['status'],
-                'comment': leave.get('comment', ''),
-                'reviewed_by': leave.get('reviewed_by', ''),
-                'created_at': leave.get('created_at').isoformat() if leave.get('created_at') else None,
-                'updated_at': leave.get('updated_at').isoformat() if leave.get('updated_at') else None
-            })
+        result = [format_leave(leave) for leave in leaves]
         
         return jsonify({'leaves': result}), 200
         
@@ -202,7 +377,27 @@ def get_pending_leaves():
         if identity.get('role') not in ['admin', 'manager']:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        leaves = list(db.leaves.find({'status': 'Pending'}).sort('created_at', -1))
+        try:
+            limit = page_limit(request.args.get('limit'), 50, 200)
+        except InvalidLimit as e:
+            return jsonify({'error': str(e)}), 400
+        cursor = request.args.get('cursor')
+        
+        query = {'status': 'Pending'}
+        if identity.get('role') == 'manager':
+            query.update(manager_scope(identity))
+        else:
+            if request.args.get('manager_id') == 'unassigned':
+                query['manager_id'] = None
+            elif request.args.get('manager_id'):
+                query['manager_id'] = request.args.get('manager_id')
+            if request.args.get('department'):
+                query['department'] = request.args.get('department')
+        
+        try:
+            leaves, next_cursor = paginate(db.leaves, query, 'created_at', limit, cursor=cursor, descending=True)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
         
         result = []
         for leave in leaves:
@@ -215,10 +410,12 @@ def get_pending_leaves():
                 'end_date': leave['end_date'],
                 'reason': leave.get('reason', ''),
                 'status': leave['status'],
+                'department': leave.get('department', ''),
+                'manager_id': leave.get('manager_id'),
                 'created_at': leave.get('created_at').isoformat() if leave.get('created_at') else None
             })
         
-        return jsonify({'leaves': result}), 200
+        return jsonify({'leaves': result, 'next_cursor': next_cursor}), 200
         
     except Exception as e:
         print(f"Get pending leaves error: {e}")
@@ -252,13 +449,25 @@ def review_leave():
         if not leave:
             return jsonify({'error': 'Leave request not found'}), 404
         
+        if identity.get('role') == 'manager' and (not leave.get('manager_id') or leave['manager_id'] != identity.get('manager_id')):
+            return jsonify({'error': 'Leave request belongs to another team'}), 403
+        
         if leave['status'] != 'Pending':
             return jsonify({'error': 'Leave request already reviewed'}), 400
         
         new_status = 'Approved' if action == 'approve' else 'Rejected'
         
-        db.leaves.update_one(
-            {'_id': ObjectId(leave_id)},
+        # Approval consumes the balance first; the deduction only applies while the balance covers it
+        consumed = False
+        if new_status == 'Approved':
+            days = leave.get('days') or leave_days(leave['start_date'], leave['end_date'], leave.get('location'))
+            try:
+                consumed = consume(leave, created_by=identity.get('email'), days=days)
+            except InsufficientBalance as e:
+                return jsonify({'error': f'Insufficient {leave["leave_type"]} balance: {e}'}), 400
+        
+        result = db.leaves.update_one(
+            {'_id': ObjectId(leave_id), 'status': 'Pending'},
             {'$set': {
                 'status': new_status,
                 'comment': comment,
@@ -267,28 +476,18 @@ def review_leave():
             }}
         )
         
-        # If approved, update attendance records for leave dates
+        if result.modified_count == 0:
+            # Reviewed concurrently (e.g. rejected); give back what this approval consumed
+            if consumed:
+                reverse(leave, created_by=identity.get('email'))
+            return jsonify({'error': 'Leave request already reviewed'}), 400
+        
+        invalidate_leave_calendars()
+        invalidate_ai_context([leave['employee_id']])
+        
+        # If approved, mark the leave's working days in attendance
         if new_status == 'Approved':
-            start = datetime.strptime(leave['start_date'], '%Y-%m-%d')
-            end = datetime.strptime(leave['end_date'], '%Y-%m-%d')
-            
-            current = start
-            while current <= end:
-                date_str = current.strftime('%Y-%m-%d')
-                
-                # Update or create attendance record
-                db.attendance.update_one(
-                    {'employee_id': leave['employee_id'], 'date': date_str},
-                    {'$set': {
-                        'status': 'Leave',
-                        'check_in': None,
-                        'check_out': None,
-                        'total_hours': 0
-                    }},
-                    upsert=True
-                )
-                
-                current = current.replace(day=current.day + 1) if current.day < 28 else current.replace(month=current.month + 1, day=1)
+            mark_leave_attendance([leave])
         
         return jsonify({
             'message': f'Leave request {new_status.lower()} successfully',
@@ -298,3 +497,434 @@ def review_leave():
     except Exception as e:
         print(f"Review leave error: {e}")
         return jsonify({'error': 'An error occurred'}), 500
+
+
+MAX_BULK_REVIEW = 500
+
+
+@leave_bp.route('/admin/review/bulk', methods=['POST'])
+@jwt_required()
+def bulk_review_leaves():
+    """Approve or reject many pending leave requests at once (Admin/Manager)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') not in ['admin', 'manager']:
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        data = request.get_json() or {}
+        
+        leave_ids = data.get('leave_ids') or []
+        action = data.get('action')  # 'approve' or 'reject'
+        comment = data.get('comment', '')
+        
+        if not leave_ids or not action:
+            return jsonify({'error': 'Leave IDs and action are required'}), 400
+        
+        if action not in ['approve', 'reject']:
+            return jsonify({'error': 'Invalid action. Must be approve or reject'}), 400
+        
+        if len(leave_ids) > MAX_BULK_REVIEW:
+            return jsonify({'error': f'At most {MAX_BULK_REVIEW} leave requests can be reviewed at once'}), 400
+        
+        try:
+            object_ids = [ObjectId(leave_id) for leave_id in leave_ids]
+        except Exception:
+            return jsonify({'error': 'Invalid leave ID'}), 400
+        
+        query = {'_id': {'$in': object_ids}, 'status': 'Pending'}
+        if identity.get('role') == 'manager':
+            query.update(manager_scope(identity))
+        
+        leaves = list(db.leaves.find(
+            query,
+            {'employee_id': 1, 'leave_type': 1, 'start_date': 1, 'end_date': 1, 'days': 1, 'location': 1}
+        ).sort('created_at', 1))
+        
+        new_status = 'Approved' if action == 'approve' else 'Rejected'
+        
+        # Approve oldest first while balance lasts; the rest stay pending.
+        # Each consumption is conditional on the balance, so concurrent reviews cannot overdraw it.
+        insufficient = []
+        consumed = set()
+        if new_status == 'Approved':
+            eligible = []
+            for leave in leaves:
+                leave['days'] = leave.get('days') or leave_days(leave['start_date'], leave['end_date'], leave.get('location'))
+                try:
+                    if consume(leave, created_by=identity.get('email'), days=leave['days']):
+                        consumed.add(leave['_id'])
+                except InsufficientBalance:
+                    insufficient.append(str(leave['_id']))
+                    continue
+                eligible.append(leave)
+            leaves = eligible
+        
+        reviewed_ids = [leave['_id'] for leave in leaves]
+        
+        if reviewed_ids:
+            db.leaves.update_many(
+                {'_id': {'$in': reviewed_ids}, 'status': 'Pending'},
+                {'$set': {
+                    'status': new_status,
+                    'comment': comment,
+                    'updated_at': datetime.utcnow(),
+                    'reviewed_by': identity.get('name', identity.get('email'))
+                }}
+            )
+            invalidate_leave_calendars()
+            invalidate_ai_context([leave['employee_id'] for leave in leaves])
+        
+        days_marked = 0
+        if new_status == 'Approved':
+            # Leaves reviewed by someone else in the meantime give back their consumption
+            lost = set(l['_id'] for l in db.leaves.find(
+                {'_id': {'$in': reviewed_ids}, 'status': {'$ne': 'Approved'}}, {'_id': 1}
+            ))
+            for leave in leaves:
+                if leave['_id'] in lost and leave['_id'] in consumed:
+                    reverse(leave, created_by=identity.get('email'))
+            leaves = [leave for leave in leaves if leave['_id'] not in lost]
+            reviewed_ids = [leave['_id'] for leave in leaves]
+            days_marked = mark_leave_attendance(leaves)
+        
+        reviewed = set(str(i) for i in reviewed_ids)
+        skipped = [leave_id for leave_id in leave_ids if leave_id not in reviewed]
+        
+        return jsonify({
+            'message': f'{len(reviewed_ids)} leave request(s) {new_status.lower()}',
+            'status': new_status,
+            'reviewed': sorted(reviewed),
+            'skipped': skipped,
+            'insufficient_balance': insufficient,
+            'attendance_days_marked': days_marked
+        }), 200
+        
+    except Exception as e:
+        print(f"Bulk review leave error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@leave_bp.route('/team-conflicts', methods=['GET'])
+@jwt_required()
+def get_team_conflicts():
+    """Per-day count of teammates already on leave within a date range"""
+    try:
+        identity = get_jwt_identity()
+        
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        include_pending = request.args.get('include_pending', 'true').lower() != 'false'
+        
+        if not start_date or not end_date:
+            return jsonify({'error': 'Start date and end date are required'}), 400
+        
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d')
+            end = datetime.strptime(end_date, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        if end < start:
+            return jsonify({'error': 'End date cannot be before start date'}), 400
+        
+        if (end - start).days > 92:
+            return jsonify({'error': 'Date range cannot exceed 92 days'}), 400
+        
+        # Team is the requester's department; admins/managers may pass one explicitly
+        employee_id = identity.get('employee_id')
+        department = request.args.get('department') if identity.get('role') in ['admin', 'manager'] else None
+        if not department and employee_id:
+            user = db.users.find_one({'employee_id': employee_id}, {'department': 1})
+            department = user.get('department') if user else None
+        
+        if not department:
+            return jsonify({'error': 'Department is required'}), 400
+        
+        team_ids = [
+            u['employee_id'] for u in db.users.find(
+                {'department': department, 'role': 'employee', 'employee_id': {'$ne': employee_id}},
+                {'employee_id': 1}
+            )
+        ]
+        
+        statuses = ['Approved', 'Pending'] if include_pending else ['Approved']
+        match = {
+            'employee_id': {'$in': team_ids},
+            'start_date': {'$lte': end_date},
+            'end_date': {'$gte': start_date},
+            'status': {'$in': statuses}
+        }
+        
+        pipeline = leave_days_pipeline(match, start_date, end_date) + [
+            {'$group': {'_id': '$date', 'employees': {'$addToSet': '$employee_id'}}}
+        ]
+        on_leave = {row['_id']: row['employees'] for row in db.leaves.aggregate(pipeline)}
+        
+        # Employees only see counts; who is off is visible to admins and managers
+        show_identities = identity.get('role') in ['admin', 'manager']
+        days = []
+        everyone_off = set()
+        current = start
+        while current <= end:
+            date_str = current.strftime('%Y-%m-%d')
+            employees = on_leave.get(date_str, [])
+            everyone_off.update(employees)
+            day = {
+                'date': date_str,
+                'day': current.strftime('%a'),
+                'on_leave': len(employees)
+            }
+            if show_identities:
+                day['employee_ids'] = employees
+            days.append(day)
+            current += timedelta(days=1)
+        
+        team_size = len(team_ids)
+        return jsonify({
+            'department': department,
+            'team_size': team_size,
+            'peak_on_leave': max((d['on_leave'] for d in days), default=0),
+            'people_on_leave': len(everyone_off),
+            'summary': f'{len(everyone_off)} of {team_size} people on leave in this period',
+            'days': days
+        }), 200
+        
+    except Exception as e:
+        print(f"Get team conflicts error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@leave_bp.route('/balance', methods=['GET'])
+@jwt_required()
+def get_my_balance():
+    """Get current employee's leave balance"""
+    try:
+        identity = get_jwt_identity()
+        employee_id = identity['employee_id']
+        
+        return jsonify({'employee_id': employee_id, 'balance': get_balance(employee_id)}), 200
+        
+    except Exception as e:
+        print(f"Get leave balance error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@leave_bp.route('/admin/balance/<employee_id>', methods=['GET'])
+@jwt_required()
+def get_employee_balance(employee_id):
+    """Get an employee's leave balance and recent ledger entries (Admin/Manager)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') not in ['admin', 'manager']:
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        limit = int(request.args.get('limit', 20))
+        entries = db.leave_ledger.find({'employee_id': employee_id}).sort('created_at', -1).limit(limit)
+        
+        return jsonify({
+            'employee_id': employee_id,
+            'balance': get_balance(employee_id),
+            'ledger': [{
+                'leave_type': e['leave_type'],
+                'delta': e['delta'],
+                'kind': e['kind'],
+                'leave_id': e.get('leave_id'),
+                'period': e.get('period'),
+                'created_at': e.get('created_at').isoformat() if e.get('created_at') else None
+            } for e in entries]
+        }), 200
+        
+    except Exception as e:
+        print(f"Get employee balance error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@leave_bp.route('/admin/balance/<employee_id>/rebuild', methods=['POST'])
+@jwt_required()
+def rebuild_employee_balance(employee_id):
+    """Recompute an employee's balance from the ledger (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        balance = rebuild_balance(employee_id)
+        invalidate_ai_context([employee_id])
+        
+        return jsonify({'employee_id': employee_id, 'balance': balance}), 200
+        
+    except Exception as e:
+        print(f"Rebuild balance error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@leave_bp.route('/admin/balance/seed', methods=['POST'])
+@jwt_required()
+def seed_leave_balances():
+    """Open ledger balances for employees that have none (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        result = seed_balances()
+        if result['seeded']:
+            invalidate_ai_context()
+        
+        return jsonify({'message': 'Leave balances seeded', **result}), 200
+        
+    except Exception as e:
+        print(f"Seed leave balances error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@leave_bp.route('/admin/accrue', methods=['POST'])
+@jwt_required()
+def run_accrual():
+    """Credit leave accrual for a period to all employees (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        data = request.get_json() or {}
+        period = data.get('period')  # e.g. 2026-10
+        amounts = data.get('amounts') or Config.LEAVE_MONTHLY_ACCRUAL
+        
+        if not period:
+            return jsonify({'error': 'Period is required'}), 400
+        
+        unknown = [k for k in amounts if k not in LEAVE_TYPE_KEYS.values()]
+        if unknown:
+            return jsonify({'error': f'Unknown leave types: {", ".join(unknown)}'}), 400
+        
+        credited = accrue(period, amounts, employee_ids=data.get('employee_ids'), created_by=identity.get('email'))
+        invalidate_ai_context(data.get('employee_ids'))
+        
+        return jsonify({
+            'message': f'Accrual for {period} applied',
+            'entries_posted': credited
+        }), 200
+        
+    except Exception as e:
+        print(f"Run accrual error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+MAX_CALENDAR_DAYS = 184
+
+
+def build_leave_calendar(start_date, end_date, department=None, manager_id=None, include_pending=True):
+    """Per-day sets of people on leave for a team, in one aggregation"""
+    team_query = {'role': 'employee'}
+    if department:
+        team_query['department'] = department
+    if manager_id:
+        team_query['manager_id'] = manager_id
+    
+    team = {
+        u['employee_id']: u.get('name', '')
+        for u in db.users.find(team_query, {'employee_id': 1, 'name': 1})
+    }
+    
+    statuses = ['Approved', 'Pending'] if include_pending else ['Approved']
+    match = {
+        'employee_id': {'$in': list(team)},
+        'start_date': {'$lte': end_date},
+        'end_date': {'$gte': start_date},
+        'status': {'$in': statuses}
+    }
+    
+    pipeline = leave_days_pipeline(match, start_date, end_date) + [
+        {'$group': {
+            '_id': '$date',
+            'people': {'$push': {
+                'employee_id': '$employee_id',
+                'employee_name': '$employee_name',
+                'leave_type': '$leave_type',
+                'status': '$status'
+            }}
+        }},
+        {'$sort': {'_id': 1}}
+    ]
+    
+    days = [{
+        'date': row['_id'],
+        'count': len(row['people']),
+        'people': row['people']
+    } for row in db.leaves.aggregate(pipeline)]
+    
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'department': department,
+        'manager_id': manager_id,
+        'team_size': len(team),
+        'days': days
+    }
+
+
+@leave_bp.route('/calendar', methods=['GET'])
+@jwt_required()
+def get_leave_calendar():
+    """Team leave calendar for a date range (per-day people on leave)"""
+    try:
+        identity = get_jwt_identity()
+        
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        department = request.args.get('department') or None
+        manager_id = request.args.get('manager_id') or None
+        include_pending = request.args.get('include_pending', 'true').lower() != 'false'
+        
+        if not start_date or not end_date:
+            return jsonify({'error': 'Start date and end date are required'}), 400
+        
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d')
+            end = datetime.strptime(end_date, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        if end < start:
+            return jsonify({'error': 'End date cannot be before start date'}), 400
+        
+        if (end - start).days >= MAX_CALENDAR_DAYS:
+            return jsonify({'error': f'Date range cannot exceed {MAX_CALENDAR_DAYS} days'}), 400
+        
+        role = identity.get('role')
+        if role == 'manager':
+            # Managers only see their own team
+            if department or (manager_id and manager_id != identity.get('manager_id')):
+                return jsonify({'error': 'Managers can only view their own team calendar'}), 403
+            manager_id = identity.get('manager_id')
+            if not manager_id:
+                return jsonify({'error': 'Manager ID not set for your profile'}), 400
+        elif role != 'admin':
+            # Employees only see their own department
+            user = db.users.find_one({'employee_id': identity.get('employee_id')}, {'department': 1})
+            department = user.get('department') if user else None
+            manager_id = None
+            if not department:
+                return jsonify({'error': 'Department not set for your profile'}), 400
+        
+        key = (start_date, end_date, department, manager_id, include_pending, get_versions(['leaves'])[0])
+        calendar = leave_calendar_cache.get_or_set(
+            key,
+            lambda: build_leave_calendar(start_date, end_date, department, manager_id, include_pending)
+        )
+        
+        if role not in ['admin', 'manager']:
+            # Employees see how many colleagues are off, not who
+            calendar = {**calendar, 'days': [{'date': d['date'], 'count': d['count']} for d in calendar['days']]}
+        
+        return jsonify(calendar), 200
+        
+    except Exception as e:
+        print(f"Get leave calendar error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
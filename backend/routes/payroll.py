@@ -1,11 +1,403 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+import csv
+import io
+import time
+import tempfile
 from datetime import datetime
+import xlsxwriter
 from database import db
+from config import Config
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from utils.http_cache import conditional_get, bump_version
+from utils.ai_context import invalidate_ai_context
+from utils.jobs import register_job, job_manager, serialize_job
+from utils.proration import prorate, gross_salary
+from utils.payslip_documents import payslip_pdfs
+from utils.pagination import paginate, page_limit, InvalidCursor, InvalidLimit
+from utils.compensation import get_compensation_table, ScenarioError
 
 payroll_bp = Blueprint('payroll', __name__)
 
+# Only the fields a payslip needs are read when snapshotting salaries
+SALARY_SNAPSHOT_PROJECTION = {
+    '_id': 0, 'employee_id': 1, 'name': 1, 'email': 1, 'salary': 1, 'location': 1,
+    'date_of_joining': 1, 'created_at': 1
+}
+
+
+MAX_PAYROLL_EMPLOYEES_PAGE = 500
+
+PAYROLL_EMPLOYEE_PROJECTION = {
+    'employee_id': 1, 'name': 1, 'email': 1, 'department': 1,
+    'job_title': 1, 'salary': 1, 'is_verified': 1
+}
+
+
+def salary_summary():
+    """Configured salary totals, overall and per department, in one pipeline"""
+    totals = {
+        'employees': {'$sum': 1},
+        'configured': {'$sum': {'$cond': [{'$gt': ['$salary.net', 0]}, 1, 0]}},
+        'total_gross': {'$sum': {'$add': [
+            {'$ifNull': ['$salary.basic', 0]},
+            {'$ifNull': ['$salary.hra', 0]},
+            {'$ifNull': ['$salary.allowances', 0]}
+        ]}},
+        'total_deductions': {'$sum': {'$ifNull': ['$salary.deductions', 0]}},
+        'total_net': {'$sum': {'$ifNull': ['$salary.net', 0]}},
+        'max_net': {'$max': '$salary.net'}
+    }
+    result = list(db.users.aggregate([
+        {'$match': {'role': 'employee'}},
+        {'$project': {'department': 1, 'salary': 1}},
+        {'$facet': {
+            'overall': [{'$group': {'_id': None, **totals}}],
+            'by_department': [
+                {'$group': {'_id': {'$ifNull': ['$department', '']}, **totals}},
+                {'$sort': {'total_net': -1}}
+            ]
+        }}
+    ]))[0]
+    
+    def shape(row):
+        configured = row['configured']
+        return {
+            'employees': row['employees'],
+            'configured': configured,
+            'pending_configuration': row['employees'] - configured,
+            'total_gross': row['total_gross'],
+            'total_deductions': row['total_deductions'],
+            'total_net': row['total_net'],
+            'average_net': round(row['total_net'] / configured, 2) if configured else 0,
+            'max_net': row.get('max_net') or 0
+        }
+    
+    overall = shape(result['overall'][0]) if result['overall'] else shape(
+        {'employees': 0, 'configured': 0, 'total_gross': 0, 'total_deductions': 0, 'total_net': 0}
+    )
+    overall['by_department'] = [
+        {'department': row['_id'], **shape(row)} for row in result['by_department']
+    ]
+    return overall
+
+
+def payslip_month_summary(months=6, end_month=None):
+    """Per-month payslip totals with month-over-month deltas (oldest first)"""
+    query = {}
+    if end_month:
+        query['month_year'] = {'$lte': end_month}
+    rows = list(db.payslips.aggregate([
+        {'$match': query},
+        {'$group': {
+            '_id': '$month_year',
+            'payslips': {'$sum': 1},
+            'paid': {'$sum': {'$cond': [{'$eq': ['$status', 'Paid']}, 1, 0]}},
+            'total_gross': {'$sum': {'$ifNull': ['$gross_salary', 0]}},
+            'total_loss_of_pay': {'$sum': {'$ifNull': ['$loss_of_pay', 0]}},
+            'total_net': {'$sum': {'$ifNull': ['$net_salary', 0]}},
+            'paid_net': {'$sum': {'$cond': [{'$eq': ['$status', 'Paid']}, {'$ifNull': ['$net_salary', 0]}, 0]}}
+        }},
+        {'$sort': {'_id': -1}},
+        {'$limit': months + 1}
+    ]))
+    rows.reverse()
+    
+    result = []
+    previous = None
+    for row in rows:
+        month = {
+            'month_year': row['_id'],
+            'payslips': row['payslips'],
+            'paid': row['paid'],
+            'total_gross': row['total_gross'],
+            'total_loss_of_pay': row['total_loss_of_pay'],
+            'total_net': row['total_net'],
+            'paid_net': row['paid_net'],
+            'average_net': round(row['total_net'] / row['payslips'], 2) if row['payslips'] else 0
+        }
+        if previous:
+            month['net_delta'] = round(month['total_net'] - previous['total_net'], 2)
+            month['net_delta_pct'] = round(month['net_delta'] / previous['total_net'] * 100, 1) if previous['total_net'] else None
+            month['payslips_delta'] = month['payslips'] - previous['payslips']
+        else:
+            month['net_delta'] = month['net_delta_pct'] = month['payslips_delta'] = None
+        result.append(month)
+        previous = month
+    
+    # The extra oldest month only provides the baseline for the first delta
+    return result[-months:]
+
+
+PAYMENT_FILE_COLUMNS = ('employee_id', 'amount', 'reference')
+
+# Amounts within this tolerance of net_salary count as a match
+PAYMENT_AMOUNT_TOLERANCE = 0.01
+
+MAX_REPORTED_MISMATCHES = 1000
+
+
+def read_payment_file(stream):
+    """Parse a bank payment CSV (employee_id, amount, reference) from a stream.
+
+    Returns (payments, invalid_rows); rows are read incrementally from the
+    upload stream rather than buffered as one string.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    columns = [c.strip().lower() for c in (reader.fieldnames or [])]
+    missing = [c for c in PAYMENT_FILE_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f'Payment file is missing columns: {", ".join(missing)}')
+    reader.fieldnames = columns
+    
+    payments = []
+    invalid = []
+    for line, row in enumerate(reader, start=2):
+        if len(payments) + len(invalid) >= Config.MAX_PAYMENT_FILE_ROWS:
+            raise ValueError(f'Payment file exceeds {Config.MAX_PAYMENT_FILE_ROWS} rows')
+        employee_id = (row.get('employee_id') or '').strip()
+        reference = (row.get('reference') or '').strip()
+        try:
+            amount = round(float((row.get('amount') or '').replace(',', '')), 2)
+        except ValueError:
+            amount = None
+        if not employee_id or amount is None or not reference:
+            invalid.append({'line': line, 'employee_id': employee_id, 'reason': 'invalid_row'})
+            continue
+        payments.append({'line': line, 'employee_id': employee_id, 'amount': amount, 'reference': reference})
+    return payments, invalid
+
+
+def reconcile_payments(payments, month_year, paid_by, dry_run=False):
+    """Match payments to a month's payslips and mark the matches Paid.
+
+    Payslips are fetched with one $in query and updated with one
+    unordered bulk_write. A payslip is paid by the first row whose amount
+    matches it. Every other row is returned as a mismatch with its reason,
+    its amount compared against the payslip, and a `duplicate` flag, kept
+    apart from the reason, for employees that appear on earlier rows.
+    Returns the reconciliation summary and the list of mismatched rows.
+    """
+    payslips = {
+        p['employee_id']: p for p in db.payslips.find(
+            {'month_year': month_year, 'employee_id': {'$in': list({p['employee_id'] for p in payments})}},
+            {'employee_id': 1, 'net_salary': 1, 'status': 1}
+        )
+    }
+    
+    batch_id = str(ObjectId())
+    now = datetime.utcnow()
+    seen = set()
+    paid_in_file = set()
+    duplicate_rows = 0
+    mismatches = []
+    operations = []
+    matched_amount = 0
+    for payment in payments:
+        employee_id = payment['employee_id']
+        payslip = payslips.get(employee_id)
+        row = {
+            'line': payment['line'],
+            'employee_id': employee_id,
+            'amount': payment['amount'],
+            'duplicate': employee_id in seen
+        }
+        seen.add(employee_id)
+        if row['duplicate']:
+            duplicate_rows += 1
+        
+        if not payslip:
+            mismatches.append({**row, 'reason': 'payslip_not_found'})
+            continue
+        
+        expected = payslip.get('net_salary', 0)
+        row['expected'] = expected
+        row['difference'] = round(payment['amount'] - expected, 2)
+        row['amount_matches'] = abs(row['difference']) <= PAYMENT_AMOUNT_TOLERANCE
+        
+        reason = None
+        if payslip.get('status') == 'Paid':
+            reason = 'already_paid'
+        elif not row['amount_matches']:
+            reason = 'amount_mismatch'
+        elif employee_id in paid_in_file:
+            reason = 'duplicate_payment'
+        
+        if reason:
+            mismatches.append({**row, 'reason': reason})
+            continue
+        
+        paid_in_file.add(employee_id)
+        matched_amount += payment['amount']
+        operations.append(UpdateOne(
+            {'_id': payslip['_id'], 'status': {'$ne': 'Paid'}},
+            {'$set': {
+                'status': 'Paid',
+                'paid_on': now,
+                'paid_by': paid_by,
+                'payment_reference': payment['reference'],
+                'payment_batch': batch_id
+            }}
+        ))
+    
+    marked = 0
+    if operations and not dry_run:
+        marked = db.payslips.bulk_write(operations, ordered=False).modified_count
+        bump_version('payslips')
+        invalidate_ai_context()
+    
+    return {
+        'batch_id': None if dry_run else batch_id,
+        'month_year': month_year,
+        'rows': len(payments),
+        'matched': len(operations),
+        'marked_paid': marked,
+        'matched_amount': round(matched_amount, 2),
+        'mismatched': len(mismatches),
+        'duplicate_rows': duplicate_rows,
+        'dry_run': dry_run
+    }, mismatches
+
+
+def valid_month_year(month_year):
+    """Whether month_year is a YYYY-MM string"""
+    try:
+        datetime.strptime(month_year or '', '%Y-%m')
+        return True
+    except ValueError:
+        return False
+
+
+def compute_payslip(employee, month_year, created_by=None, now=None, proration=None):
+    """Build the payslip document for an employee's salary snapshot.
+
+    proration (see utils.proration) adds loss of pay for unpaid leave,
+    absences and half-days. Returns None when the employee has no salary
+    configured.
+    """
+    salary = employee.get('salary') or {}
+    if not salary.get('net'):
+        return None
+    
+    proration = proration or {}
+    basic = salary.get('basic', 0)
+    hra = salary.get('hra', 0)
+    allowances = salary.get('allowances', 0)
+    deductions = salary.get('deductions', 0)
+    gross = gross_salary(salary)
+    loss_of_pay = proration.get('loss_of_pay', 0)
+    net_salary = max(round(gross - deductions - loss_of_pay, 2), 0)
+    
+    return {
+        'employee_id': employee['employee_id'],
+        'employee_name': employee.get('name', ''),
+        'employee_email': employee.get('email', ''),
+        'month_year': month_year,
+        'basic': basic,
+        'hra': hra,
+        'allowances': allowances,
+        'deductions': deductions,
+        'gross_salary': gross,
+        'working_days': proration.get('working_days'),
+        'payable_days': proration.get('payable_days'),
+        'loss_of_pay_days': proration.get('loss_of_pay_days', 0),
+        'loss_of_pay': loss_of_pay,
+        'net_salary': net_salary,
+        'status': 'Generated',
+        'created_at': now or datetime.utcnow(),
+        'created_by': created_by
+    }
+
+
+def build_payslip_query(employee_id=None, month_year=None, status=None):
+    """Build the payslip filter shared by the admin list and reports"""
+    query = {}
+    if employee_id:
+        query['employee_id'] = employee_id
+    if month_year:
+        query['month_year'] = month_year
+    if status:
+        query['status'] = status
+    return query
+
+
+# Register columns shared by the streaming export and the payroll_register report job
+PAYROLL_REGISTER_COLUMNS = [
+    'employee_id', 'employee_name', 'month_year', 'basic', 'hra', 'allowances',
+    'deductions', 'gross_salary', 'payable_days', 'loss_of_pay', 'net_salary', 'status', 'paid_on'
+]
+
+REGISTER_EXPORT_PROJECTION = {field: 1 for field in PAYROLL_REGISTER_COLUMNS + ['created_at']}
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def register_cursor(query):
+    """Cursor over register rows in employee order, fetched in large batches"""
+    return db.payslips.find(query, REGISTER_EXPORT_PROJECTION).sort('employee_id', 1).batch_size(Config.EXPORT_BATCH_SIZE)
+
+
+def stream_register_csv(query):
+    """Yield the register as CSV text, one cursor batch at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(PAYROLL_REGISTER_COLUMNS)
+    for payslip in register_cursor(query):
+        row = format_payslip(payslip)
+        writer.writerow([row[c] for c in PAYROLL_REGISTER_COLUMNS])
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_register_xlsx(query):
+    """Yield the register as an XLSX workbook.
+
+    XLSX is a zip archive, so it cannot be emitted row by row; the workbook
+    is written in xlsxwriter's constant_memory mode to a temporary file,
+    which is then streamed in chunks.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        workbook = xlsxwriter.Workbook(tmp, {'constant_memory': True})
+        sheet = workbook.add_worksheet('Register')
+        sheet.write_row(0, 0, PAYROLL_REGISTER_COLUMNS)
+        for index, payslip in enumerate(register_cursor(query), start=1):
+            row = format_payslip(payslip)
+            sheet.write_row(index, 0, [row[c] for c in PAYROLL_REGISTER_COLUMNS])
+        workbook.close()
+        
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def format_payslip(payslip):
+    """Serialize a payslip for admin views"""
+    return {
+        'id': str(payslip['_id']),
+        'employee_id': payslip['employee_id'],
+        'employee_name': payslip.get('employee_name', ''),
+        'month_year': payslip['month_year'],
+        'basic': payslip.get('basic', 0),
+        'hra': payslip.get('hra', 0),
+        'allowances': payslip.get('allowances', 0),
+        'deductions': payslip.get('deductions', 0),
+        'gross_salary': payslip.get('gross_salary', 0),
+        'payable_days': payslip.get('payable_days'),
+        'loss_of_pay': payslip.get('loss_of_pay', 0),
+        'net_salary': payslip.get('net_salary', 0),
+        'status': payslip.get('status', 'Generated'),
+        'paid_on': payslip.get('paid_on').isoformat() if payslip.get('paid_on') else None,
+        'created_at': payslip.get('created_at').isoformat() if payslip.get('created_at') else None
+    }
+
 
 @payroll_bp.route('/my-payslips', methods=['GET'])
 @jwt_required()
@@ -31,6 +423,9 @@ def get_my_payslips():
                 'allowances': payslip.get('allowances', 0),
                 'deductions': payslip.get('deductions', 0),
                 'gross_salary': payslip.get('gross_salary', 0),
+                'working_days': payslip.get('working_days'),
+                'payable_days': payslip.get('payable_days'),
+                'loss_of_pay': payslip.get('loss_of_pay', 0),
                 'net_salary': payslip.get('net_salary', 0),
                 'status': payslip.get('status', 'Pending'),
                 'paid_on': payslip.get('paid_on').isoformat() if payslip.get('paid_on') else None,
@@ -44,6 +439,37 @@ def get_my_payslips():
         return jsonify({'error': 'An error occurred'}), 500
 
 
+@payroll_bp.route('/payslip/<payslip_id>/pdf', methods=['GET'])
+@jwt_required()
+def download_payslip_pdf(payslip_id):
+    """Download a payslip as PDF (own payslips, or any for admin)"""
+    try:
+        identity = get_jwt_identity()
+        
+        payslip = db.payslips.find_one({'_id': ObjectId(payslip_id)})
+        
+        if not payslip:
+            return jsonify({'error': 'Payslip not found'}), 404
+        
+        if identity.get('role') != 'admin' and payslip['employee_id'] != identity.get('employee_id'):
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        data, content_hash = payslip_pdfs.get_pdf(payslip)
+        
+        return send_file(
+            io.BytesIO(data),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f"payslip_{payslip['employee_id']}_{payslip['month_year']}.pdf",
+            etag=content_hash,
+            conditional=True
+        )
+        
+    except Exception as e:
+        print(f"Download payslip PDF error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
 @payroll_bp.route('/admin/employees', methods=['GET'])
 @jwt_required()
 def get_payroll_employees():
@@ -55,6 +481,11 @@ def get_payroll_employees():
             return jsonify({'error': 'Admin access required'}), 403
         
         search = request.args.get('search', '')
+        cursor = request.args.get('cursor')
+        try:
+            limit = page_limit(request.args.get('limit'), 100, MAX_PAYROLL_EMPLOYEES_PAGE)
+        except InvalidLimit as e:
+            return jsonify({'error': str(e)}), 400
         
         query = {'role': 'employee'}
         
@@ -65,7 +496,12 @@ def get_payroll_employees():
                 {'employee_id': {'$regex': search, '$options': 'i'}}
             ]
         
-        employees = list(db.users.find(query))
+        try:
+            employees, next_cursor = paginate(
+                db.users, query, 'name', limit, cursor=cursor, projection=PAYROLL_EMPLOYEE_PROJECTION
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
         
         result = []
         for emp in employees:
@@ -79,13 +515,82 @@ def get_payroll_employees():
                 'is_verified': emp.get('is_verified', False)
             })
         
-        return jsonify({'employees': result}), 200
+        return jsonify({'employees': result, 'next_cursor': next_cursor}), 200
         
     except Exception as e:
         print(f"Get payroll employees error: {e}")
         return jsonify({'error': 'An error occurred'}), 500
 
 
+@payroll_bp.route('/admin/summary', methods=['GET'])
+@jwt_required()
+@conditional_get('users', 'payslips')
+def get_payroll_summary():
+    """Payroll totals, department breakdown and monthly trend (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        months = min(int(request.args.get('months', 6)), 24)
+        end_month = request.args.get('end_month')
+        
+        if end_month and not valid_month_year(end_month):
+            return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
+        
+        return jsonify({
+            'salary': salary_summary(),
+            'months': payslip_month_summary(months, end_month)
+        }), 200
+        
+    except Exception as e:
+        print(f"Get payroll summary error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+MAX_SCENARIOS = 20
+
+
+@payroll_bp.route('/admin/simulate', methods=['POST'])
+@jwt_required()
+def simulate_compensation():
+    """Compare the cost of compensation scenarios against today's payroll (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        data = request.get_json() or {}
+        scenarios = data.get('scenarios') or []
+        
+        if not scenarios or not isinstance(scenarios, list):
+            return jsonify({'error': 'At least one scenario is required'}), 400
+        
+        if len(scenarios) > MAX_SCENARIOS:
+            return jsonify({'error': f'At most {MAX_SCENARIOS} scenarios can be compared at once'}), 400
+        
+        table = get_compensation_table()
+        
+        started = time.perf_counter()
+        try:
+            results = [table.simulate(scenario) for scenario in scenarios]
+        except (ScenarioError, AttributeError, TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid scenario: {e}'}), 400
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        
+        return jsonify({
+            'baseline': table.baseline(),
+            'scenarios': results,
+            'elapsed_ms': elapsed_ms
+        }), 200
+        
+    except Exception as e:
+        print(f"Simulate compensation error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
 @payroll_bp.route('/admin/generate-payslip', methods=['POST'])
 @jwt_required()
 def generate_payslip():
@@ -103,58 +608,34 @@ def generate_payslip():
         if not employee_id or not month_year:
             return jsonify({'error': 'Employee ID and month are required'}), 400
         
+        if not valid_month_year(month_year):
+            return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
+        
         # Get employee salary info
-        employee = db.users.find_one({'employee_id': employee_id})
+        employee = db.users.find_one({'employee_id': employee_id}, SALARY_SNAPSHOT_PROJECTION)
         
         if not employee:
             return jsonify({'error': 'Employee not found'}), 404
         
-        salary = employee.get('salary', {})
+        proration = prorate([employee], month_year)[employee_id]
+        payslip = compute_payslip(employee, month_year, identity.get('email') or identity.get('employee_id'), proration=proration)
         
-        if not salary.get('net'):
+        if not payslip:
             return jsonify({'error': 'Employee salary not configured'}), 400
         
-        # Check if payslip already exists for this month
-        existing = db.payslips.find_one({
-            'employee_id': employee_id,
-            'month_year': month_year
-        })
-        
-        if existing:
+        # The unique (employee_id, month_year) index rejects duplicates atomically
+        try:
+            result = db.payslips.insert_one(payslip)
+        except DuplicateKeyError:
             return jsonify({'error': f'Payslip already exists for {month_year}'}), 400
-        
-        # Calculate gross salary
-        basic = salary.get('basic', 0)
-        hra = salary.get('hra', 0)
-        allowances = salary.get('allowances', 0)
-        deductions = salary.get('deductions', 0)
-        gross_salary = basic + hra + allowances
-        net_salary = gross_salary - deductions
-        
-        # Create payslip
-        payslip = {
-            'employee_id': employee_id,
-            'employee_name': employee.get('name', ''),
-            'employee_email': employee.get('email', ''),
-            'month_year': month_year,
-            'basic': basic,
-            'hra': hra,
-            'allowances': allowances,
-            'deductions': deductions,
-            'gross_salary': gross_salary,
-            'net_salary': net_salary,
-            'status': 'Generated',
-            'created_at': datetime.utcnow(),
-            'created_by': identity.get('email') or identity.get('employee_id')
-        }
-        
-        result = db.payslips.insert_one(payslip)
+        bump_version('payslips')
+        invalidate_ai_context([employee_id])
         
         return jsonify({
             'message': 'Payslip generated successfully',
             'payslip_id': str(result.inserted_id),
             'month_year': month_year,
-            'net_salary': net_salary
+            'net_salary': payslip['net_salary']
         }), 201
         
     except Exception as e:
@@ -164,6 +645,7 @@ def generate_payslip():
 
 @payroll_bp.route('/admin/payslips', methods=['GET'])
 @jwt_required()
+@conditional_get('payslips')
 def get_all_payslips():
     """Get all payslips (Admin only)"""
     try:
@@ -177,33 +659,11 @@ def get_all_payslips():
         status = request.args.get('status')
         limit = int(request.args.get('limit', 100))
         
-        query = {}
-        if employee_id:
-            query['employee_id'] = employee_id
-        if month_year:
-            query['month_year'] = month_year
-        if status:
-            query['status'] = status
+        query = build_payslip_query(employee_id=employee_id, month_year=month_year, status=status)
         
         payslips = list(db.payslips.find(query).sort('created_at', -1).limit(limit))
         
-        result = []
-        for payslip in payslips:
-            result.append({
-                'id': str(payslip['_id']),
-                'employee_id': payslip['employee_id'],
-                'employee_name': payslip.get('employee_name', ''),
-                'month_year': payslip['month_year'],
-                'basic': payslip.get('basic', 0),
-                'hra': payslip.get('hra', 0),
-                'allowances': payslip.get('allowances', 0),
-                'deductions': payslip.get('deductions', 0),
-                'gross_salary': payslip.get('gross_salary', 0),
-                'net_salary': payslip.get('net_salary', 0),
-                'status': payslip.get('status', 'Generated'),
-                'paid_on': payslip.get('paid_on').isoformat() if payslip.get('paid_on') else None,
-                'created_at': payslip.get('created_at').isoformat() if payslip.get('created_at') else None
-            })
+        result = [format_payslip(payslip) for payslip in payslips]
         
         return jsonify({'payslips': result}), 200
         
@@ -212,6 +672,43 @@ def get_all_payslips():
         return jsonify({'error': 'An error occurred'}), 500
 
 
+@payroll_bp.route('/admin/register/export', methods=['GET'])
+@jwt_required()
+def export_payroll_register():
+    """Stream a month's payroll register as CSV or XLSX (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        month_year = request.args.get('month_year')
+        export_format = request.args.get('format', 'csv').lower()
+        
+        if not valid_month_year(month_year):
+            return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
+        
+        if export_format not in ['csv', 'xlsx']:
+            return jsonify({'error': 'Invalid format. Must be csv or xlsx'}), 400
+        
+        query = build_payslip_query(month_year=month_year, status=request.args.get('status'))
+        
+        if export_format == 'xlsx':
+            generator = stream_register_xlsx(query)
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        else:
+            generator = stream_register_csv(query)
+            mimetype = 'text/csv'
+        
+        response = Response(stream_with_context(generator), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="payroll_register_{month_year}.{export_format}"'
+        return response
+        
+    except Exception as e:
+        print(f"Export payroll register error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
 @payroll_bp.route('/admin/payslip/<payslip_id>/mark-paid', methods=['POST'])
 @jwt_required()
 def mark_payslip_paid(payslip_id):
@@ -238,9 +735,194 @@ def mark_payslip_paid(payslip_id):
                 'paid_by': identity.get('email') or identity.get('employee_id')
             }}
         )
+        bump_version('payslips')
+        invalidate_ai_context([payslip.get('employee_id')])
         
         return jsonify({'message': 'Payslip marked as paid'}), 200
         
     except Exception as e:
         print(f"Mark payslip paid error: {e}")
         return jsonify({'error': 'An error occurred'}), 500
+
+
+@register_job('payroll_run')
+def run_payroll(job):
+    """Generate every employee's payslip for a month.
+
+    Salaries are snapshotted with one projected scan, prorated against the
+    month's attendance in one vectorized pass, computed in memory and
+    written with unordered insert_many in chunks. The unique
+    (employee_id, month_year) index makes the run resumable: rerunning after
+    a crash skips payslips that were already written.
+    """
+    month_year = job.params['month_year']
+    created_by = job.params.get('created_by')
+    now = datetime.utcnow()
+    
+    employees = list(db.users.find({'role': 'employee'}, SALARY_SNAPSHOT_PROJECTION))
+    job.set_total(len(employees))
+    
+    existing = set(db.payslips.distinct('employee_id', {'month_year': month_year}))
+    pending = [e for e in employees if e.get('employee_id') and e['employee_id'] not in existing]
+    proration = prorate(pending, month_year, all_employees=len(pending) == len(employees))
+    payslips = []
+    unconfigured = 0
+    for employee in pending:
+        payslip = compute_payslip(employee, month_year, created_by, now, proration[employee['employee_id']])
+        if payslip:
+            payslip['payroll_run'] = str(job.job_id)
+            payslips.append(payslip)
+        else:
+            unconfigured += 1
+    job.advance(len(employees) - len(payslips))
+    
+    generated = 0
+    duplicates = 0
+    chunk_size = Config.PAYROLL_INSERT_CHUNK_SIZE
+    for i in range(0, len(payslips), chunk_size):
+        chunk = payslips[i:i + chunk_size]
+        try:
+            generated += len(db.payslips.insert_many(chunk, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Payslips written concurrently (e.g. a single generate call) are skipped
+            errors = e.details.get('writeErrors', [])
+            if any(err.get('code') != 11000 for err in errors):
+                raise
+            duplicates += len(errors)
+            generated += e.details.get('nInserted', 0)
+        job.advance(len(chunk))
+    
+    if generated:
+        bump_version('payslips')
+        invalidate_ai_context()
+    
+    # Pre-render PDFs so payday downloads are served from the cache
+    rendered = 0
+    if Config.PAYROLL_PRERENDER_PDFS:
+        job.set_total(job.total + db.payslips.count_documents({'month_year': month_year}))
+        batch = []
+        for payslip in db.payslips.find({'month_year': month_year}).batch_size(chunk_size):
+            batch.append(payslip)
+            if len(batch) >= chunk_size:
+                rendered += payslip_pdfs.prerender(batch, job)
+                batch = []
+        if batch:
+            rendered += payslip_pdfs.prerender(batch, job)
+    
+    return {
+        'month_year': month_year,
+        'employees': len(employees),
+        'generated': generated,
+        'already_generated': len(existing) + duplicates,
+        'salary_not_configured': unconfigured,
+        'pdfs_rendered': rendered
+    }
+
+
+@payroll_bp.route('/admin/runs', methods=['POST'])
+@jwt_required()
+def start_payroll_run():
+    """Queue a payroll run generating all payslips for a month (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        data = request.get_json() or {}
+        month_year = data.get('month_year')
+        
+        if not valid_month_year(month_year):
+            return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
+        
+        active = db.jobs.find_one({
+            'type': 'payroll_run',
+            'params.month_year': month_year,
+            'status': {'$in': ['queued', 'running']}
+        }, {'_id': 1})
+        
+        if active:
+            return jsonify({'error': f'A payroll run for {month_year} is already in progress', 'job_id': str(active['_id'])}), 409
+        
+        created_by = identity.get('email') or identity.get('employee_id')
+        job_id = job_manager.submit('payroll_run', {'month_year': month_year, 'created_by': created_by}, created_by=created_by)
+        
+        return jsonify({
+            'message': 'Payroll run queued',
+            'job_id': str(job_id),
+            'month_year': month_year
+        }), 202
+        
+    except Exception as e:
+        print(f"Start payroll run error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@payroll_bp.route('/admin/runs', methods=['GET'])
+@jwt_required()
+def list_payroll_runs():
+    """List payroll runs with progress (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        query = {'type': 'payroll_run'}
+        if request.args.get('month_year'):
+            query['params.month_year'] = request.args.get('month_year')
+        limit = int(request.args.get('limit', 12))
+        
+        runs = db.jobs.find(query, {'traceback': 0}).sort('created_at', -1).limit(limit)
+        
+        return jsonify({'runs': [serialize_job(run) for run in runs]}), 200
+        
+    except Exception as e:
+        print(f"List payroll runs error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@payroll_bp.route('/admin/payments/reconcile', methods=['POST'])
+@jwt_required()
+def reconcile_payment_file():
+    """Mark payslips paid from a bank payment CSV (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        month_year = request.form.get('month_year')
+        if not valid_month_year(month_year):
+            return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
+        
+        dry_run = request.form.get('dry_run', 'false').lower() == 'true'
+        
+        try:
+            payments, invalid = read_payment_file(file.stream)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return jsonify({'error': f'Invalid payment file: {e}'}), 400
+        
+        summary, mismatches = reconcile_payments(
+            payments, month_year, identity.get('email') or identity.get('employee_id'), dry_run
+        )
+        mismatches = sorted(invalid + mismatches, key=lambda m: m['line'])
+        summary['invalid_rows'] = len(invalid)
+        
+        return jsonify({
+            'message': 'Payment file reconciled' if not dry_run else 'Payment file checked',
+            'summary': summary,
+            'mismatches': mismatches[:MAX_REPORTED_MISMATCHES],
+            'mismatches_truncated': len(mismatches) > MAX_REPORTED_MISMATCHES
+        }), 200
+        
+    except Exception as e:
+        print(f"Reconcile payment file error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
@@ -0,0 +1,250 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+from bson import ObjectId
+from database import db
+from config import Config
+from routes.admin import build_attendance_query, format_attendance_record, get_employee_names
+from routes.payroll import build_payslip_query, format_payslip, PAYROLL_REGISTER_COLUMNS
+from routes.leave import build_leave_query
+from utils.jobs import job_manager, register_job, results_bucket, serialize_job
+
+reports_bp = Blueprint('reports', __name__)
+
+BATCH_SIZE = 1000
+
+# Jobs that can be queued as reports; other job types (payroll runs, timesheet
+# drafts) have their own endpoints with their own validation
+REPORT_TYPES = {'attendance', 'payroll_register', 'leave_utilization'}
+
+
+def _batches(cursor, size=BATCH_SIZE):
+    """Yield lists of documents from a cursor"""
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@register_job('attendance')
+def build_attendance_report(job):
+    """Attendance records for a date range (e.g. a full year)"""
+    params = job.params
+    query = build_attendance_query(
+        employee_id=params.get('employee_id'),
+        start_date=params.get('start_date'),
+        end_date=params.get('end_date')
+    )
+    job.set_total(db.attendance.count_documents(query))
+    
+    columns = ['employee_id', 'employee_name', 'date', 'check_in', 'check_out', 'total_hours', 'status', 'mode']
+    job.open_result(f"attendance_{params.get('start_date', 'all')}_{params.get('end_date', 'all')}.csv", columns)
+    
+    cursor = db.attendance.find(query).sort([('date', 1), ('employee_id', 1)]).batch_size(BATCH_SIZE)
+    for batch in _batches(cursor):
+        names = get_employee_names(set(r['employee_id'] for r in batch))
+        rows = [format_attendance_record(r, names) for r in batch]
+        job.write_rows([[row[c] for c in columns] for row in rows])
+        job.advance(len(batch))
+    
+    return {'records': job.processed}
+
+
+@register_job('payroll_register')
+def build_payroll_register(job):
+    """Payroll register (every payslip) for a month"""
+    params = job.params
+    query = build_payslip_query(month_year=params.get('month_year'), status=params.get('status'))
+    job.set_total(db.payslips.count_documents(query))
+    
+    columns = PAYROLL_REGISTER_COLUMNS
+    job.open_result(f"payroll_register_{params.get('month_year', 'all')}.csv", columns)
+    
+    total_net = 0
+    cursor = db.payslips.find(query).sort('employee_id', 1).batch_size(BATCH_SIZE)
+    for batch in _batches(cursor):
+        rows = [format_payslip(p) for p in batch]
+        total_net += sum(row['net_salary'] for row in rows)
+        job.write_rows([[row[c] for c in columns] for row in rows])
+        job.advance(len(batch))
+    
+    return {'payslips': job.processed, 'total_net': total_net}
+
+
+@register_job('leave_utilization')
+def build_leave_utilization(job):
+    """Leave days taken per employee and leave type within a date range"""
+    params = job.params
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    query = build_leave_query(status='Approved', start_date=start_date, end_date=end_date)
+    job.set_total(db.leaves.count_documents(query))
+    
+    range_start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+    range_end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else None
+    
+    usage = {}
+    names = {}
+    projection = {'employee_id': 1, 'employee_name': 1, 'leave_type': 1, 'start_date': 1, 'end_date': 1}
+    cursor = db.leaves.find(query, projection).batch_size(BATCH_SIZE)
+    for batch in _batches(cursor):
+        for leave in batch:
+            start = datetime.strptime(leave['start_date'], '%Y-%m-%d')
+            end = datetime.strptime(leave['end_date'], '%Y-%m-%d')
+            if range_start:
+                start = max(start, range_start)
+            if range_end:
+                end = min(end, range_end)
+            days = (end - start).days + 1
+            if days <= 0:
+                continue
+            key = (leave['employee_id'], leave['leave_type'])
+            usage[key] = usage.get(key, 0) + days
+            names[leave['employee_id']] = leave.get('employee_name', '')
+        job.advance(len(batch))
+    
+    columns = ['employee_id', 'employee_name', 'leave_type', 'days']
+    job.open_result(f"leave_utilization_{start_date or 'all'}_{end_date or 'all'}.csv", columns)
+    for (employee_id, leave_type), days in sorted(usage.items()):
+        job.write_rows([[employee_id, names.get(employee_id, ''), leave_type, days]])
+    
+    return {'employees': len(names), 'total_days': sum(usage.values())}
+
+
+@reports_bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def create_report_job():
+    """Queue a background report job (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        data = request.get_json() or {}
+        job_type = data.get('type')
+        params = data.get('params', {})
+        
+        if job_type not in REPORT_TYPES:
+            return jsonify({'error': f'Invalid report type. Must be one of: {", ".join(sorted(REPORT_TYPES))}'}), 400
+        
+        job_id = job_manager.submit(job_type, params, created_by=identity.get('email'))
+        
+        return jsonify({
+            'message': 'Report job queued',
+            'job_id': str(job_id),
+            'status': 'queued'
+        }), 202
+        
+    except Exception as e:
+        print(f"Create report job error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@reports_bp.route('/jobs', methods=['GET'])
+@jwt_required()
+def list_report_jobs():
+    """List recent report jobs (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        limit = int(request.args.get('limit', 20))
+        query = {}
+        if request.args.get('type'):
+            query['type'] = request.args.get('type')
+        
+        jobs = db.jobs.find(query, {'traceback': 0}).sort('created_at', -1).limit(limit)
+        
+        return jsonify({'jobs': [serialize_job(job) for job in jobs]}), 200
+        
+    except Exception as e:
+        print(f"List report jobs error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@reports_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_report_job(job_id):
+    """Get job status and progress (Admin only)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        job = db.jobs.find_one({'_id': ObjectId(job_id)}, {'traceback': 0})
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify(serialize_job(job)), 200
+        
+    except Exception as e:
+        print(f"Get report job error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@reports_bp.route('/jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+def download_report(job_id):
+    """Download a finished report; supports Range requests for resuming"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        job = db.jobs.find_one({'_id': ObjectId(job_id)}, {'status': 1, 'result': 1})
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        if job['status'] != 'completed' or not job.get('result'):
+            return jsonify({'error': 'Report is not ready yet', 'status': job['status']}), 409
+        
+        grid_out = results_bucket().open_download_stream(job['result']['file_id'])
+        length = grid_out.length
+        start, stop = 0, length
+        status = 200
+        
+        if request.range:
+            byte_range = request.range.range_for_length(length)
+            if byte_range is None:
+                grid_out.close()
+                return jsonify({'error': 'Requested range not satisfiable'}), 416
+            start, stop = byte_range
+            status = 206
+        
+        grid_out.seek(start)
+        
+        def generate():
+            remaining = stop - start
+            try:
+                while remaining > 0:
+                    chunk = grid_out.read(min(Config.JOB_RESULT_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            finally:
+                grid_out.close()
+        
+        response = Response(stream_with_context(generate()), status=status, mimetype='text/csv')
+        response.headers['Content-Length'] = str(stop - start)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Content-Disposition'] = f'attachment; filename="{grid_out.filename}"'
+        if status == 206:
+            response.content_range = f'bytes {start}-{stop - 1}/{length}'
+        
+        return response
+        
+    except Exception as e:
+        print(f"Download report error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
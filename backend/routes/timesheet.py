@@ -2,7 +2,17 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from database import db
+from config import Config
+from bson import ObjectId
 from utils.email_service import send_timesheet_notification
+from utils.http_cache import conditional_get, bump_version
+from utils.notifications import notification_queue
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+from utils.jobs import register_job, job_manager
+from utils.managers import assign_manager
+from utils.cache import TTLCache
+from utils.ai_context import invalidate_ai_context
 
 timesheet_bp = Blueprint('timesheet', __name__)
 
@@ -20,6 +30,229 @@ def get_week_dates(date=None):
     return start_of_week.strftime('%Y-%m-%d'), end_of_week.strftime('%Y-%m-%d')
 
 
+# List views return summaries; attendance_records are loaded per timesheet on demand
+TIMESHEET_SUMMARY_PROJECTION = {
+    'employee_id': 1,
+    'employee_name': 1,
+    'week_start': 1,
+    'week_end': 1,
+    'status': 1,
+    'total_hours': 1,
+    'submitted_at': 1,
+    'reviewed_at': 1,
+    'comments': 1,
+    'record_count': {'$size': {'$ifNull': ['$attendance_records', []]}}
+}
+
+MAX_BATCH_DETAILS = 100
+
+DRAFT_BATCH_SIZE = 1000
+
+# Managers are seeded at startup and rarely change, so the active list is reused in process
+managers_cache = TTLCache(ttl=Config.MANAGER_CACHE_TTL)
+
+
+def get_active_managers():
+    """Active managers as {manager_id: {'manager_id', 'name', 'email'}}"""
+    return managers_cache.get_or_set('active', lambda: {
+        m['manager_id']: m for m in db.managers.find(
+            {'is_active': True},
+            {'_id': 0, 'manager_id': 1, 'name': 1, 'email': 1}
+        )
+    })
+
+
+def get_week_statuses(employee_id, *week_starts):
+    """Timesheet status per week_start for an employee, fetched in one covered query"""
+    return {
+        ts['week_start']: ts['status'] for ts in db.timesheets.find(
+            {'employee_id': employee_id, 'week_start': {'$in': list(week_starts)}},
+            {'_id': 0, 'week_start': 1, 'status': 1}
+        )
+    }
+
+
+def format_timesheet(ts, include_records=False):
+    """Serialize a timesheet for manager views"""
+    result = {
+        'id': str(ts['_id']),
+        'employee_id': ts['employee_id'],
+        'employee_name': ts.get('employee_name'),
+        'week_start': ts['week_start'],
+        'week_end': ts['week_end'],
+        'status': ts['status'],
+        'total_hours': ts.get('total_hours', 0),
+        'record_count': ts.get('record_count', len(ts.get('attendance_records', []))),
+        'submitted_at': ts.get('submitted_at').isoformat() if ts.get('submitted_at') else None,
+        'reviewed_at': ts.get('reviewed_at').isoformat() if ts.get('reviewed_at') else None,
+        'comments': ts.get('comments', '')
+    }
+    if include_records:
+        result['attendance_records'] = ts.get('attendance_records', [])
+    return result
+
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+
+def week_attendance(employee_id, week_start, week_end):
+    """An employee's attendance records for a week, shaped for a timesheet, and their total hours"""
+    attendance_records = list(db.attendance.find({
+        'employee_id': employee_id,
+        'date': {'$gte': week_start, '$lte': week_end}
+    }).sort('date', 1))
+    
+    attendance_data = [{
+        'date': record['date'],
+        'check_in': record.get('check_in'),
+        'check_out': record.get('check_out'),
+        'total_hours': record.get('total_hours', 0),
+        'status': record.get('status', 'Absent')
+    } for record in attendance_records]
+    
+    total_hours = sum(a['total_hours'] or 0 for a in attendance_data)
+    return attendance_data, round(total_hours, 2)
+
+
+def draft_is_current(draft):
+    """Whether a draft still reflects the week's attendance.
+
+    Attendance writes stamp attendance_changed_at on the week's draft (see
+    mark_drafts_stale), so a draft is current when it was built after the
+    last such write.
+    """
+    drafted_at = draft.get('drafted_at')
+    changed_at = draft.get('attendance_changed_at')
+    return bool(drafted_at) and (not changed_at or changed_at < drafted_at)
+
+
+def mark_drafts_stale(attendance_days):
+    """Mark the drafts covering the given (employee_id, date) attendance writes as stale"""
+    now = datetime.utcnow()
+    weeks = {(employee_id, get_week_dates(date)[0]) for employee_id, date in attendance_days}
+    if not weeks:
+        return
+    db.timesheets.bulk_write([
+        UpdateOne(
+            {'employee_id': employee_id, 'week_start': week_start, 'status': 'draft'},
+            {'$max': {'attendance_changed_at': now}}
+        )
+        for employee_id, week_start in weeks
+    ], ordered=False)
+
+
+def queue_scheduled_drafts():
+    """Nightly trigger: queue a draft run for the current week unless one is active"""
+    active = db.jobs.find_one({
+        'type': 'draft_timesheets',
+        'status': {'$in': ['queued', 'running']}
+    }, {'_id': 1})
+    if active:
+        return None
+    return job_manager.submit('draft_timesheets', {'start_date': None, 'end_date': None}, created_by='scheduler')
+
+
+@register_job('draft_timesheets')
+def draft_timesheets_job(job):
+    """Job wrapper around draft_timesheets"""
+    return draft_timesheets(job.params.get('start_date'), job.params.get('end_date'), progress=job)
+
+
+def draft_timesheets(start_date=None, end_date=None, progress=None):
+    """Upsert draft timesheets for every employee from one attendance aggregation.
+
+    Attendance in [start_date, end_date] (default: the current week) is
+    grouped by employee and Monday-based week, with totals and records
+    precomputed, so submitting later only flips the draft's status.
+    Weeks that already have a submitted timesheet are left untouched.
+    """
+    if not start_date or not end_date:
+        start_date, end_date = get_week_dates()
+    
+    pipeline = [
+        {'$match': {'date': {'$gte': start_date, '$lte': end_date}}},
+        {'$sort': {'date': 1}},
+        {'$addFields': {'day': {'$dateFromString': {'dateString': '$date', 'format': '%Y-%m-%d'}}}},
+        {'$addFields': {'week_start_day': {'$subtract': [
+            '$day', {'$multiply': [{'$subtract': [{'$isoDayOfWeek': '$day'}, 1]}, MS_PER_DAY]}
+        ]}}},
+        {'$group': {
+            '_id': {
+                'employee_id': '$employee_id',
+                'week_start': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$week_start_day'}},
+                'week_end': {'$dateToString': {'format': '%Y-%m-%d', 'date': {'$add': ['$week_start_day', 6 * MS_PER_DAY]}}}
+            },
+            'total_hours': {'$sum': {'$ifNull': ['$total_hours', 0]}},
+            'attendance_records': {'$push': {
+                'date': '$date',
+                'check_in': '$check_in',
+                'check_out': '$check_out',
+                'total_hours': {'$ifNull': ['$total_hours', 0]},
+                'status': {'$ifNull': ['$status', 'Absent']}
+            }}
+        }},
+        {'$lookup': {
+            'from': 'users',
+            'localField': '_id.employee_id',
+            'foreignField': 'employee_id',
+            'pipeline': [{'$project': {'_id': 0, 'name': 1}}],
+            'as': 'employee'
+        }}
+    ]
+    
+    now = datetime.utcnow()
+    operations = []
+    for row in db.attendance.aggregate(pipeline, allowDiskUse=True):
+        key = row['_id']
+        employee = row['employee'][0] if row['employee'] else {}
+        operations.append(UpdateOne(
+            {'employee_id': key['employee_id'], 'week_start': key['week_start'], 'status': 'draft'},
+            {
+                '$set': {
+                    'employee_name': employee.get('name'),
+                    'week_end': key['week_end'],
+                    'total_hours': round(row['total_hours'], 2),
+                    'attendance_records': row['attendance_records'],
+                    'drafted_at': now
+                },
+                '$setOnInsert': {
+                    'manager_id': None,
+                    'manager_name': None,
+                    'submitted_at': None,
+                    'reviewed_at': None,
+                    'comments': ''
+                }
+            },
+            upsert=True
+        ))
+    
+    if progress:
+        progress.set_total(len(operations))
+    
+    drafted = 0
+    skipped = 0
+    for i in range(0, len(operations), DRAFT_BATCH_SIZE):
+        batch = operations[i:i + DRAFT_BATCH_SIZE]
+        try:
+            result = db.timesheets.bulk_write(batch, ordered=False)
+            drafted += result.upserted_count + result.modified_count
+        except BulkWriteError as e:
+            # Duplicate keys mean the week was already submitted; anything else is a real error
+            errors = e.details.get('writeErrors', [])
+            if any(err.get('code') != 11000 for err in errors):
+                raise
+            skipped += len(errors)
+            drafted += e.details.get('nUpserted', 0) + e.details.get('nModified', 0)
+        if progress:
+            progress.advance(len(batch))
+    
+    if drafted:
+        bump_version('timesheets')
+        invalidate_ai_context()
+    
+    return {'start_date': start_date, 'end_date': end_date, 'drafted': drafted, 'skipped_submitted': skipped}
+
+
 @timesheet_bp.route('/submit', methods=['POST'])
 @jwt_required()
 def submit_timesheet():
@@ -36,7 +269,7 @@ def submit_timesheet():
             return jsonify({'error': 'Manager selection is required'}), 400
         
         # Verify manager exists
-        manager = db.managers.find_one({'manager_id': manager_id, 'is_active': True})
+        manager = get_active_managers().get(manager_id)
         if not manager:
             return jsonify({'error': 'Invalid manager selected'}), 400
         
@@ -52,48 +285,63 @@ def submit_timesheet():
                 'error': 'Timesheet can only be submitted on Friday, Saturday, or Sunday'
             }), 400
         
-        # Check if already submitted
-        existing = db.timesheets.find_one({
-            'employee_id': employee_id,
-            'week_start': week_start
-        })
+        # Current and previous week in one query
+        prev_week_start, _ = get_week_dates(today - timedelta(days=7))
+        statuses = get_week_statuses(employee_id, week_start, prev_week_start)
+        status = statuses.get(week_start)
+        prev_status = statuses.get(prev_week_start)
         
-        if existing:
+        # Check if already submitted
+        if status and status != 'draft':
             return jsonify({
-                'error': f'Timesheet already submitted for this week. Status: {existing["status"]}'
+                'error': f'Timesheet already submitted for this week. Status: {status}'
             }), 400
         
         # Check if previous week timesheet is approved
-        prev_week_start, _ = get_week_dates(today - timedelta(days=7))
-        prev_timesheet = db.timesheets.find_one({
-            'employee_id': employee_id,
-            'week_start': prev_week_start
-        })
-        
-        if prev_timesheet and prev_timesheet.get('status') != 'approved':
+        if prev_status and prev_status not in ['approved', 'draft']:
             return jsonify({
                 'error': 'Previous week timesheet must be approved before submitting new one'
             }), 400
         
-        # Get attendance records for the week
-        attendance_records = list(db.attendance.find({
-            'employee_id': employee_id,
-            'date': {'$gte': week_start, '$lte': week_end}
-        }))
-        
-        # Calculate total hours
-        total_hours = sum(a.get('total_hours', 0) for a in attendance_records)
-        
-        # Prepare attendance data for timesheet
-        attendance_data = []
-        for record in attendance_records:
-            attendance_data.append({
-                'date': record['date'],
-                'check_in': record.get('check_in'),
-                'check_out': record.get('check_out'),
-                'total_hours': record.get('total_hours', 0),
-                'status': record.get('status', 'Absent')
-            })
+        # A current nightly draft already has the week's totals and submitting is a
+        # status flip; a draft marked stale by a later attendance write is recomputed
+        if status == 'draft':
+            draft_filter = {'employee_id': employee_id, 'week_start': week_start, 'status': 'draft'}
+            draft = db.timesheets.find_one(draft_filter, {'drafted_at': 1, 'attendance_changed_at': 1}) or {}
+            
+            update = {
+                'employee_name': employee_name,
+                'manager_id': manager_id,
+                'manager_name': manager['name'],
+                'status': 'pending',
+                'submitted_at': datetime.utcnow()
+            }
+            if not draft_is_current(draft):
+                update['attendance_records'], update['total_hours'] = week_attendance(employee_id, week_start, week_end)
+            
+            submitted = db.timesheets.find_one_and_update(
+                draft_filter,
+                {'$set': update},
+                projection={'total_hours': 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if not submitted:
+                return jsonify({'error': 'Timesheet already submitted for this week'}), 400
+            bump_version('timesheets')
+            invalidate_ai_context([employee_id])
+            if assign_manager(employee_id, manager_id, only_unassigned=True):
+                bump_version('users')
+            
+            return jsonify({
+                'message': 'Timesheet submitted successfully',
+                'week_start': week_start,
+                'week_end': week_end,
+                'manager': manager['name'],
+                'total_hours': submitted.get('total_hours', 0)
+            }), 200
+        
+        # Attendance records and total hours for the week
+        attendance_data, total_hours = week_attendance(employee_id, week_start, week_end)
         
         # Create timesheet
         timesheet = {
@@ -104,7 +352,7 @@ def submit_timesheet():
             'manager_id': manager_id,
             'manager_name': manager['name'],
             'status': 'pending',
-            'total_hours': round(total_hours, 2),
+            'total_hours': total_hours,
             'attendance_records': attendance_data,
             'submitted_at': datetime.utcnow(),
             'reviewed_at': None,
@@ -112,13 +360,18 @@ def submit_timesheet():
         }
         
         db.timesheets.insert_one(timesheet)
+        bump_version('timesheets')
+        invalidate_ai_context([employee_id])
+        # Employees without an assigned manager get the one they submit to
+        if assign_manager(employee_id, manager_id, only_unassigned=True):
+            bump_version('users')
         
         return jsonify({
             'message': 'Timesheet submitted successfully',
             'week_start': week_start,
             'week_end': week_end,
             'manager': manager['name'],
-            'total_hours': round(total_hours, 2)
+            'total_hours': total_hours
         }), 200
         
     except Exception as e:
@@ -141,7 +394,7 @@ def get_timesheet_status():
             'week_start': week_start
         })
         
-        if timesheet:
+        if timesheet and timesheet['status'] != 'draft':
             return jsonify({
                 'submitted': True,
                 'status': timesheet['status'],
@@ -157,7 +410,8 @@ def get_timesheet_status():
         return jsonify({
             'submitted': False,
             'week_start': week_start,
-            'week_end': week_end
+            'week_end': week_end,
+            'draft_total_hours': timesheet.get('total_hours', 0) if timesheet else None
         }), 200
         
     except Exception as e:
@@ -176,7 +430,8 @@ def get_timesheet_history():
         limit = int(request.args.get('limit', 10))
         
         timesheets = list(db.timesheets.find({
-            'employee_id': employee_id
+            'employee_id': employee_id,
+            'status': {'$ne': 'draft'}
         }).sort('week_start', -1).limit(limit))
         
         result = []
@@ -202,6 +457,7 @@ def get_timesheet_history():
 # Manager endpoints
 @timesheet_bp.route('/manager/pending', methods=['GET'])
 @jwt_required()
+@conditional_get('timesheets')
 def get_pending_timesheets():
     """Get pending timesheets for manager"""
     try:
@@ -212,23 +468,14 @@ def get_pending_timesheets():
         
         manager_id = identity['manager_id']
         
+        include_records = request.args.get('include') == 'records'
+        
         timesheets = list(db.timesheets.find({
             'manager_id': manager_id,
             'status': 'pending'
-        }).sort('submitted_at', -1))
+        }, None if include_records else TIMESHEET_SUMMARY_PROJECTION).sort('submitted_at', -1))
         
-        result = []
-        for ts in timesheets:
-            result.append({
-                'id': str(ts['_id']),
-                'employee_id': ts['employee_id'],
-                'employee_name': ts['employee_name'],
-                'week_start': ts['week_start'],
-                'week_end': ts['week_end'],
-                'total_hours': ts.get('total_hours', 0),
-                'attendance_records': ts.get('attendance_records', []),
-                'submitted_at': ts.get('submitted_at').isoformat() if ts.get('submitted_at') else None
-            })
+        result = [format_timesheet(ts, include_records) for ts in timesheets]
         
         return jsonify({'timesheets': result}), 200
         
@@ -239,6 +486,7 @@ def get_pending_timesheets():
 
 @timesheet_bp.route('/manager/all', methods=['GET'])
 @jwt_required()
+@conditional_get('timesheets')
 def get_all_timesheets():
     """Get all timesheets for manager"""
     try:
@@ -255,23 +503,15 @@ def get_all_timesheets():
         if status:
             query['status'] = status
         
-        timesheets = list(db.timesheets.find(query).sort('submitted_at', -1).limit(limit))
+        include_records = request.args.get('include') == 'records'
         
-        result = []
-        for ts in timesheets:
-            result.append({
-                'id': str(ts['_id']),
-                'employee_id': ts['employee_id'],
-                'employee_name': ts['employee_name'],
-                'week_start': ts['week_start'],
-                'week_end': ts['week_end'],
-                'status': ts['status'],
-                'total_hours': ts.get('total_hours', 0),
-                'attendance_records': ts.get('attendance_records', []),
-                'submitted_at': ts.get('submitted_at').isoformat() if ts.get('submitted_at') else None,
-                'reviewed_at': ts.get('reviewed_at').isoformat() if ts.get('reviewed_at') else None,
-                'comments': ts.get('comments', '')
-            })
+        timesheets = list(
+            db.timesheets.find(query, None if include_records else TIMESHEET_SUMMARY_PROJECTION)
+            .sort('submitted_at', -1)
+            .limit(limit)
+        )
+        
+        result = [format_timesheet(ts, include_records) for ts in timesheets]
         
         return jsonify({'timesheets': result}), 200
         
@@ -328,11 +568,14 @@ def review_timesheet():
                 'comments': comments
             }}
         )
+        bump_version('timesheets')
+        invalidate_ai_context([employee_id])
         
-        # Get employee email for notification
-        employee = db.users.find_one({'employee_id': employee_id})
+        # Get employee email and queue the notification
+        employee = db.users.find_one({'employee_id': employee_id}, {'email': 1, 'name': 1})
         if employee:
-            send_timesheet_notification(
+            notification_queue.enqueue(
+                send_timesheet_notification,
                 employee['email'],
                 employee['name'],
                 new_status,
@@ -349,3 +592,215 @@ def review_timesheet():
     except Exception as e:
         print(f"Review timesheet error: {e}")
         return jsonify({'error': 'An error occurred'}), 500
+
+
+@timesheet_bp.route('/manager/timesheet/<timesheet_id>', methods=['GET'])
+@jwt_required()
+def get_timesheet_detail(timesheet_id):
+    """Get one timesheet with its attendance records"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'manager':
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        timesheet = db.timesheets.find_one({
+            '_id': ObjectId(timesheet_id),
+            'manager_id': identity['manager_id']
+        })
+        
+        if not timesheet:
+            return jsonify({'error': 'Timesheet not found'}), 404
+        
+        return jsonify(format_timesheet(timesheet, include_records=True)), 200
+        
+    except Exception as e:
+        print(f"Get timesheet detail error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@timesheet_bp.route('/manager/details', methods=['POST'])
+@jwt_required()
+def get_timesheet_details():
+    """Get attendance records for several timesheets in one request"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'manager':
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        data = request.get_json() or {}
+        timesheet_ids = data.get('ids') or []
+        
+        if not timesheet_ids:
+            return jsonify({'error': 'Timesheet IDs are required'}), 400
+        
+        if len(timesheet_ids) > MAX_BATCH_DETAILS:
+            return jsonify({'error': f'At most {MAX_BATCH_DETAILS} timesheets can be fetched at once'}), 400
+        
+        try:
+            object_ids = [ObjectId(timesheet_id) for timesheet_id in timesheet_ids]
+        except Exception:
+            return jsonify({'error': 'Invalid timesheet ID'}), 400
+        
+        timesheets = db.timesheets.find(
+            {'_id': {'$in': object_ids}, 'manager_id': identity['manager_id']},
+            {'attendance_records': 1}
+        )
+        
+        return jsonify({
+            'timesheets': {str(ts['_id']): ts.get('attendance_records', []) for ts in timesheets}
+        }), 200
+        
+    except Exception as e:
+        print(f"Get timesheet details error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+MAX_BULK_REVIEW = 200
+
+
+@timesheet_bp.route('/manager/review/bulk', methods=['POST'])
+@jwt_required()
+def bulk_review_timesheets():
+    """Approve or reject many timesheets in one request"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'manager':
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        manager_id = identity['manager_id']
+        data = request.get_json() or {}
+        
+        # Either per-timesheet decisions, or one action applied to a list of ids
+        reviews = data.get('reviews')
+        if reviews is None:
+            reviews = [
+                {'id': timesheet_id, 'action': data.get('action'), 'comments': data.get('comments', '')}
+                for timesheet_id in data.get('timesheet_ids') or []
+            ]
+        
+        if not reviews:
+            return jsonify({'error': 'No timesheets to review'}), 400
+        
+        if len(reviews) > MAX_BULK_REVIEW:
+            return jsonify({'error': f'At most {MAX_BULK_REVIEW} timesheets can be reviewed at once'}), 400
+        
+        decisions = {}
+        for review in reviews:
+            if review.get('action') not in ['approve', 'reject']:
+                return jsonify({'error': 'Invalid action'}), 400
+            try:
+                decisions[ObjectId(review.get('id'))] = review
+            except Exception:
+                return jsonify({'error': 'Invalid timesheet ID'}), 400
+        
+        timesheets = list(db.timesheets.find(
+            {'_id': {'$in': list(decisions)}, 'manager_id': manager_id, 'status': 'pending'},
+            {'employee_id': 1, 'week_start': 1, 'week_end': 1}
+        ))
+        
+        now = datetime.utcnow()
+        review_batch = ObjectId()
+        operations = []
+        for ts in timesheets:
+            review = decisions[ts['_id']]
+            review['status'] = 'approved' if review['action'] == 'approve' else 'rejected'
+            operations.append(UpdateOne(
+                {'_id': ts['_id'], 'status': 'pending'},
+                {'$set': {
+                    'status': review['status'],
+                    'reviewed_at': now,
+                    'comments': review.get('comments', ''),
+                    'review_batch': review_batch
+                }}
+            ))
+        
+        if operations:
+            modified = db.timesheets.bulk_write(operations, ordered=False).modified_count
+            if modified < len(operations):
+                # Some were reviewed concurrently; keep only the rows this batch changed
+                changed = {ts['_id'] for ts in db.timesheets.find(
+                    {'_id': {'$in': [ts['_id'] for ts in timesheets]}, 'review_batch': review_batch},
+                    {'_id': 1}
+                )}
+                timesheets = [ts for ts in timesheets if ts['_id'] in changed]
+            if timesheets:
+                bump_version('timesheets')
+                invalidate_ai_context([ts['employee_id'] for ts in timesheets])
+        
+        # Queue notifications; the response does not wait for the mail server
+        employees = {
+            e['employee_id']: e for e in db.users.find(
+                {'employee_id': {'$in': [ts['employee_id'] for ts in timesheets]}},
+                {'employee_id': 1, 'email': 1, 'name': 1}
+            )
+        }
+        notification_queue.enqueue_many(send_timesheet_notification, [
+            (
+                employees[ts['employee_id']]['email'],
+                employees[ts['employee_id']].get('name', ''),
+                decisions[ts['_id']]['status'],
+                ts['week_start'],
+                ts['week_end'],
+                decisions[ts['_id']].get('comments', '')
+            )
+            for ts in timesheets if ts['employee_id'] in employees
+        ])
+        
+        reviewed = {str(ts['_id']): decisions[ts['_id']]['status'] for ts in timesheets}
+        skipped = [str(timesheet_id) for timesheet_id in decisions if str(timesheet_id) not in reviewed]
+        
+        return jsonify({
+            'message': f'{len(reviewed)} timesheet(s) reviewed',
+            'reviewed': reviewed,
+            'skipped': skipped
+        }), 200
+        
+    except Exception as e:
+        print(f"Bulk review timesheets error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@timesheet_bp.route('/admin/draft', methods=['POST'])
+@jwt_required()
+def queue_draft_timesheets():
+    """Queue a draft timesheet run (Admin only; normally run nightly)"""
+    try:
+        identity = get_jwt_identity()
+        
+        if identity.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        data = request.get_json() or {}
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        
+        if bool(start_date) != bool(end_date):
+            return jsonify({'error': 'Provide both start_date and end_date, or neither'}), 400
+        if start_date:
+            try:
+                if datetime.strptime(start_date, '%Y-%m-%d') > datetime.strptime(end_date, '%Y-%m-%d'):
+                    return jsonify({'error': 'start_date must not be after end_date'}), 400
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        active = db.jobs.find_one({
+            'type': 'draft_timesheets',
+            'status': {'$in': ['queued', 'running']}
+        }, {'_id': 1})
+        
+        if active:
+            return jsonify({'error': 'A draft timesheet run is already in progress', 'job_id': str(active['_id'])}), 409
+        
+        job_id = job_manager.submit('draft_timesheets', {
+            'start_date': start_date,
+            'end_date': end_date
+        }, created_by=identity.get('email'))
+        
+        return jsonify({'message': 'Draft timesheet run queued', 'job_id': str(job_id)}), 202
+        
+    except Exception as e:
+        print(f"Queue draft timesheets error: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
@@ -0,0 +1,45 @@
+"""Shared test setup.
+
+The app modules connect to MongoDB when `database` is imported, so the
+client is swapped for an in-memory mongomock client before anything
+imports it. Every test starts from empty collections.
+"""
+import os
+import sys
+import mongomock
+import pymongo
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pymongo.MongoClient = mongomock.MongoClient
+
+from database import db  # noqa: E402
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Flask test client (the scheduler thread is not started)"""
+    from app import create_app
+    monkeypatch.setattr(Config, 'SCHEDULER_ENABLED', False)
+    app = create_app()
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(client):
+    """auth(identity) -> Authorization header for a token carrying that identity"""
+    from flask_jwt_extended import create_access_token
+
+    def headers(identity):
+        with client.application.app_context():
+            return {'Authorization': f'Bearer {create_access_token(identity=identity)}'}
+    return headers
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    for name in db.list_collection_names():
+        db[name].delete_many({})
+    yield
@@ -0,0 +1,97 @@
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from bson import ObjectId
+import pytest
+from database import db
+from utils import jobs
+from utils.jobs import JobManager, register_job, run_job
+
+
+class RecordingExecutor:
+    """Stands in for the process pool: records submissions, never runs them"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args[0])
+        return Future()
+
+
+@register_job('test_echo')
+def echo_job(job):
+    job.set_total(1)
+    job.advance(1)
+    return {'echo': job.params.get('value')}
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager()
+    manager._executor = RecordingExecutor()
+    return manager
+
+
+def add_job(status='running', heartbeat_age=None, **fields):
+    now = datetime.utcnow()
+    job = {'type': 'test_echo', 'params': {}, 'status': status, 'attempts': 1, 'updated_at': now, **fields}
+    if heartbeat_age is not None:
+        job['heartbeat_at'] = now - timedelta(minutes=heartbeat_age)
+    return db.jobs.insert_one(job).inserted_id
+
+
+def test_recover_requeues_only_jobs_without_a_recent_heartbeat(manager):
+    stale = add_job(heartbeat_age=60)
+    legacy = add_job(status='queued')  # predates heartbeats
+    alive = add_job(heartbeat_age=1)
+    add_job(status='completed', heartbeat_age=60)
+
+    assert manager.recover_stale_jobs() == 2
+
+    assert sorted(manager._executor.submitted) == sorted([stale, legacy])
+    assert db.jobs.find_one({'_id': stale})['status'] == 'queued'
+    assert db.jobs.find_one({'_id': alive})['status'] == 'running'
+
+
+def test_a_stale_job_is_claimed_by_one_process(manager):
+    add_job(heartbeat_age=60)
+    other = JobManager()
+    other._executor = RecordingExecutor()
+
+    assert manager.recover_stale_jobs() == 1
+    assert other.recover_stale_jobs() == 0
+
+
+def test_recover_discards_partial_result(manager, monkeypatch):
+    discarded = []
+    # GridFS needs a real server, so record the discard instead
+    monkeypatch.setattr(jobs, 'discard_partial_result', discarded.append)
+    file_id = ObjectId()
+    job_id = add_job(heartbeat_age=60, result_file_id=file_id)
+
+    manager.recover_stale_jobs()
+
+    assert discarded == [file_id]
+    assert 'result_file_id' not in db.jobs.find_one({'_id': job_id})
+
+
+def test_heartbeat_keeps_owned_queued_jobs_alive(manager):
+    job_id = manager.submit('test_echo', {'value': 1})
+    db.jobs.update_one({'_id': job_id}, {'$set': {'heartbeat_at': datetime.utcnow() - timedelta(hours=1)}})
+
+    manager.heartbeat()
+
+    assert manager.recover_stale_jobs() == 0
+    assert manager._executor.submitted == [job_id]
+
+
+def test_run_job_claims_a_queued_job_once(manager):
+    job_id = manager.submit('test_echo', {'value': 'hi'})
+
+    run_job(job_id)
+    run_job(job_id)
+
+    job = db.jobs.find_one({'_id': job_id})
+    assert job['status'] == 'completed'
+    assert job['attempts'] == 1
+    assert job['summary'] == {'echo': 'hi'}
@@ -0,0 +1,90 @@
+import pytest
+from database import db
+from utils import leave_ledger
+from utils.leave_ledger import (
+    InsufficientBalance, get_balance, open_balance, seed_balances, consume, reverse, pending_days
+)
+
+
+@pytest.fixture(autouse=True)
+def no_transactions(monkeypatch):
+    # mongomock has no sessions; this exercises the standalone-server path
+    monkeypatch.setattr(leave_ledger, '_transactions_supported', False)
+
+
+def add_employee(employee_id, **fields):
+    db.users.insert_one({'employee_id': employee_id, 'email': f'{employee_id}@example.com', 'role': 'employee', **fields})
+
+
+def add_leave(employee_id, status='Approved', leave_type='Paid Leave', days=2, **fields):
+    leave = {
+        'employee_id': employee_id, 'leave_type': leave_type, 'status': status,
+        'start_date': '2026-10-05', 'end_date': '2026-10-06', 'days': days, **fields
+    }
+    leave['_id'] = db.leaves.insert_one(leave).inserted_id
+    return leave
+
+
+def test_get_balance_does_not_write():
+    add_employee('E1')
+    add_leave('E1', days=3)
+
+    assert get_balance('E1')['paid_leave'] == 9
+    assert db.leave_balances.count_documents({}) == 0
+    assert db.leave_ledger.count_documents({}) == 0
+
+
+def test_open_balance_consumes_approved_leaves_once():
+    add_employee('E1', leave_balance={'paid_leave': 5, 'sick_leave': 2})
+    add_leave('E1', days=3)
+    add_leave('E1', status='Pending', days=1)
+
+    open_balance('E1')
+    open_balance('E1')
+
+    assert get_balance('E1') == {'paid_leave': 2, 'sick_leave': 2, 'unpaid_leave': 0}
+
+
+def test_seed_balances_skips_opened_employees():
+    add_employee('E1')
+    add_employee('E2')
+    open_balance('E1')
+
+    assert seed_balances() == {'employees': 2, 'seeded': 1}
+    assert seed_balances() == {'employees': 2, 'seeded': 0}
+
+
+def test_consume_requires_balance_and_is_idempotent():
+    add_employee('E1', leave_balance={'paid_leave': 3})
+    first = add_leave('E1', status='Pending', days=2)
+    second = add_leave('E1', status='Pending', days=2)
+
+    assert consume(first) is True
+    assert consume(first) is False
+    with pytest.raises(InsufficientBalance) as exc:
+        consume(second)
+
+    assert exc.value.available == 1
+    assert get_balance('E1')['paid_leave'] == 1
+    # The failed consumption leaves no entry behind, so it can be retried later
+    assert db.leave_ledger.count_documents({'entry_key': f"consumption:{second['_id']}"}) == 0
+
+
+def test_reverse_restores_consumed_days():
+    add_employee('E1')
+    leave = add_leave('E1', status='Pending', days=4)
+    consume(leave)
+
+    assert reverse(leave) is True
+    assert reverse(leave) is False
+    assert get_balance('E1')['paid_leave'] == 12
+
+
+def test_pending_days_counts_only_pending_of_type():
+    add_leave('E1', status='Pending', days=2)
+    add_leave('E1', status='Pending', days=1)
+    add_leave('E1', status='Pending', leave_type='Sick Leave', days=5)
+    add_leave('E1', status='Approved', days=7)
+
+    assert pending_days('E1', 'Paid Leave') == 3
+    assert pending_days('E2', 'Paid Leave') == 0
@@ -0,0 +1,55 @@
+import pytest
+from database import db
+
+MANAGER = {'email': 'm1@example.com', 'manager_id': 'MGR001', 'role': 'manager', 'name': 'Amit'}
+ADMIN = {'email': 'admin@example.com', 'employee_id': 'ADM', 'role': 'admin', 'name': 'Admin'}
+
+
+def add_leave(employee_id, manager_id, status='Pending'):
+    return db.leaves.insert_one({
+        'employee_id': employee_id, 'employee_name': employee_id, 'leave_type': 'Paid Leave',
+        'start_date': '2026-11-02', 'end_date': '2026-11-03', 'days': 2, 'status': status,
+        'manager_id': manager_id, 'department': 'Engineering'
+    }).inserted_id
+
+
+def test_managers_do_not_see_unassigned_or_other_teams_leaves(client, auth):
+    own = add_leave('E1', 'MGR001')
+    add_leave('E2', 'MGR002')
+    add_leave('E3', None)
+
+    response = client.get('/api/leave/admin/pending', headers=auth(MANAGER))
+
+    assert response.status_code == 200
+    assert [leave['id'] for leave in response.get_json()['leaves']] == [str(own)]
+
+
+def test_admins_can_list_unassigned_leaves(client, auth):
+    add_leave('E1', 'MGR001')
+    unassigned = add_leave('E3', None)
+
+    response = client.get('/api/leave/admin/pending?manager_id=unassigned', headers=auth(ADMIN))
+
+    assert [leave['id'] for leave in response.get_json()['leaves']] == [str(unassigned)]
+
+
+@pytest.mark.parametrize('manager_id', [None, 'MGR002'])
+def test_managers_cannot_review_leaves_outside_their_team(client, auth, manager_id):
+    leave_id = add_leave('E3', manager_id)
+
+    response = client.post('/api/leave/admin/review', headers=auth(MANAGER),
+                           json={'leave_id': str(leave_id), 'action': 'reject'})
+
+    assert response.status_code == 403
+    assert db.leaves.find_one({'_id': leave_id})['status'] == 'Pending'
+
+
+def test_bulk_review_skips_unassigned_leaves_for_managers(client, auth):
+    own = add_leave('E1', 'MGR001')
+    unassigned = add_leave('E3', None)
+
+    client.post('/api/leave/admin/review/bulk', headers=auth(MANAGER),
+                json={'leave_ids': [str(own), str(unassigned)], 'action': 'reject'})
+
+    assert db.leaves.find_one({'_id': own})['status'] == 'Rejected'
+    assert db.leaves.find_one({'_id': unassigned})['status'] == 'Pending'
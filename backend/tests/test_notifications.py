@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from database import db
+from utils.notifications import NotificationQueue
+
+sent = []
+
+
+def fake_sender(to_email, subject):
+    sent.append((to_email, subject))
+    return to_email != 'bounce@example.com'
+
+
+def test_delivered_notifications_are_marked_in_the_outbox():
+    sent.clear()
+    queue = NotificationQueue(1)
+
+    futures = queue.enqueue_many(fake_sender, [('a@example.com', 'Hi'), ('bounce@example.com', 'Hi')])
+    for future in futures:
+        future.result()
+
+    statuses = {n['args'][0]: n['status'] for n in db.notifications.find()}
+    assert statuses == {'a@example.com': 'sent', 'bounce@example.com': 'failed'}
+
+
+def test_pending_notifications_are_redelivered_once():
+    sent.clear()
+    db.notifications.insert_one({
+        'sender': f'{__name__}:fake_sender',
+        'args': ['lost@example.com', 'Queued before a restart'],
+        'kwargs': {},
+        'status': 'pending',
+        'created_at': datetime.utcnow() - timedelta(hours=1),
+        'queued_at': datetime.utcnow() - timedelta(hours=1)
+    })
+    queue = NotificationQueue(1)
+
+    assert queue.redeliver_pending() == 1
+    assert queue.redeliver_pending() == 0
+    queue._executor.shutdown(wait=True)
+
+    assert sent == [('lost@example.com', 'Queued before a restart')]
+    assert db.notifications.find_one()['status'] == 'sent'
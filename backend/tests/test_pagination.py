@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+import pytest
+from database import db
+from utils.pagination import paginate, page_limit, decode_cursor, InvalidCursor, InvalidLimit
+
+
+def seed(count, nulls):
+    """count documents with a created_at, plus `nulls` with it null or missing"""
+    base = datetime(2026, 1, 1)
+    docs = [{'n': i, 'created_at': base + timedelta(days=i % 3)} for i in range(count)]
+    docs += [{'n': count + i, **({'created_at': None} if i % 2 else {})} for i in range(nulls)]
+    db.pagination_test.insert_many(docs)
+    return {d['n'] for d in docs}
+
+
+def walk(limit, descending):
+    seen = []
+    cursor = None
+    while True:
+        docs, cursor = paginate(db.pagination_test, {}, 'created_at', limit, cursor=cursor, descending=descending)
+        seen.extend(d['n'] for d in docs)
+        if not cursor:
+            return seen
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('limit', [1, 2, 5, 50])
+def test_pages_cover_every_row_once_with_nulls(limit, descending):
+    expected = seed(7, 4)
+
+    seen = walk(limit, descending)
+
+    assert len(seen) == len(expected)
+    assert set(seen) == expected
+
+
+def test_pages_follow_sort_order():
+    seed(6, 2)
+
+    full = [d['n'] for d in db.pagination_test.find().sort([('created_at', -1), ('_id', -1)])]
+
+    assert walk(3, descending=True) == full
+
+
+def test_invalid_cursor_and_limit():
+    with pytest.raises(InvalidCursor):
+        decode_cursor('not-a-cursor')
+    with pytest.raises(InvalidLimit):
+        page_limit('ten', 50, 200)
+    assert page_limit(None, 50, 200) == 50
+    assert page_limit('0', 50, 200) == 1
+    assert page_limit('1000', 50, 200) == 200
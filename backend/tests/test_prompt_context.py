@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+import pytest
+from utils import azure_openai
+from utils.prompt_context import ContextBuilder, PromptUsage
+
+
+@pytest.mark.parametrize('budget', [5, 10, 14, 25, 60, 200])
+def test_rendered_context_stays_within_budget(budget):
+    builder = ContextBuilder(budget)
+    builder.add('profile', 'Employee: Jane Doe, Engineering', priority=0, summary='Jane Doe')
+    builder.add('attendance', 'Attendance this month:', priority=1,
+                items=[f'  2026-10-{day:02d}: Present, 8.0h' for day in range(1, 21)])
+    builder.add('leaves', 'Leaves:', priority=2, items=[f'  Leave {i}' for i in range(12)])
+
+    text, stats = builder.build()
+
+    assert stats['estimated_tokens'] <= budget
+
+
+def test_omitted_items_are_marked():
+    builder = ContextBuilder(40)
+    builder.add('attendance', 'Attendance:', items=[f'  day {i}: Present' for i in range(50)])
+
+    text, stats = builder.build()
+
+    assert stats['omitted_items'] > 0
+    assert text.endswith(f"... and {stats['omitted_items']} more")
+    assert stats['estimated_tokens'] <= 40
+
+
+def test_headline_falls_back_to_summary_then_drops():
+    builder = ContextBuilder(8)
+    builder.add('long', 'x' * 100, priority=0, summary='short one')
+    builder.add('other', 'y' * 100, priority=1)
+
+    text, stats = builder.build()
+
+    assert text == 'short one'
+    assert stats['summarized'] == ['long']
+    assert stats['dropped'] == ['other']
+
+
+def test_prompt_usage_separates_cached_and_estimated():
+    usage = PromptUsage()
+    usage.record_completion('chat', {'prompt_tokens': 100, 'completion_tokens': 20})
+    usage.record_completion('chat', {'prompt_tokens': 300, 'completion_tokens': 10}, estimated=True)
+    usage.record_completion('chat', {'prompt_tokens': 999}, cached=True)
+
+    chat = usage.stats()['chat']
+
+    assert chat['requests'] == 3
+    assert chat['cached'] == 1
+    assert chat['estimated_requests'] == 1
+    assert chat['avg_prompt_tokens'] == 200
+    assert chat['max_prompt_tokens'] == 300
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def chunk(content=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+@pytest.mark.parametrize('usage_block', [
+    {'prompt_tokens': 321, 'completion_tokens': 7, 'total_tokens': 328},
+    SimpleNamespace(prompt_tokens=321, completion_tokens=7, total_tokens=328)
+])
+def test_stream_records_reported_usage(monkeypatch, usage_block):
+    stream = FakeStream([chunk('Hel'), chunk('lo'), chunk(usage=usage_block)])
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return stream
+
+    service = azure_openai.azure_openai_service
+    usage = PromptUsage()
+    monkeypatch.setattr(azure_openai, 'prompt_usage', usage)
+    monkeypatch.setattr(service, '_client', SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+    text = ''.join(service.stream_chat_completion([{'role': 'user', 'content': 'hi'}], endpoint='chat_stream'))
+
+    stats = usage.stats()['chat_stream']
+    assert text == 'Hello'
+    assert stream.closed
+    assert requests[0]['extra_body'] == {'stream_options': {'include_usage': True}}
+    assert stats['prompt_tokens'] == 321
+    assert stats['completion_tokens'] == 7
+    assert stats['estimated_requests'] == 0
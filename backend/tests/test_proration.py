@@ -0,0 +1,67 @@
+from datetime import date, datetime
+from config import Config
+from database import db
+from utils.proration import prorate, joining_date
+
+# October 2026: 22 working days, 12 of them up to Friday the 16th
+MONTH = '2026-10'
+TODAY = date(2026, 10, 16)
+SALARY = {'basic': 12000, 'hra': 6000, 'allowances': 4000, 'deductions': 0, 'net': 22000}
+
+
+def employee(employee_id, **fields):
+    return {'employee_id': employee_id, 'salary': SALARY, 'location': None, **fields}
+
+
+def mark_present(employee_id, *days):
+    db.attendance.insert_many([
+        {'employee_id': employee_id, 'date': f'2026-10-{day:02d}', 'status': 'Present'} for day in days
+    ])
+
+
+def test_joining_date_prefers_date_of_joining():
+    assert joining_date({'date_of_joining': '2026-10-12', 'created_at': datetime(2026, 1, 1)}) == date(2026, 10, 12)
+    assert joining_date({'created_at': datetime(2026, 10, 5, 9, 30)}) == date(2026, 10, 5)
+    assert joining_date({'date_of_joining': 'not a date'}) is None
+    assert joining_date({}) is None
+
+
+def test_absences_not_deducted_by_default(monkeypatch):
+    monkeypatch.setattr(Config, 'PAYROLL_PRORATE_ABSENCES', False)
+
+    result = prorate([employee('E1')], MONTH, today=TODAY)['E1']
+
+    assert result['working_days'] == 22
+    assert result['loss_of_pay_days'] == 0
+    assert result['loss_of_pay'] == 0
+
+
+def test_absences_start_at_joining_date(monkeypatch):
+    monkeypatch.setattr(Config, 'PAYROLL_PRORATE_ABSENCES', True)
+    mark_present('NEW', 12, 13, 14)
+
+    result = prorate([
+        employee('OLD', date_of_joining='2025-01-01'),
+        employee('NEW', date_of_joining='2026-10-12')
+    ], MONTH, today=TODAY, all_employees=True)
+
+    # Every elapsed working day is an absence for OLD; NEW only misses the 15th and 16th
+    assert result['OLD']['loss_of_pay_days'] == 12
+    assert result['OLD']['loss_of_pay'] == 12000
+    assert result['NEW']['loss_of_pay_days'] == 2
+    assert result['NEW']['loss_of_pay'] == 2000
+
+
+def test_unpaid_leave_and_half_days(monkeypatch):
+    monkeypatch.setattr(Config, 'PAYROLL_PRORATE_ABSENCES', False)
+    db.attendance.insert_one({'employee_id': 'E1', 'date': '2026-10-01', 'status': 'Half-day'})
+    db.leaves.insert_one({
+        'employee_id': 'E1', 'leave_type': 'Unpaid Leave', 'status': 'Approved',
+        'start_date': '2026-10-05', 'end_date': '2026-10-06'
+    })
+
+    result = prorate([employee('E1')], MONTH, today=TODAY)['E1']
+
+    assert result['loss_of_pay_days'] == 2.5
+    assert result['payable_days'] == 19.5
+    assert result['loss_of_pay'] == 2500
@@ -0,0 +1,50 @@
+from database import db
+from routes.payroll import reconcile_payments
+
+MONTH = '2026-09'
+
+
+def add_payslip(employee_id, net_salary, status='Generated'):
+    db.payslips.insert_one({'employee_id': employee_id, 'month_year': MONTH, 'net_salary': net_salary, 'status': status})
+
+
+def payment(line, employee_id, amount):
+    return {'line': line, 'employee_id': employee_id, 'amount': amount, 'reference': f'REF{line}'}
+
+
+def test_duplicates_are_flagged_apart_from_the_match_status():
+    add_payslip('E1', 1000)
+    add_payslip('E2', 2000)
+    add_payslip('E3', 3000, status='Paid')
+
+    summary, mismatches = reconcile_payments([
+        payment(1, 'E1', 900),    # wrong amount
+        payment(2, 'E1', 1000),   # later row pays the payslip
+        payment(3, 'E1', 1000),   # paid twice in the same file
+        payment(4, 'E2', 2000),
+        payment(5, 'E3', 3000),
+        payment(6, 'E9', 10)
+    ], MONTH, 'admin@example.com')
+
+    rows = {m['line']: m for m in mismatches}
+    assert summary['matched'] == 2
+    assert summary['marked_paid'] == 2
+    assert summary['duplicate_rows'] == 2
+    assert rows[1]['reason'] == 'amount_mismatch' and rows[1]['duplicate'] is False
+    assert rows[1]['expected'] == 1000 and rows[1]['difference'] == -100
+    assert 2 not in rows
+    assert rows[3]['reason'] == 'duplicate_payment' and rows[3]['duplicate'] is True
+    assert rows[3]['amount_matches'] is True
+    assert rows[5]['reason'] == 'already_paid'
+    assert rows[6]['reason'] == 'payslip_not_found' and 'expected' not in rows[6]
+    assert db.payslips.find_one({'employee_id': 'E1'})['payment_reference'] == 'REF2'
+
+
+def test_dry_run_writes_nothing():
+    add_payslip('E1', 1000)
+
+    summary, _ = reconcile_payments([payment(1, 'E1', 1000)], MONTH, 'admin@example.com', dry_run=True)
+
+    assert summary['matched'] == 1
+    assert summary['marked_paid'] == 0
+    assert db.payslips.find_one({'employee_id': 'E1'})['status'] == 'Generated'
@@ -0,0 +1,41 @@
+"""Cache of the context documents given to the AI assistant.
+
+Contexts are keyed by (role, subject) so consecutive chat turns reuse the
+same document instead of re-querying MongoDB. Entries expire after
+AI_CONTEXT_TTL and are dropped early by write paths (attendance, leave,
+timesheet, salary and payroll changes) through invalidate_ai_context.
+
+Keys also carry the shared `ai_context` version counter. Organisation-wide
+writes (payroll runs, timesheet drafting, which run in job worker
+processes) bump it, so every web process drops its contexts, not just the
+one that made the change. Per-employee invalidation stays local to the
+process that handled the write.
+"""
+from config import Config
+from utils.cache import TTLCache
+from utils.http_cache import bump_version, get_versions
+
+ai_context_cache = TTLCache(ttl=Config.AI_CONTEXT_TTL, max_entries=Config.AI_CONTEXT_MAX_ENTRIES)
+
+
+def cached_context(role, subject, builder):
+    """Return the cached context for (role, subject), building it on a miss"""
+    version = get_versions(['ai_context'])[0]
+    return ai_context_cache.get_or_set((role, subject, version), builder)
+
+
+def invalidate_ai_context(employee_ids=None):
+    """Drop contexts a write may have changed.
+
+    Admin and manager contexts aggregate over teams, so they are always
+    dropped; employee contexts only for the given employee_ids. With
+    employee_ids=None every context is dropped in every process.
+    """
+    if employee_ids is None:
+        bump_version('ai_context')
+        ai_context_cache.clear()
+        return
+    affected = set(employee_ids)
+    ai_context_cache.delete_where(
+        lambda key: key[0] in ('admin', 'manager') or (key[0] == 'employee' and key[1] in affected)
+    )
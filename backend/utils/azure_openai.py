@@ -1,9 +1,92 @@
+import hashlib
+import json
+import math
 import os
+import threading
+from datetime import datetime, timedelta
 from openai import AzureOpenAI
 from dotenv import load_dotenv
+from database import db
+from config import Config
+from utils.cache import TTLCache
+from utils.prompt_context import ContextBuilder, CHARS_PER_TOKEN, estimate_message_tokens, prompt_usage
 
 load_dotenv()
 
+
+class ResponseCache:
+    """Completion cache: in-process LRU plus an optional shared Mongo tier.
+
+    Keys hash the deployment, messages, temperature and max_tokens, so only
+    byte-identical requests hit. Hit/miss counts and the tokens that hits
+    saved are kept per process.
+    """
+
+    def __init__(self):
+        self._memory = TTLCache(ttl=Config.LLM_CACHE_TTL, max_entries=Config.LLM_CACHE_MAX_ENTRIES)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def key(deployment, messages, temperature, max_tokens):
+        basis = json.dumps([deployment, messages, temperature, max_tokens], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(basis.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        result = self._memory.get(key)
+        if result is None and Config.LLM_CACHE_SHARED:
+            doc = db.llm_cache.find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}}, {'content': 1, 'usage': 1})
+            if doc:
+                result = {'content': doc['content'], 'usage': doc.get('usage', {})}
+                self._memory.set(key, result)
+                with self._lock:
+                    self.shared_hits += 1
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.tokens_saved += result.get('usage', {}).get('total_tokens', 0)
+        return result
+
+    def set(self, key, result):
+        self._memory.set(key, result)
+        if Config.LLM_CACHE_SHARED:
+            try:
+                db.llm_cache.replace_one({'_id': key}, {
+                    'content': result['content'],
+                    'usage': result.get('usage', {}),
+                    'created_at': datetime.utcnow(),
+                    'expires_at': datetime.utcnow() + timedelta(seconds=Config.LLM_CACHE_TTL)
+                }, upsert=True)
+            except Exception as e:
+                print(f"LLM cache write error: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0,
+                'tokens_saved': self.tokens_saved
+            }
+
+
+def _usage_dict(usage):
+    """Token counts from a usage block (an SDK object, or a dict when the SDK does not model it)"""
+    get = usage.get if isinstance(usage, dict) else lambda name: getattr(usage, name, None)
+    return {
+        "prompt_tokens": get('prompt_tokens') or 0,
+        "completion_tokens": get('completion_tokens') or 0,
+        "total_tokens": get('total_tokens') or 0
+    }
+
+
 class AzureOpenAIService:
     _instance = None
     _client = None
@@ -21,15 +104,27 @@ class AzureOpenAIService:
             except Exception as e:
                 print(f"Failed to initialize Azure OpenAI client: {e}")
                 cls._client = None
+            cls._instance.response_cache = ResponseCache()
         return cls._instance
 
     @property
     def client(self):
         return self._client
 
-    def chat_completion(self, messages, max_tokens=1000, temperature=0.7):
+    def _cacheable(self, temperature, cache):
+        """Explicit cache flag wins; otherwise only low-temperature requests are cached"""
+        if not Config.LLM_CACHE_ENABLED:
+            return False
+        if cache is not None:
+            return cache
+        return temperature <= Config.LLM_CACHE_MAX_TEMPERATURE or Config.LLM_CACHE_HIGH_TEMPERATURE
+
+    def chat_completion(self, messages, max_tokens=1000, temperature=0.7, cache=None, endpoint='completion'):
         """
-        Send a chat completion request to Azure OpenAI
+        Send a chat completion request to Azure OpenAI.
+        Identical requests are answered from the response cache; pass
+        cache=True/False to override the temperature-based default.
+        Token usage is recorded under `endpoint`.
         """
         if not self._client:
             return {"error": "Azure OpenAI client not initialized"}
@@ -37,6 +132,14 @@ class AzureOpenAIService:
         try:
             deployment_name = os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-4o-mini')
             
+            cache_key = None
+            if self._cacheable(temperature, cache):
+                cache_key = ResponseCache.key(deployment_name, messages, temperature, max_tokens)
+                cached = self.response_cache.get(cache_key)
+                if cached:
+                    prompt_usage.record_completion(endpoint, cached.get('usage', {}), cached=True)
+                    return {**cached, "cached": True}
+            
             response = self._client.chat.completions.create(
                 model=deployment_name,
                 messages=messages,
@@ -44,7 +147,7 @@ class AzureOpenAIService:
                 temperature=temperature
             )
             
-            return {
+            result = {
                 "content": response.choices[0].message.content,
                 "usage": {
                     "prompt_tokens": response.usage.prompt_tokens,
@@ -52,14 +155,75 @@ class AzureOpenAIService:
                     "total_tokens": response.usage.total_tokens
                 }
             }
+            if cache_key:
+                self.response_cache.set(cache_key, result)
+            prompt_usage.record_completion(endpoint, result['usage'])
+            
+            return {**result, "cached": False}
         except Exception as e:
             print(f"Azure OpenAI chat completion error: {e}")
             return {"error": str(e)}
 
+    def stream_chat_completion(self, messages, max_tokens=1000, temperature=0.7, endpoint='completion'):
+        """
+        Stream a chat completion from Azure OpenAI, yielding text deltas as
+        they arrive. Closing the generator (e.g. the client disconnected)
+        closes the upstream HTTP stream. The stream is asked to end with a
+        usage chunk, which is recorded; streams closed before it arrives
+        are recorded from estimates.
+        """
+        if not self._client:
+            raise RuntimeError("Azure OpenAI client not initialized")
+        
+        deployment_name = os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-4o-mini')
+        
+        stream = self._client.chat.completions.create(
+            model=deployment_name,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            # Passed as a raw body field: the pinned SDK predates the stream_options argument
+            extra_body={'stream_options': {'include_usage': True}}
+        )
+        completion_chars = 0
+        usage = None
+        try:
+            for chunk in stream:
+                if getattr(chunk, 'usage', None):
+                    usage = _usage_dict(chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    completion_chars += len(delta)
+                    yield delta
+        finally:
+            stream.close()
+            if usage:
+                prompt_usage.record_completion(endpoint, usage)
+            else:
+                prompt_usage.record_completion(endpoint, {
+                    'prompt_tokens': estimate_message_tokens(messages),
+                    'completion_tokens': math.ceil(completion_chars / CHARS_PER_TOKEN)
+                }, estimated=True)
+
     def get_hr_assistant_response(self, user_query, context_data, role='employee'):
         """
         Get HR assistant response based on user role and context
         """
+        messages = self._hr_assistant_messages(user_query, context_data, role, 'chat')
+        return self.chat_completion(messages, max_tokens=1500, temperature=0.7, endpoint='chat')
+
+    def stream_hr_assistant_response(self, user_query, context_data, role='employee'):
+        """
+        Streaming variant of get_hr_assistant_response; yields text deltas
+        """
+        messages = self._hr_assistant_messages(user_query, context_data, role, 'chat_stream')
+        return self.stream_chat_completion(messages, max_tokens=1500, temperature=0.7, endpoint='chat_stream')
+
+    def _hr_assistant_messages(self, user_query, context_data, role, endpoint):
+        """Build the HR assistant prompt for a role"""
         system_prompts = {
             'employee': """You are an HR assistant for employees at Dayflow HRMS. You help employees with:
 - Understanding their attendance records and patterns
@@ -93,7 +257,7 @@ You have access to organization-wide data provided in the context. Provide strat
 identify patterns, and give actionable recommendations for HR management."""
         }
 
-        context_str = self._format_context(context_data, role)
+        context_str = self._format_context(context_data, role, endpoint)
         
         messages = [
             {"role": "system", "content": system_prompts.get(role, system_prompts['employee'])},
@@ -101,7 +265,7 @@ identify patterns, and give actionable recommendations for HR management."""
             {"role": "user", "content": user_query}
         ]
         
-        return self.chat_completion(messages, max_tokens=1500, temperature=0.7)
+        return messages
 
     def generate_insights(self, data, insight_type='general'):
         """
@@ -135,95 +299,157 @@ Format your response with clear sections.""",
 Format your response with clear sections."""
         }
 
-        data_str = self._format_data_for_insights(data)
+        data_str = self._format_data_for_insights(data, 'insights')
         
         messages = [
             {"role": "system", "content": "You are an HR analytics expert. Analyze the provided data and give actionable insights."},
             {"role": "user", "content": f"{prompts.get(insight_type, prompts['general'])}\n\nData:\n{data_str}"}
         ]
         
-        return self.chat_completion(messages, max_tokens=2000, temperature=0.5)
+        return self.chat_completion(messages, max_tokens=2000, temperature=0.5, endpoint='insights')
 
-    def _format_context(self, context_data, role):
-        """Format context data for the AI prompt"""
-        context_parts = []
+    def _format_context(self, context_data, role, endpoint='chat'):
+        """Format context data for the AI prompt within the configured token budget"""
+        builder = ContextBuilder(Config.AI_CONTEXT_TOKEN_BUDGET)
         
         if role == 'employee':
             if 'profile' in context_data:
                 p = context_data['profile']
-                context_parts.append(f"Employee: {p.get('name', 'N/A')}, ID: {p.get('employee_id', 'N/A')}")
-                context_parts.append(f"Department: {p.get('department', 'N/A')}, Job Title: {p.get('job_title', 'N/A')}")
+                builder.add('profile', f"Employee: {p.get('name', 'N/A')}, ID: {p.get('employee_id', 'N/A')}\n"
+                                       f"Department: {p.get('department', 'N/A')}, Job Title: {p.get('job_title', 'N/A')}")
             
             if 'salary' in context_data:
                 s = context_data['salary']
-                context_parts.append(f"Salary - Basic: ₹{s.get('basic', 0)}, HRA: ₹{s.get('hra', 0)}, Net: ₹{s.get('net', 0)}")
+                builder.add('salary', f"Salary - Basic: ₹{s.get('basic', 0)}, HRA: ₹{s.get('hra', 0)}, Net: ₹{s.get('net', 0)}",
+                            summary=f"Net Salary: ₹{s.get('net', 0)}")
             
             if 'leave_balance' in context_data:
                 lb = context_data['leave_balance']
-                context_parts.append(f"Leave Balance - Paid: {lb.get('paid_leave', 0)}, Sick: {lb.get('sick_leave', 0)}, Unpaid: {lb.get('unpaid_leave', 0)}")
+                builder.add('leave_balance', f"Leave Balance - Paid: {lb.get('paid_leave', 0)}, Sick: {lb.get('sick_leave', 0)}, Unpaid: {lb.get('unpaid_leave', 0)}")
             
             if 'attendance' in context_data:
                 att = context_data['attendance']
-                context_parts.append(f"Recent Attendance: {len(att)} records")
                 present = sum(1 for a in att if a.get('status') == 'Present')
-                context_parts.append(f"Present days: {present}/{len(att)}")
+                builder.add('attendance', f"Recent Attendance: {len(att)} records\nPresent days: {present}/{len(att)}",
+                            priority=1, summary=f"Present days: {present}/{len(att)}",
+                            items=[f"  - {a.get('date')}: {a.get('status')} ({a.get('check_in') or '-'} to {a.get('check_out') or '-'})" for a in att])
             
             if 'leaves' in context_data:
                 leaves = context_data['leaves']
-                context_parts.append(f"Leave Requests: {len(leaves)} total")
                 pending = sum(1 for l in leaves if l.get('status') == 'Pending')
-                context_parts.append(f"Pending leaves: {pending}")
+                builder.add('leaves', f"Leave Requests: {len(leaves)} total\nPending leaves: {pending}",
+                            priority=1, summary=f"Pending leaves: {pending}",
+                            items=[f"  - {l.get('leave_type')} {l.get('start_date')} to {l.get('end_date')}: {l.get('status')}" for l in leaves])
 
         elif role == 'manager':
             if 'team_members' in context_data:
-                context_parts.append(f"Team Size: {len(context_data['team_members'])} employees")
+                members = context_data['team_members']
+                builder.add('team_members', f"Team Size: {len(members)} employees", priority=0,
+                            items=[f"  - {m.get('name')} ({m.get('employee_id')}), {m.get('job_title')}" for m in members])
             
             if 'team_attendance' in context_data:
                 att = context_data['team_attendance']
-                context_parts.append(f"Team Attendance Records: {len(att)}")
+                builder.add('team_attendance', f"Team Attendance Records: {len(att)} ({self._count_by(att, 'status')})",
+                            priority=1, summary=f"Team Attendance Records: {len(att)}",
+                            items=self._attendance_by_employee(att))
             
             if 'pending_leaves' in context_data:
-                context_parts.append(f"Pending Leave Requests: {len(context_data['pending_leaves'])}")
+                leaves = context_data['pending_leaves']
+                builder.add('pending_leaves', f"Pending Leave Requests: {len(leaves)}",
+                            items=[f"  - {l.get('employee_id')}: {l.get('leave_type')} {l.get('start_date')} to {l.get('end_date')}" for l in leaves])
             
             if 'pending_timesheets' in context_data:
-                context_parts.append(f"Pending Timesheets: {len(context_data['pending_timesheets'])}")
+                timesheets = context_data['pending_timesheets']
+                builder.add('pending_timesheets', f"Pending Timesheets: {len(timesheets)}",
+                            items=[f"  - {t.get('employee_id')}: week of {t.get('week_start')}, {t.get('total_hours', 0)}h" for t in timesheets])
 
         elif role == 'admin':
             if 'total_employees' in context_data:
-                context_parts.append(f"Total Employees: {context_data['total_employees']}")
+                builder.add('total_employees', f"Total Employees: {context_data['total_employees']}")
             
             if 'departments' in context_data:
-                context_parts.append(f"Departments: {', '.join(context_data['departments'])}")
+                departments = context_data['departments']
+                builder.add('departments', f"Departments: {', '.join(departments)}", priority=1,
+                            summary=f"Departments: {len(departments)}")
             
             if 'attendance_summary' in context_data:
                 att = context_data['attendance_summary']
-                context_parts.append(f"Attendance - Present: {att.get('present', 0)}, Absent: {att.get('absent', 0)}")
+                builder.add('attendance_summary', f"Attendance - Present: {att.get('present', 0)}, Absent: {att.get('absent', 0)}, Rate: {att.get('attendance_rate', 0)}%")
             
             if 'leave_summary' in context_data:
                 ls = context_data['leave_summary']
-                context_parts.append(f"Leaves - Pending: {ls.get('pending', 0)}, Approved: {ls.get('approved', 0)}")
+                builder.add('leave_summary', f"Leaves - Pending: {ls.get('pending', 0)}, Approved: {ls.get('approved', 0)}")
             
             if 'payroll_summary' in context_data:
                 ps = context_data['payroll_summary']
-                context_parts.append(f"Monthly Payroll: ₹{ps.get('total', 0)}")
-
-        return "\n".join(context_parts) if context_parts else "No specific context available."
-
-    def _format_data_for_insights(self, data):
-        """Format data for insights generation"""
-        if isinstance(data, dict):
-            parts = []
-            for key, value in data.items():
-                if isinstance(value, list):
-                    parts.append(f"{key}: {len(value)} records")
-                    if value and len(value) <= 10:
-                        for item in value[:10]:
-                            parts.append(f"  - {item}")
-                else:
-                    parts.append(f"{key}: {value}")
-            return "\n".join(parts)
-        return str(data)
+                builder.add('payroll_summary', f"Monthly Payroll: ₹{ps.get('total', 0)}",
+                            items=[f"  - {d.get('department')}: {d.get('employees')} employees, ₹{d.get('total')}" for d in ps.get('by_department', [])])
+            
+            if 'recent_leave_requests' in context_data:
+                leaves = context_data['recent_leave_requests']
+                builder.add('recent_leave_requests', f"Recent Leave Requests: {len(leaves)}", priority=2,
+                            items=[f"  - {l.get('employee_id')}: {l.get('leave_type')} from {l.get('start_date')}, {l.get('status')}" for l in leaves])
 
+        if not builder.sections:
+            return "No specific context available."
+        
+        text, stats = builder.build()
+        prompt_usage.record_context(endpoint, stats)
+        return text
+
+    def _format_data_for_insights(self, data, endpoint='insights'):
+        """Format data for insights generation within the configured token budget.
+
+        Scalars and dicts are headline facts; lists become a record count
+        with a status breakdown, followed by as many records as still fit.
+        """
+        if not isinstance(data, dict):
+            return str(data)
+        
+        builder = ContextBuilder(Config.AI_INSIGHTS_TOKEN_BUDGET)
+        for key, value in data.items():
+            if isinstance(value, list):
+                breakdown = self._count_by(value, 'status')
+                builder.add(key, f"{key}: {len(value)} records" + (f" ({breakdown})" if breakdown else ''),
+                            priority=2, items=[f"  - {self._compact(item)}" for item in value])
+            elif isinstance(value, dict):
+                scalars = {k: v for k, v in value.items() if not isinstance(v, (list, dict))}
+                nested = [f"  - {k}: {self._compact(item)}" for k, v in value.items() if isinstance(v, list) for item in v]
+                builder.add(key, f"{key}: {self._compact(scalars)}", priority=1, items=nested)
+            else:
+                builder.add(key, f"{key}: {value}")
+        
+        text, stats = builder.build()
+        prompt_usage.record_context(endpoint, stats)
+        return text
+
+    @staticmethod
+    def _compact(item):
+        """One-line rendering of a record"""
+        if isinstance(item, dict):
+            return ', '.join(f"{k}={v}" for k, v in item.items() if v not in (None, ''))
+        return str(item)
+
+    @staticmethod
+    def _count_by(records, field):
+        """'Present: 40, Absent: 3' style breakdown of records by a field"""
+        counts = {}
+        for record in records:
+            if isinstance(record, dict) and record.get(field):
+                counts[record[field]] = counts.get(record[field], 0) + 1
+        return ', '.join(f"{value}: {count}" for value, count in sorted(counts.items(), key=lambda kv: -kv[1]))
+
+    @staticmethod
+    def _attendance_by_employee(attendance):
+        """Per-employee status counts, so team attendance scales with team size rather than days"""
+        per_employee = {}
+        for a in attendance:
+            statuses = per_employee.setdefault(a.get('employee_id'), {})
+            statuses[a.get('status')] = statuses.get(a.get('status'), 0) + 1
+        return [
+            f"  - {employee_id}: " + ', '.join(f"{status}: {count}" for status, count in statuses.items())
+            for employee_id, statuses in per_employee.items()
+        ]
 
 # Singleton instance
 azure_openai_service = AzureOpenAIService()
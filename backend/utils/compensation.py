@@ -0,0 +1,170 @@
+"""Compensation what-if simulator.
+
+Salaries of every employee are loaded once into a columnar table (NumPy
+arrays for the salary components, integer codes for the categorical
+fields). Scenario rules are applied as boolean masks over those columns,
+so any number of scenarios can be compared side by side without going
+back to the database.
+
+A scenario is a list of rules applied in order:
+
+    {'filter': {'department': 'Engineering', 'min_gross': 50000},
+     'component': 'basic', 'percent': 6}
+    {'filter': {}, 'component': 'allowances', 'amount': 2000}
+
+Filters match on department, job_title, location, employee_ids and a
+gross salary band (min_gross / max_gross), evaluated on the baseline
+salary. A rule raises a component by a percentage and/or a fixed amount.
+
+Employee records have no pay grade, so grade-based raises are expressed
+as job_title filters (or as a gross salary band); there is no `grade`
+filter.
+"""
+import numpy as np
+from database import db
+from config import Config
+from utils.cache import TTLCache
+from utils.http_cache import get_versions
+
+COMPONENTS = ('basic', 'hra', 'allowances', 'deductions')
+
+CATEGORY_FIELDS = ('department', 'job_title', 'location')
+
+# users version -> CompensationTable
+_tables = TTLCache(ttl=Config.COMPENSATION_TABLE_TTL, max_entries=2)
+
+
+class ScenarioError(ValueError):
+    """A scenario rule that cannot be applied"""
+
+
+class CompensationTable:
+    """Salary components of all configured employees as parallel arrays"""
+
+    def __init__(self, employees):
+        self.employee_ids = np.array([e['employee_id'] for e in employees], dtype=object)
+        self.size = len(employees)
+        self.components = {
+            component: np.array([(e.get('salary') or {}).get(component, 0) or 0 for e in employees], dtype=np.float64)
+            for component in COMPONENTS
+        }
+        # Categorical columns are stored as integer codes into a labels list
+        self.labels = {}
+        self.codes = {}
+        for field in CATEGORY_FIELDS:
+            labels, codes = np.unique(np.array([e.get(field) or '' for e in employees], dtype=object), return_inverse=True)
+            self.labels[field] = [str(label) for label in labels]
+            self.codes[field] = codes.astype(np.int32)
+
+    @classmethod
+    def load(cls):
+        employees = list(db.users.find(
+            {'role': 'employee', 'salary.net': {'$gt': 0}},
+            {'_id': 0, 'employee_id': 1, 'department': 1, 'job_title': 1, 'location': 1, 'salary': 1}
+        ))
+        return cls(employees)
+
+    @staticmethod
+    def gross(components):
+        return components['basic'] + components['hra'] + components['allowances']
+
+    def _category_mask(self, field, value):
+        values = value if isinstance(value, list) else [value]
+        wanted = [self.labels[field].index(v) for v in values if v in self.labels[field]]
+        return np.isin(self.codes[field], wanted)
+
+    def mask(self, rule_filter):
+        """Boolean mask of employees matching a rule filter"""
+        mask = np.ones(self.size, dtype=bool)
+        baseline_gross = self.gross(self.components)
+        for key, value in (rule_filter or {}).items():
+            if key in CATEGORY_FIELDS:
+                mask &= self._category_mask(key, value)
+            elif key == 'employee_ids':
+                mask &= np.isin(self.employee_ids, list(value))
+            elif key == 'min_gross':
+                mask &= baseline_gross >= float(value)
+            elif key == 'max_gross':
+                mask &= baseline_gross <= float(value)
+            elif key == 'grade':
+                raise ScenarioError('Unknown filter: grade (employees have no grade; use job_title or min_gross/max_gross)')
+            else:
+                raise ScenarioError(f'Unknown filter: {key}')
+        return mask
+
+    def _totals(self, components):
+        """Monthly gross/deductions/net, overall and per department"""
+        gross = self.gross(components)
+        net = gross - components['deductions']
+        departments = self.codes['department']
+        count = len(self.labels['department'])
+        gross_by_department = np.bincount(departments, weights=gross, minlength=count)
+        net_by_department = np.bincount(departments, weights=net, minlength=count)
+        return {
+            'gross': float(gross.sum()),
+            'deductions': float(components['deductions'].sum()),
+            'net': float(net.sum()),
+            'gross_by_department': gross_by_department,
+            'net_by_department': net_by_department
+        }
+
+    def baseline(self):
+        totals = self._totals(self.components)
+        return {
+            'employees': self.size,
+            'monthly_gross': round(totals['gross'], 2),
+            'monthly_net': round(totals['net'], 2),
+            'annual_gross': round(totals['gross'] * 12, 2),
+            'by_department': [
+                {'department': label, 'monthly_gross': round(float(totals['gross_by_department'][i]), 2)}
+                for i, label in enumerate(self.labels['department'])
+            ]
+        }
+
+    def simulate(self, scenario):
+        """Apply a scenario's rules and return cost deltas against the baseline"""
+        rules = scenario.get('rules') or []
+        if not isinstance(rules, list):
+            raise ScenarioError('rules must be a list')
+
+        components = {component: values.copy() for component, values in self.components.items()}
+        affected = np.zeros(self.size, dtype=bool)
+        for rule in rules:
+            component = rule.get('component', 'basic')
+            if component not in COMPONENTS:
+                raise ScenarioError(f'Invalid component: {component}')
+            percent = float(rule.get('percent', 0) or 0)
+            amount = float(rule.get('amount', 0) or 0)
+            mask = self.mask(rule.get('filter'))
+            components[component][mask] = components[component][mask] * (1 + percent / 100) + amount
+            affected |= mask
+
+        base = self._totals(self.components)
+        new = self._totals(components)
+        gross_delta = new['gross'] - base['gross']
+        department_delta = new['gross_by_department'] - base['gross_by_department']
+
+        return {
+            'name': scenario.get('name', ''),
+            'affected_employees': int(affected.sum()),
+            'monthly_gross': round(new['gross'], 2),
+            'monthly_net': round(new['net'], 2),
+            'monthly_delta': round(gross_delta, 2),
+            'annual_delta': round(gross_delta * 12, 2),
+            'delta_pct': round(gross_delta / base['gross'] * 100, 2) if base['gross'] else None,
+            'by_department': [
+                {
+                    'department': label,
+                    'monthly_gross': round(float(new['gross_by_department'][i]), 2),
+                    'monthly_delta': round(float(department_delta[i]), 2)
+                }
+                for i, label in enumerate(self.labels['department'])
+                if department_delta[i] or new['gross_by_department'][i]
+            ]
+        }
+
+
+def get_compensation_table():
+    """Table for the current users version, loaded once and reused"""
+    version = get_versions(['users'])[0]
+    return _tables.get_or_set(version, CompensationTable.load)
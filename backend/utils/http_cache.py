@@ -0,0 +1,121 @@
+"""HTTP caching helpers: collection version counters, conditional GET and compression"""
+import gzip
+import hashlib
+import json
+from functools import wraps
+from flask import request, make_response
+from flask_jwt_extended import get_jwt_identity
+from database import db
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+def bump_version(*collections):
+    """Increment the version counter of each collection after a write"""
+    for name in collections:
+        db.collection_versions.update_one(
+            {'_id': name},
+            {'$inc': {'version': 1}},
+            upsert=True
+        )
+
+
+def get_versions(collections):
+    """Current version counters for the given collections"""
+    versions = {c['_id']: c.get('version', 0) for c in db.collection_versions.find({'_id': {'$in': list(collections)}})}
+    return [versions.get(name, 0) for name in collections]
+
+
+def _etag_matches(etag):
+    """Check If-None-Match against an ETag and its compressed variants"""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    return any(if_none_match.contains(tag) for tag in (etag, f'{etag}-gzip', f'{etag}-br'))
+
+
+def _not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
+
+def conditional_get(*collections):
+    """Serve 304 Not Modified when none of the given collections changed.
+
+    The ETag is derived from the request path and arguments, the caller's
+    identity and the collections' version counters, so a matching
+    If-None-Match short-circuits before the view queries or serializes
+    anything. Must be applied below @jwt_required().
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            basis = json.dumps([
+                request.path,
+                sorted(request.args.items(multi=True)),
+                get_jwt_identity(),
+                get_versions(collections)
+            ], sort_keys=True, default=str)
+            etag = hashlib.sha256(basis.encode('utf-8')).hexdigest()[:32]
+
+            if _etag_matches(etag):
+                return _not_modified(etag)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return decorated_function
+    return decorator
+
+
+def finalize_response(response):
+    """after_request hook: body-hash ETags for other GETs, then compression"""
+    if response.direct_passthrough or response.mimetype != 'application/json':
+        return response
+
+    if request.method == 'GET' and response.status_code == 200:
+        etag, _ = response.get_etag()
+        if not etag:
+            etag = hashlib.sha1(response.get_data()).hexdigest()
+            response.set_etag(etag)
+        if _etag_matches(etag):
+            return _not_modified(etag)
+
+    return compress_response(response)
+
+
+def compress_response(response):
+    """Compress a JSON body with brotli or gzip according to Accept-Encoding"""
+    if response.status_code < 200 or response.status_code >= 300 or 'Content-Encoding' in response.headers:
+        return response
+
+    data = response.get_data()
+    if len(data) < Config.COMPRESSION_MIN_SIZE:
+        return response
+
+    available = ['br', 'gzip'] if brotli else ['gzip']
+    encoding = request.accept_encodings.best_match(available)
+    if not encoding:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=Config.BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=Config.GZIP_LEVEL)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+
+    # Each encoding is a distinct representation, so give it a distinct strong ETag
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+
+    return response
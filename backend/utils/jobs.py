@@ -0,0 +1,319 @@
+"""Background job subsystem.
+
+Job state lives in the Mongo `jobs` collection and jobs execute in a
+worker process pool, so long-running reports never hold a request thread.
+Builders stream their output as CSV into GridFS (`job_results` bucket),
+where clients can download it, with HTTP range support, once the job is done.
+
+The process that submitted a job owns it while it is queued in or running
+on that process's pool, and refreshes its `heartbeat_at` periodically.
+Jobs whose heartbeat stops (the owning process died) are requeued by
+`recover_stale_jobs`, which every web process runs periodically.
+"""
+import csv
+import importlib
+import io
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import gridfs
+from bson import ObjectId
+from pymongo import ReturnDocument
+from database import db
+from config import Config
+
+# job type -> builder function, populated with @register_job
+JOB_BUILDERS = {}
+
+RESULTS_BUCKET = 'job_results'
+
+
+def register_job(job_type):
+    """Decorator registering a builder function for a job type.
+
+    The builder receives a JobContext and may return a small dict that is
+    stored on the job document as its summary.
+    """
+    def decorator(f):
+        JOB_BUILDERS[job_type] = f
+        return f
+    return decorator
+
+
+def results_bucket():
+    return gridfs.GridFSBucket(db, bucket_name=RESULTS_BUCKET)
+
+
+class JobContext:
+    """Handle given to job builders for progress reporting and CSV output"""
+
+    def __init__(self, job):
+        self.job_id = job['_id']
+        self.params = job.get('params', {})
+        self.total = 0
+        self.processed = 0
+        self.rows_written = 0
+        self._last_reported = 0
+        self._upload = None
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def set_total(self, total):
+        """Set the number of units of work, used to compute progress"""
+        self.total = total
+        db.jobs.update_one({'_id': self.job_id}, {'$set': {
+            'total': total,
+            'updated_at': datetime.utcnow()
+        }})
+
+    def advance(self, count=1):
+        """Record completed units of work, persisting progress periodically"""
+        self.processed += count
+        if self.processed - self._last_reported >= Config.JOB_PROGRESS_INTERVAL:
+            self._report_progress()
+
+    def _report_progress(self):
+        self._last_reported = self.processed
+        progress = round(self.processed / self.total * 100, 1) if self.total else 0
+        db.jobs.update_one({'_id': self.job_id}, {'$set': {
+            'processed': self.processed,
+            'progress': min(progress, 100),
+            'updated_at': datetime.utcnow()
+        }})
+
+    def open_result(self, filename, columns):
+        """Start the CSV result file and write its header row"""
+        # Record the file id first so a crashed attempt's partial upload can be found and removed
+        file_id = ObjectId()
+        db.jobs.update_one({'_id': self.job_id}, {'$set': {'result_file_id': file_id}})
+        self._upload = results_bucket().open_upload_stream_with_id(
+            file_id,
+            filename,
+            chunk_size_bytes=Config.JOB_RESULT_CHUNK_SIZE,
+            metadata={'job_id': self.job_id, 'content_type': 'text/csv'}
+        )
+        self.write_rows([columns])
+        self.rows_written = 0
+
+    def write_rows(self, rows):
+        """Append rows to the CSV result"""
+        self._writer.writerows(rows)
+        self.rows_written += len(rows)
+        if self._buffer.tell() >= Config.JOB_RESULT_CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        data = self._buffer.getvalue()
+        if data:
+            self._upload.write(data.encode('utf-8'))
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def close(self):
+        """Finish the result file; returns its metadata or None if no file was written"""
+        if not self._upload:
+            return None
+        self._flush()
+        self._upload.close()
+        return {
+            'file_id': self._upload._id,
+            'filename': self._upload.filename,
+            'rows': self.rows_written,
+            'size': self._upload.length
+        }
+
+    def abort(self):
+        """Discard a partially written result file"""
+        if self._upload:
+            try:
+                self._upload.abort()
+            except Exception as e:
+                print(f"Job {self.job_id} result abort error: {e}")
+
+
+def _init_worker():
+    """Process pool initializer: import the modules that register builders"""
+    for module in Config.JOB_MODULES:
+        importlib.import_module(module)
+
+
+def run_job(job_id):
+    """Execute a queued job (runs inside a pool worker)"""
+    job = db.jobs.find_one_and_update(
+        {'_id': job_id, 'status': 'queued'},
+        {
+            '$set': {'status': 'running', 'started_at': datetime.utcnow(), 'updated_at': datetime.utcnow()},
+            '$inc': {'attempts': 1}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+    if not job:
+        return
+
+    builder = JOB_BUILDERS.get(job['type'])
+    context = JobContext(job)
+
+    try:
+        if builder is None:
+            raise ValueError(f"Unknown job type: {job['type']}")
+
+        summary = builder(context)
+        result = context.close()
+        context._report_progress()
+
+        db.jobs.update_one({'_id': job_id}, {'$set': {
+            'status': 'completed',
+            'progress': 100,
+            'result': result,
+            'summary': summary or {},
+            'completed_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
+        }})
+    except Exception as e:
+        context.abort()
+        print(f"Job {job_id} failed: {e}")
+        db.jobs.update_one({'_id': job_id}, {'$set': {
+            'status': 'failed',
+            'error': str(e),
+            'traceback': traceback.format_exc()[-4000:],
+            'updated_at': datetime.utcnow()
+        }})
+
+
+def discard_partial_result(file_id):
+    """Delete the chunks (and file document, if any) of an unfinished result upload"""
+    try:
+        results_bucket().delete(file_id)
+    except gridfs.errors.NoFile:
+        # Never closed, so only chunks were written
+        db[f'{RESULTS_BUCKET}.chunks'].delete_many({'files_id': file_id})
+
+
+class JobManager:
+    """Submits jobs to the worker pool and requeues jobs orphaned by a crash"""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._owned = set()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # spawn gives every worker its own MongoClient instead of a forked copy
+            self._executor = ProcessPoolExecutor(
+                max_workers=Config.JOB_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    def _run(self, job_id):
+        """Queue a job on this process's pool and heartbeat it until it finishes"""
+        with self._lock:
+            self._owned.add(job_id)
+        future = self.executor.submit(run_job, job_id)
+        future.add_done_callback(lambda _: self._release(job_id))
+
+    def _release(self, job_id):
+        with self._lock:
+            self._owned.discard(job_id)
+
+    def submit(self, job_type, params=None, created_by=None):
+        """Persist a new job and queue it for execution; returns the job id"""
+        if job_type not in JOB_BUILDERS:
+            raise ValueError(f'Unknown job type: {job_type}')
+
+        now = datetime.utcnow()
+        result = db.jobs.insert_one({
+            'type': job_type,
+            'params': params or {},
+            'status': 'queued',
+            'progress': 0,
+            'processed': 0,
+            'total': 0,
+            'attempts': 0,
+            'result': None,
+            'summary': {},
+            'error': None,
+            'created_by': created_by,
+            'created_at': now,
+            'updated_at': now,
+            'heartbeat_at': now
+        })
+        self._run(result.inserted_id)
+        return result.inserted_id
+
+    def heartbeat(self):
+        """Mark the jobs this process owns as alive (queued or running here)"""
+        with self._lock:
+            owned = list(self._owned)
+        if owned:
+            db.jobs.update_many(
+                {'_id': {'$in': owned}, 'status': {'$in': ['queued', 'running']}},
+                {'$set': {'heartbeat_at': datetime.utcnow()}}
+            )
+
+    def recover_stale_jobs(self):
+        """Requeue jobs whose owner stopped heartbeating (e.g. after a crash).
+
+        A job waiting in a busy pool's queue is still heartbeated by its
+        owner, so only orphaned jobs are taken over. Each stale job is
+        claimed with a conditional update on its heartbeat, so when several
+        processes recover at once only one of them requeues it. The crashed
+        attempt's partial result upload is deleted before the job runs again.
+        """
+        cutoff = datetime.utcnow() - timedelta(minutes=Config.JOB_STALE_MINUTES)
+        # $not also matches jobs queued before heartbeats existed
+        stale_filter = {'status': {'$in': ['queued', 'running']}, 'heartbeat_at': {'$not': {'$gte': cutoff}}}
+        stale = db.jobs.find(stale_filter, {'_id': 1})
+        requeued = 0
+        for candidate in stale:
+            now = datetime.utcnow()
+            job = db.jobs.find_one_and_update(
+                {'_id': candidate['_id'], **stale_filter},
+                {
+                    '$set': {'status': 'queued', 'progress': 0, 'processed': 0, 'updated_at': now, 'heartbeat_at': now},
+                    '$unset': {'result_file_id': ''}
+                },
+                projection={'result_file_id': 1},
+                return_document=ReturnDocument.BEFORE
+            )
+            if not job:
+                continue
+            if job.get('result_file_id'):
+                discard_partial_result(job['result_file_id'])
+            self._run(job['_id'])
+            requeued += 1
+        if requeued:
+            print(f"Requeued {requeued} stale job(s)")
+        return requeued
+
+
+def serialize_job(job):
+    """Serialize a job document for API responses"""
+    result = job.get('result') or {}
+    return {
+        'id': str(job['_id']),
+        'type': job['type'],
+        'params': job.get('params', {}),
+        'status': job['status'],
+        'progress': job.get('progress', 0),
+        'processed': job.get('processed', 0),
+        'total': job.get('total', 0),
+        'summary': job.get('summary', {}),
+        'result': {
+            'filename': result.get('filename'),
+            'rows': result.get('rows', 0),
+            'size': result.get('size', 0)
+        } if result else None,
+        'error': job.get('error'),
+        'created_at': job.get('created_at').isoformat() if job.get('created_at') else None,
+        'completed_at': job.get('completed_at').isoformat() if job.get('completed_at') else None
+    }
+
+
+# Singleton instance
+job_manager = JobManager()
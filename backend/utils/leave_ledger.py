@@ -0,0 +1,296 @@
+"""Leave balance ledger.
+
+Every change to a leave balance is recorded as an entry in `leave_ledger`
+(accrual, consumption or reversal) and applied to a materialized balance in
+`leave_balances`, so reading a balance is a single indexed lookup. Entries
+carry a unique `entry_key`, which makes every posting idempotent: replaying
+an approval, cancellation or accrual run never double-counts.
+"""
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError, OperationFailure
+from database import db
+from config import Config
+from utils.work_calendar import count_working_days
+
+LEAVE_TYPE_KEYS = {
+    'Paid Leave': 'paid_leave',
+    'Sick Leave': 'sick_leave',
+    'Unpaid Leave': 'unpaid_leave'
+}
+
+_transactions_supported = True
+
+
+class InsufficientBalance(Exception):
+    """A consumption would take a leave balance below zero"""
+
+    def __init__(self, leave_type, available, requested):
+        super().__init__(f'{available} day(s) available, {requested} requested')
+        self.leave_type = leave_type
+        self.available = available
+        self.requested = requested
+
+
+def leave_days(start_date, end_date, location=None):
+    """Number of working days a leave consumes"""
+    return count_working_days(start_date, end_date, location)
+
+
+def _run_atomic(operation):
+    """Run operation(session) in a transaction when the deployment supports it.
+
+    Standalone servers (e.g. a local development mongod) reject
+    transactions; there we fall back to running without a session and rely
+    on the unique entry_key for idempotency.
+    """
+    global _transactions_supported
+    if _transactions_supported:
+        try:
+            with db.client.start_session() as session:
+                return session.with_transaction(operation)
+        except OperationFailure as e:
+            if e.code != 20 and 'Transaction numbers' not in str(e):
+                raise
+            _transactions_supported = False
+    return operation(None)
+
+
+def post_entry(employee_id, leave_type, delta, kind, entry_key, leave_id=None, period=None, created_by=None,
+               require_balance=False):
+    """Record a ledger entry and apply it to the materialized balance.
+
+    Returns False if an entry with the same key was already posted. With
+    require_balance, a debit is only applied while the balance covers it;
+    otherwise the entry is rolled back and InsufficientBalance is raised.
+    """
+    entry = {
+        'employee_id': employee_id,
+        'leave_type': leave_type,
+        'delta': delta,
+        'kind': kind,
+        'entry_key': entry_key,
+        'leave_id': leave_id,
+        'period': period,
+        'created_by': created_by,
+        'created_at': datetime.utcnow()
+    }
+
+    balance_filter = {'employee_id': employee_id}
+    if require_balance:
+        balance_filter[f'balances.{leave_type}'] = {'$gte': -delta}
+
+    def operation(session):
+        db.leave_ledger.insert_one(entry, session=session)
+        result = db.leave_balances.update_one(
+            balance_filter,
+            {
+                '$inc': {f'balances.{leave_type}': delta},
+                '$set': {'updated_at': datetime.utcnow()}
+            },
+            upsert=not require_balance,
+            session=session
+        )
+        if require_balance and result.modified_count == 0:
+            if session is None:
+                # No transaction to abort: undo the entry so it can be posted later
+                db.leave_ledger.delete_one({'entry_key': entry_key})
+            doc = db.leave_balances.find_one({'employee_id': employee_id}, {'balances': 1}, session=session) or {}
+            raise InsufficientBalance(leave_type, doc.get('balances', {}).get(leave_type, 0), -delta)
+        return True
+
+    try:
+        return _run_atomic(operation)
+    except DuplicateKeyError:
+        return False
+
+
+def _opening_amounts(employee_id):
+    """Opening entitlement of an employee (their leave_balance, else the default)"""
+    user = db.users.find_one({'employee_id': employee_id}, {'leave_balance': 1})
+    return (user or {}).get('leave_balance') or Config.LEAVE_ENTITLEMENTS
+
+
+def _approved_leaves(employee_id):
+    return db.leaves.find(
+        {'employee_id': employee_id, 'status': 'Approved'},
+        {'leave_type': 1, 'start_date': 1, 'end_date': 1, 'days': 1, 'location': 1}
+    )
+
+
+def _days_of(leave):
+    return leave.get('days') or leave_days(leave['start_date'], leave['end_date'], leave.get('location'))
+
+
+def open_balance(employee_id):
+    """Post the opening entitlement for an employee with no balance yet.
+
+    Leaves approved before the ledger existed are consumed as part of the
+    opening, unconditionally, so the balance reflects them. Every entry is
+    keyed, so opening an employee twice posts nothing new.
+    """
+    for leave_type, amount in _opening_amounts(employee_id).items():
+        post_entry(employee_id, leave_type, amount, 'accrual', f'opening:{employee_id}:{leave_type}', period='opening')
+    for leave in _approved_leaves(employee_id):
+        post_entry(
+            employee_id, LEAVE_TYPE_KEYS[leave['leave_type']], -_days_of(leave), 'consumption',
+            f"consumption:{leave['_id']}", leave_id=str(leave['_id']), period='opening'
+        )
+    return db.leave_balances.find_one({'employee_id': employee_id})
+
+
+def seed_balances():
+    """Open a balance for every employee that has none (migration; safe to rerun)"""
+    employee_ids = [u['employee_id'] for u in db.users.find({'role': 'employee'}, {'employee_id': 1}) if u.get('employee_id')]
+    existing = set(db.leave_balances.distinct('employee_id', {'employee_id': {'$in': employee_ids}}))
+    seeded = 0
+    for employee_id in employee_ids:
+        if employee_id not in existing:
+            open_balance(employee_id)
+            seeded += 1
+    return {'employees': len(employee_ids), 'seeded': seeded}
+
+
+def _unopened_balance(employee_id):
+    """Balance an employee would open with, computed without writing anything"""
+    balances = dict(_opening_amounts(employee_id))
+    for leave in _approved_leaves(employee_id):
+        leave_type = LEAVE_TYPE_KEYS[leave['leave_type']]
+        balances[leave_type] = balances.get(leave_type, 0) - _days_of(leave)
+    return balances
+
+
+def get_balance(employee_id):
+    """Current balances as {'paid_leave': n, 'sick_leave': n, 'unpaid_leave': n}.
+
+    Read-only: employees without a balance yet (see seed_balances) get the
+    balance they would open with.
+    """
+    doc = db.leave_balances.find_one({'employee_id': employee_id}, {'balances': 1})
+    balances = dict.fromkeys(LEAVE_TYPE_KEYS.values(), 0)
+    balances.update(doc.get('balances', {}) if doc else _unopened_balance(employee_id))
+    return balances
+
+
+def get_balances(employee_ids):
+    """Balances for many employees with one query (see get_balance for missing ones)"""
+    found = {
+        doc['employee_id']: doc.get('balances', {})
+        for doc in db.leave_balances.find({'employee_id': {'$in': list(employee_ids)}}, {'employee_id': 1, 'balances': 1})
+    }
+    result = {}
+    for employee_id in employee_ids:
+        balances = dict.fromkeys(LEAVE_TYPE_KEYS.values(), 0)
+        balances.update(found[employee_id] if employee_id in found else get_balance(employee_id))
+        result[employee_id] = balances
+    return result
+
+
+def pending_days(employee_id, leave_type):
+    """Days requested by an employee's pending leaves of a type (e.g. 'Paid Leave')"""
+    rows = list(db.leaves.aggregate([
+        {'$match': {'employee_id': employee_id, 'leave_type': leave_type, 'status': 'Pending'}},
+        {'$group': {'_id': None, 'days': {'$sum': {'$ifNull': ['$days', 0]}}}}
+    ]))
+    return rows[0]['days'] if rows else 0
+
+
+def consume(leave, created_by=None, days=None):
+    """Deduct an approved leave's days from the employee's balance.
+
+    The deduction is conditional on the balance covering it, so concurrent
+    approvals cannot overdraw; raises InsufficientBalance when it does not.
+    Returns False if the leave was already consumed.
+    """
+    leave_type = LEAVE_TYPE_KEYS[leave['leave_type']]
+    days = days if days is not None else leave.get('days') or leave_days(leave['start_date'], leave['end_date'], leave.get('location'))
+    if not db.leave_balances.find_one({'employee_id': leave['employee_id']}, {'_id': 1}):
+        open_balance(leave['employee_id'])
+    return post_entry(
+        leave['employee_id'], leave_type, -days, 'consumption',
+        f"consumption:{leave['_id']}", leave_id=str(leave['_id']), created_by=created_by,
+        require_balance=True
+    )
+
+
+def reverse(leave, created_by=None):
+    """Give back the days consumed by a leave that is being cancelled"""
+    consumed = db.leave_ledger.find_one(
+        {'entry_key': f"consumption:{leave['_id']}"},
+        {'employee_id': 1, 'leave_type': 1, 'delta': 1}
+    )
+    if not consumed:
+        return False
+    return post_entry(
+        consumed['employee_id'], consumed['leave_type'], -consumed['delta'], 'reversal',
+        f"reversal:{leave['_id']}", leave_id=str(leave['_id']), created_by=created_by
+    )
+
+
+def accrue(period, amounts, employee_ids=None, created_by=None):
+    """Credit accrual amounts to every employee for a period (idempotent per period).
+
+    Entries are inserted unordered in one batch; only the ones that were not
+    already posted for this period are applied to balances, in one bulk_write.
+    """
+    if employee_ids is None:
+        employee_ids = [u['employee_id'] for u in db.users.find({'role': 'employee'}, {'employee_id': 1})]
+
+    # Make sure opening balances exist before crediting
+    existing = set(db.leave_balances.distinct('employee_id', {'employee_id': {'$in': employee_ids}}))
+    for employee_id in employee_ids:
+        if employee_id not in existing:
+            open_balance(employee_id)
+
+    now = datetime.utcnow()
+    entries = [{
+        'employee_id': employee_id,
+        'leave_type': leave_type,
+        'delta': amount,
+        'kind': 'accrual',
+        'entry_key': f'accrual:{period}:{employee_id}:{leave_type}',
+        'leave_id': None,
+        'period': period,
+        'created_by': created_by,
+        'created_at': now
+    } for employee_id in employee_ids for leave_type, amount in amounts.items() if amount]
+
+    if not entries:
+        return 0
+
+    failed = set()
+    try:
+        db.leave_ledger.insert_many(entries, ordered=False)
+    except BulkWriteError as e:
+        failed = {err['index'] for err in e.details.get('writeErrors', []) if err.get('code') == 11000}
+        if len(failed) != len(e.details.get('writeErrors', [])):
+            raise
+
+    operations = [
+        UpdateOne(
+            {'employee_id': entry['employee_id']},
+            {'$inc': {f"balances.{entry['leave_type']}": entry['delta']}, '$set': {'updated_at': now}},
+            upsert=True
+        )
+        for index, entry in enumerate(entries) if index not in failed
+    ]
+    if operations:
+        db.leave_balances.bulk_write(operations, ordered=False)
+
+    return len(operations)
+
+
+def rebuild_balance(employee_id):
+    """Recompute a materialized balance from the ledger (repair tool)"""
+    balances = dict.fromkeys(LEAVE_TYPE_KEYS.values(), 0)
+    for row in db.leave_ledger.aggregate([
+        {'$match': {'employee_id': employee_id}},
+        {'$group': {'_id': '$leave_type', 'total': {'$sum': '$delta'}}}
+    ]):
+        balances[row['_id']] = row['total']
+    db.leave_balances.update_one(
+        {'employee_id': employee_id},
+        {'$set': {'balances': balances, 'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+    return balances
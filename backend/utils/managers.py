@@ -0,0 +1,76 @@
+"""Employee to manager assignment.
+
+Leaves are scoped to a manager through `manager_id`, denormalized from
+`users.manager_id` when the leave is applied for. Admins rarely set that
+field, but every timesheet records the manager the employee submitted it
+to, so the latest timesheet is used to fill in unassigned employees.
+Leaves of an employee follow their assignment: unassigned leaves are
+stamped, and pending leaves move with a reassignment.
+"""
+from datetime import datetime
+from pymongo import UpdateMany, UpdateOne
+from database import db
+
+
+def restamp_leaves(employee_id, manager_id):
+    """Point an employee's unassigned and pending leaves at their manager"""
+    return db.leaves.update_many(
+        {'employee_id': employee_id, '$or': [{'manager_id': None}, {'status': 'Pending'}]},
+        {'$set': {'manager_id': manager_id}}
+    ).modified_count
+
+
+def assign_manager(employee_id, manager_id, only_unassigned=False):
+    """Set an employee's manager and restamp their leaves.
+
+    With only_unassigned, employees who already have a manager are left
+    alone. Returns True if the employee's assignment changed.
+    """
+    query = {'employee_id': employee_id}
+    if only_unassigned:
+        query['manager_id'] = None
+    result = db.users.update_one(query, {'$set': {'manager_id': manager_id, 'updated_at': datetime.utcnow()}})
+    if not result.modified_count:
+        return False
+
+    restamp_leaves(employee_id, manager_id)
+    return True
+
+
+def backfill_manager_ids():
+    """Assign unassigned employees from their latest timesheet and stamp unassigned leaves.
+
+    Safe to rerun: only documents with no manager_id are written.
+    """
+    latest = db.timesheets.aggregate([
+        {'$match': {'manager_id': {'$ne': None}}},
+        {'$sort': {'employee_id': 1, 'week_start': -1}},
+        {'$group': {'_id': '$employee_id', 'manager_id': {'$first': '$manager_id'}}}
+    ], allowDiskUse=True)
+    now = datetime.utcnow()
+    user_updates = [
+        UpdateOne(
+            {'employee_id': row['_id'], 'role': 'employee', 'manager_id': None},
+            {'$set': {'manager_id': row['manager_id'], 'updated_at': now}}
+        )
+        for row in latest
+    ]
+    users_assigned = 0
+    if user_updates:
+        users_assigned = db.users.bulk_write(user_updates, ordered=False).modified_count
+
+    leave_updates = [
+        UpdateMany(
+            {'employee_id': user['employee_id'], 'manager_id': None},
+            {'$set': {'manager_id': user['manager_id']}}
+        )
+        for user in db.users.find(
+            {'role': 'employee', 'manager_id': {'$ne': None}},
+            {'_id': 0, 'employee_id': 1, 'manager_id': 1}
+        )
+    ]
+    leaves_stamped = 0
+    if leave_updates:
+        leaves_stamped = db.leaves.bulk_write(leave_updates, ordered=False).modified_count
+
+    return {'users_assigned': users_assigned, 'leaves_stamped': leaves_stamped}
@@ -0,0 +1,86 @@
+"""Background queue for email notifications so requests never wait on SMTP.
+
+Every queued notification is also recorded in the `notifications`
+collection (an outbox) and marked once the sender has run. Mail queued by
+a process that exits before sending it stays pending there and is queued
+again by `redeliver_pending`, which web processes run periodically.
+Delivery is at least once: a process dying between sending and marking
+can repeat a mail. Senders that report failure are not retried.
+"""
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from database import db
+from config import Config
+
+
+class NotificationQueue:
+    """Runs notification senders on a small pool of background threads"""
+
+    def __init__(self, max_workers):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='notify')
+
+    def enqueue(self, sender, *args, **kwargs):
+        """Queue sender(*args, **kwargs) and return immediately"""
+        return self.enqueue_many(sender, [args], kwargs)[0]
+
+    def enqueue_many(self, sender, calls, kwargs=None):
+        """Queue sender(*args, **kwargs) for every args tuple in calls, with one outbox write"""
+        if not calls:
+            return []
+        kwargs = kwargs or {}
+        now = datetime.utcnow()
+        result = db.notifications.insert_many([{
+            'sender': f'{sender.__module__}:{sender.__name__}',
+            'args': list(args),
+            'kwargs': kwargs,
+            'status': 'pending',
+            'created_at': now,
+            'queued_at': now
+        } for args in calls])
+        return [
+            self._executor.submit(self._deliver, notification_id, sender, args, kwargs)
+            for notification_id, args in zip(result.inserted_ids, calls)
+        ]
+
+    def redeliver_pending(self):
+        """Queue again outbox entries left pending for NOTIFICATION_RETRY_MINUTES"""
+        cutoff = datetime.utcnow() - timedelta(minutes=Config.NOTIFICATION_RETRY_MINUTES)
+        requeued = 0
+        for notification in db.notifications.find({'status': 'pending', 'queued_at': {'$lt': cutoff}}):
+            # Claim it so only one process re-queues it
+            claimed = db.notifications.update_one(
+                {'_id': notification['_id'], 'status': 'pending', 'queued_at': notification['queued_at']},
+                {'$set': {'queued_at': datetime.utcnow()}}
+            )
+            if not claimed.modified_count:
+                continue
+            module, name = notification['sender'].split(':')
+            sender = getattr(importlib.import_module(module), name)
+            self._executor.submit(self._deliver, notification['_id'], sender, notification['args'], notification['kwargs'])
+            requeued += 1
+        if requeued:
+            print(f"Requeued {requeued} pending notification(s)")
+        return requeued
+
+    @staticmethod
+    def _deliver(notification_id, sender, args, kwargs):
+        status = 'failed'
+        try:
+            if sender(*args, **kwargs):
+                status = 'sent'
+            else:
+                print(f"Notification {sender.__name__} was not delivered")
+        except Exception as e:
+            print(f"Notification {sender.__name__} error: {e}")
+        try:
+            db.notifications.update_one(
+                {'_id': notification_id},
+                {'$set': {'status': status, 'delivered_at': datetime.utcnow()}}
+            )
+        except Exception as e:
+            print(f"Notification outbox update error: {e}")
+
+
+# Singleton instance
+notification_queue = NotificationQueue(Config.NOTIFICATION_WORKERS)
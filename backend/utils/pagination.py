@@ -0,0 +1,108 @@
+"""Keyset (cursor) pagination helpers for list endpoints"""
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a malformed pagination cursor"""
+
+
+class InvalidLimit(ValueError):
+    """Raised when a client sends a page size that is not an integer"""
+
+
+def page_limit(value, default, maximum):
+    """Parse a page size query argument, clamped to 1..maximum"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise InvalidLimit('Invalid limit: must be an integer')
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(sort_value, doc_id):
+    """Encode the last row's sort key and _id into an opaque cursor string"""
+    if isinstance(sort_value, ObjectId):
+        sort_value = {'$oid': str(sort_value)}
+    elif hasattr(sort_value, 'isoformat'):
+        sort_value = {'$date': sort_value.isoformat()}
+    payload = json.dumps([sort_value, str(doc_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor string back into (sort_value, ObjectId)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if isinstance(sort_value, dict) and '$oid' in sort_value:
+            sort_value = ObjectId(sort_value['$oid'])
+        elif isinstance(sort_value, dict) and '$date' in sort_value:
+            sort_value = datetime.fromisoformat(sort_value['$date'])
+        return sort_value, ObjectId(doc_id)
+    except Exception as e:
+        raise InvalidCursor(f'Invalid cursor: {e}')
+
+
+def keyset_filter(sort_field, cursor, descending=False):
+    """Build the query clause that selects rows strictly after the cursor.
+
+    Rows are ordered by (sort_field, _id) so ties on the sort key are
+    broken deterministically and every page is a single index range scan.
+    MongoDB sorts null and missing values before everything else, but
+    $gt/$lt never match them, so they are handled explicitly: they follow
+    every value in a descending scan, and a cursor sitting on a null only
+    continues through the remaining nulls (descending) or on to every
+    non-null value (ascending).
+    """
+    if not cursor:
+        return {}
+    sort_value, doc_id = decode_cursor(cursor)
+    op = '$lt' if descending else '$gt'
+    if sort_value is None:
+        clauses = [{sort_field: None, '_id': {op: doc_id}}]
+        if not descending:
+            clauses.append({sort_field: {'$ne': None}})
+        return {'$or': clauses}
+    clauses = [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, '_id': {op: doc_id}}
+    ]
+    if descending:
+        clauses.append({sort_field: None})
+    return {'$or': clauses}
+
+
+def keyset_sort(sort_field, descending=False):
+    """Sort specification matching keyset_filter"""
+    direction = -1 if descending else 1
+    return [(sort_field, direction), ('_id', direction)]
+
+
+def paginate(collection, query, sort_field, limit, cursor=None, descending=False, projection=None):
+    """Fetch one page of documents and the cursor for the next page.
+
+    Returns (documents, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, limit)
+    page_filter = keyset_filter(sort_field, cursor, descending)
+    if page_filter:
+        query = {'$and': [query, page_filter]} if query else page_filter
+
+    docs = list(
+        collection.find(query, projection)
+        .sort(keyset_sort(sort_field, descending))
+        .limit(limit + 1)
+    )
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last['_id'])
+
+    return docs, next_cursor
@@ -0,0 +1,103 @@
+"""Payslip PDF rendering and cache.
+
+Rendering is CPU-bound, so on-demand renders run in a dedicated process
+pool instead of on request threads. Rendered files are cached in GridFS
+(`payslip_pdfs` bucket) under `<payslip id>-<content hash>.pdf`: a payslip
+whose content changes (e.g. it is marked paid) gets a new file, and stale
+versions are removed. Payroll runs pre-render the whole month, through
+the same pool, so payday downloads are served from the cache.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import gridfs
+from database import db
+from config import Config
+from utils.payslip_pdf import render_payslip_pdf, payslip_content_hash
+
+PDF_BUCKET = 'payslip_pdfs'
+
+
+def pdf_bucket():
+    return gridfs.GridFSBucket(db, bucket_name=PDF_BUCKET)
+
+
+def _filename(payslip, content_hash):
+    return f"{payslip['_id']}-{content_hash}.pdf"
+
+
+class PayslipPdfService:
+    """Serves payslip PDFs from the cache, rendering misses in a process pool"""
+
+    def __init__(self):
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=Config.PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def _store(self, payslip, content_hash, data):
+        """Upload a rendered PDF and drop older versions of the same payslip"""
+        payslip_id = str(payslip['_id'])
+        bucket = pdf_bucket()
+        bucket.upload_from_stream(
+            _filename(payslip, content_hash),
+            data,
+            metadata={'payslip_id': payslip_id, 'content_hash': content_hash, 'content_type': 'application/pdf'}
+        )
+        stale = db[f'{PDF_BUCKET}.files'].find(
+            {'metadata.payslip_id': payslip_id, 'metadata.content_hash': {'$ne': content_hash}},
+            {'_id': 1}
+        )
+        for file in stale:
+            try:
+                bucket.delete(file['_id'])
+            except gridfs.errors.NoFile:
+                pass
+
+    def get_pdf(self, payslip):
+        """PDF bytes and content hash for a payslip, rendering on a cache miss"""
+        content_hash = payslip_content_hash(payslip)
+        cached = db[f'{PDF_BUCKET}.files'].find_one({'filename': _filename(payslip, content_hash)}, {'_id': 1})
+        if cached:
+            try:
+                return pdf_bucket().open_download_stream(cached['_id']).read(), content_hash
+            except gridfs.errors.NoFile:
+                pass
+
+        data = self.executor.submit(render_payslip_pdf, payslip).result(timeout=Config.PDF_RENDER_TIMEOUT)
+        self._store(payslip, content_hash, data)
+        return data, content_hash
+
+    def prerender(self, payslips, progress=None):
+        """Render and cache every payslip that has no current PDF.
+
+        Renders are spread over the render pool and stored as they complete.
+        Returns the number of PDFs rendered.
+        """
+        hashes = {str(p['_id']): payslip_content_hash(p) for p in payslips}
+        cached = set(
+            f['filename'] for f in db[f'{PDF_BUCKET}.files'].find(
+                {'filename': {'$in': [_filename(p, hashes[str(p['_id'])]) for p in payslips]}},
+                {'filename': 1}
+            )
+        )
+        missing = [p for p in payslips if _filename(p, hashes[str(p['_id'])]) not in cached]
+        if progress:
+            progress.advance(len(payslips) - len(missing))
+
+        futures = {self.executor.submit(render_payslip_pdf, payslip): payslip for payslip in missing}
+        for future in as_completed(futures):
+            payslip = futures[future]
+            self._store(payslip, hashes[str(payslip['_id'])], future.result())
+            if progress:
+                progress.advance()
+        return len(missing)
+
+
+# Singleton instance
+payslip_pdfs = PayslipPdfService()
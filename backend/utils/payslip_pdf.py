@@ -0,0 +1,119 @@
+"""Payslip PDF layout.
+
+Kept free of database and Flask imports, so importing it in a render pool
+worker does not open a MongoDB connection. Spawned workers still re-import
+the parent's main script, so when the server is started as `python app.py`
+each worker also connects (collection setup stays in the main process, see
+database.Database); under a WSGI server or `flask run` they don't.
+"""
+import hashlib
+import io
+import json
+from datetime import datetime
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+# Bump when the layout changes so cached PDFs are re-rendered
+RENDER_VERSION = 2
+
+# Marks a section header row in the amounts table
+HEADER = object()
+
+# Payslip fields that appear on the PDF; only these affect the content hash
+PDF_FIELDS = [
+    'employee_id', 'employee_name', 'employee_email', 'month_year', 'basic', 'hra',
+    'allowances', 'deductions', 'gross_salary', 'working_days', 'payable_days',
+    'loss_of_pay_days', 'loss_of_pay', 'net_salary', 'status', 'paid_on'
+]
+
+
+def payslip_content_hash(payslip):
+    """Hash of everything the rendered PDF depends on"""
+    content = {field: payslip.get(field) for field in PDF_FIELDS}
+    content['_render_version'] = RENDER_VERSION
+    basis = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(basis.encode('utf-8')).hexdigest()[:32]
+
+
+def _money(value):
+    return f"{value or 0:,.2f}"
+
+
+def render_payslip_pdf(payslip):
+    """Render a payslip document to PDF bytes (CPU-bound; runs in the render pool)"""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    left = 20 * mm
+    right = width - 20 * mm
+    y = height - 25 * mm
+
+    month = datetime.strptime(payslip['month_year'], '%Y-%m').strftime('%B %Y')
+    pdf.setTitle(f"Payslip {payslip['employee_id']} {payslip['month_year']}")
+
+    pdf.setFont('Helvetica-Bold', 18)
+    pdf.drawString(left, y, 'Dayflow HRMS')
+    pdf.setFont('Helvetica', 11)
+    pdf.drawRightString(right, y, f'Payslip for {month}')
+    y -= 8 * mm
+    pdf.line(left, y, right, y)
+    y -= 10 * mm
+
+    details = [
+        ('Employee', payslip.get('employee_name', '')),
+        ('Employee ID', payslip['employee_id']),
+        ('Email', payslip.get('employee_email', '')),
+        ('Working days', payslip.get('working_days') if payslip.get('working_days') is not None else '-'),
+        ('Payable days', payslip.get('payable_days') if payslip.get('payable_days') is not None else '-'),
+        ('Status', payslip.get('status', 'Generated'))
+    ]
+    pdf.setFont('Helvetica', 10)
+    for label, value in details:
+        pdf.drawString(left, y, label)
+        pdf.drawString(left + 45 * mm, y, str(value))
+        y -= 6 * mm
+    y -= 6 * mm
+
+    # Payslips from before proration (or older ones missing components) print 0
+    rows = [
+        ('Earnings', HEADER),
+        ('Basic', payslip.get('basic')),
+        ('HRA', payslip.get('hra')),
+        ('Allowances', payslip.get('allowances')),
+        ('Gross salary', payslip.get('gross_salary')),
+        ('Deductions', HEADER),
+        ('Other deductions', payslip.get('deductions')),
+        (f"Loss of pay ({payslip.get('loss_of_pay_days') or 0} days)", payslip.get('loss_of_pay')),
+    ]
+    for label, amount in rows:
+        if amount is HEADER:
+            pdf.setFont('Helvetica-Bold', 11)
+            pdf.drawString(left, y, label)
+            y -= 2 * mm
+            pdf.line(left, y, right, y)
+            y -= 6 * mm
+            continue
+        pdf.setFont('Helvetica', 10)
+        pdf.drawString(left, y, label)
+        pdf.drawRightString(right, y, _money(amount))
+        y -= 6 * mm
+
+    y -= 4 * mm
+    pdf.line(left, y, right, y)
+    y -= 8 * mm
+    pdf.setFont('Helvetica-Bold', 12)
+    pdf.drawString(left, y, 'Net salary')
+    pdf.drawRightString(right, y, _money(payslip.get('net_salary')))
+
+    if payslip.get('paid_on'):
+        y -= 8 * mm
+        pdf.setFont('Helvetica', 9)
+        pdf.drawString(left, y, f"Paid on {payslip['paid_on'].strftime('%d %b %Y')}")
+
+    pdf.setFont('Helvetica-Oblique', 8)
+    pdf.drawString(left, 15 * mm, 'This is a system generated payslip and does not require a signature.')
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
@@ -0,0 +1,183 @@
+"""Token-budgeted prompt context.
+
+Context for the AI assistant is assembled from sections. Each section has
+a priority, a headline, an optional shorter summary and optional detail
+lines. The builder fits them into a token budget in two passes:
+
+1. Headlines, most important first. A headline that does not fit falls
+   back to its summary; if that does not fit either, the section is dropped.
+2. Detail lines, most important section first, as many as still fit. The
+   rest are replaced by an "... and N more" marker, whose room is reserved
+   while the lines are added.
+
+Every line is charged with its joining newline, so the rendered text never
+estimates above the budget.
+
+Sections keep the order they were added in, so the prompt reads the same
+whatever gets trimmed. Tokens are estimated at ~4 characters each, which is
+close enough for budgeting; the real counts come back in the API usage
+and are recorded per endpoint by `prompt_usage`.
+"""
+import math
+import threading
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Rough token count of a string"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def estimate_message_tokens(messages):
+    """Rough token count of a chat messages list (content plus per-message overhead)"""
+    return sum(estimate_tokens(m.get('content', '')) + 4 for m in messages)
+
+
+def _line_cost(text):
+    """Tokens a line adds to the rendered context, newline included"""
+    return estimate_tokens(text + "\n")
+
+
+def _more_marker(count):
+    return f"  ... and {count} more"
+
+
+class ContextBuilder:
+    """Collects prompt sections and renders them within a token budget"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.sections = []
+
+    def add(self, name, text, priority=0, summary=None, items=None):
+        """Add a section; lower priority numbers are kept first"""
+        self.sections.append({
+            'name': name,
+            'text': text,
+            'priority': priority,
+            'summary': summary,
+            'items': list(items or [])
+        })
+        return self
+
+    def build(self):
+        """Render the sections; returns (text, stats)"""
+        remaining = self.budget
+        by_priority = sorted(range(len(self.sections)), key=lambda i: self.sections[i]['priority'])
+        headlines = {}
+        details = {}
+        summarized = []
+        dropped = []
+
+        for i in by_priority:
+            section = self.sections[i]
+            for text, is_summary in ((section['text'], False), (section['summary'], True)):
+                if text and _line_cost(text) <= remaining:
+                    headlines[i] = text
+                    remaining -= _line_cost(text)
+                    if is_summary:
+                        summarized.append(section['name'])
+                    break
+            else:
+                dropped.append(section['name'])
+
+        omitted_items = 0
+        for i in by_priority:
+            items = self.sections[i]['items']
+            if i not in headlines or not items:
+                continue
+            # Room for the widest possible marker stays free while more items follow
+            reserve = _line_cost(_more_marker(len(items)))
+            lines = []
+            for position, item in enumerate(items):
+                cost = _line_cost(item)
+                if cost + (reserve if position < len(items) - 1 else 0) > remaining:
+                    break
+                lines.append(item)
+                remaining -= cost
+            omitted = len(items) - len(lines)
+            if omitted:
+                omitted_items += omitted
+                marker = _more_marker(omitted)
+                if _line_cost(marker) <= remaining:
+                    lines.append(marker)
+                    remaining -= _line_cost(marker)
+            details[i] = lines
+
+        parts = []
+        for i in range(len(self.sections)):
+            if i in headlines:
+                parts.append(headlines[i])
+                parts.extend(details.get(i, []))
+        text = "\n".join(parts)
+
+        return text, {
+            'budget': self.budget,
+            'estimated_tokens': estimate_tokens(text),
+            'summarized': summarized,
+            'dropped': dropped,
+            'omitted_items': omitted_items
+        }
+
+
+class PromptUsage:
+    """Per-endpoint prompt size and token usage, kept per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _entry(self, endpoint):
+        return self._endpoints.setdefault(endpoint, {
+            'requests': 0,
+            'cached': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'max_prompt_tokens': 0,
+            'estimated_requests': 0,
+            'context_tokens': 0,
+            'contexts_built': 0,
+            'contexts_trimmed': 0
+        })
+
+    def record_context(self, endpoint, stats):
+        """Record the size of a built context and whether it had to be trimmed"""
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry['contexts_built'] += 1
+            entry['context_tokens'] += stats['estimated_tokens']
+            if stats['summarized'] or stats['dropped'] or stats['omitted_items']:
+                entry['contexts_trimmed'] += 1
+
+    def record_completion(self, endpoint, usage, cached=False, estimated=False):
+        """Record token usage of one completion; cached replies cost no tokens"""
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry['requests'] += 1
+            if cached:
+                entry['cached'] += 1
+                return
+            prompt_tokens = usage.get('prompt_tokens', 0)
+            entry['prompt_tokens'] += prompt_tokens
+            entry['completion_tokens'] += usage.get('completion_tokens', 0)
+            entry['max_prompt_tokens'] = max(entry['max_prompt_tokens'], prompt_tokens)
+            if estimated:
+                entry['estimated_requests'] += 1
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._endpoints.items():
+                billed = entry['requests'] - entry['cached']
+                built = entry['contexts_built']
+                result[endpoint] = {
+                    **entry,
+                    'avg_prompt_tokens': round(entry['prompt_tokens'] / billed) if billed else 0,
+                    'avg_context_tokens': round(entry['context_tokens'] / built) if built else 0
+                }
+            return result
+
+
+# Singleton instance
+prompt_usage = PromptUsage()
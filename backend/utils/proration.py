@@ -0,0 +1,159 @@
+"""Attendance-aware payroll proration.
+
+A month's attendance is reduced to per-employee status counts with one
+aggregation, and approved unpaid leaves with one query. The counts are
+loaded into columnar NumPy arrays so payable days and loss of pay are
+computed for every employee at once instead of row by row.
+
+Loss-of-pay days are unpaid leave days, absences (working days without an
+attendance or leave record, from the joining date up to today) and half of
+every half-day. They are charged at gross salary / working days of the
+month. Absences only count when PAYROLL_PRORATE_ABSENCES is enabled.
+"""
+from datetime import date, datetime, timedelta
+import numpy as np
+from database import db
+from config import Config
+from utils.work_calendar import count_working_days, parse_date
+
+
+def month_bounds(month_year):
+    """First and last date of a YYYY-MM month"""
+    year, month = (int(part) for part in month_year.split('-'))
+    first = date(year, month, 1)
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return first, last
+
+
+def gross_salary(salary):
+    """Gross monthly salary from a users.salary sub-document"""
+    return salary.get('basic', 0) + salary.get('hra', 0) + salary.get('allowances', 0)
+
+
+def joining_date(employee):
+    """Date an employee joined: date_of_joining, else when their account was created"""
+    joined = employee.get('date_of_joining') or employee.get('created_at')
+    if isinstance(joined, datetime):
+        return joined.date()
+    if isinstance(joined, str) and joined:
+        try:
+            return parse_date(joined[:10])
+        except ValueError:
+            return None
+    return joined if isinstance(joined, date) else None
+
+
+def _employee_filter(index, all_employees):
+    """Restrict a query to the prorated employees unless every employee is being prorated"""
+    return {} if all_employees else {'employee_id': {'$in': list(index)}}
+
+
+def _attendance_counts(index, first, last, all_employees=False):
+    """Present, half-day and leave day counts per employee as arrays"""
+    counts = np.zeros((3, len(index)), dtype=np.float64)
+    if last < first:
+        return counts
+    pipeline = [
+        {'$match': {
+            'date': {'$gte': first.strftime('%Y-%m-%d'), '$lte': last.strftime('%Y-%m-%d')},
+            **_employee_filter(index, all_employees)
+        }},
+        {'$group': {
+            '_id': '$employee_id',
+            'present': {'$sum': {'$cond': [{'$eq': ['$status', 'Present']}, 1, 0]}},
+            'half_day': {'$sum': {'$cond': [{'$eq': ['$status', 'Half-day']}, 1, 0]}},
+            'leave': {'$sum': {'$cond': [{'$eq': ['$status', 'Leave']}, 1, 0]}}
+        }}
+    ]
+    for row in db.attendance.aggregate(pipeline, allowDiskUse=True):
+        i = index.get(row['_id'])
+        if i is not None:
+            counts[:, i] = (row['present'], row['half_day'], row['leave'])
+    return counts
+
+
+def _unpaid_leave_days(index, locations, first, last, all_employees=False):
+    """Working days of approved unpaid leave inside the month per employee"""
+    days = np.zeros(len(index), dtype=np.float64)
+    month_start = first.strftime('%Y-%m-%d')
+    month_end = last.strftime('%Y-%m-%d')
+    leaves = db.leaves.find(
+        {
+            'status': 'Approved',
+            'leave_type': 'Unpaid Leave',
+            'start_date': {'$lte': month_end},
+            'end_date': {'$gte': month_start},
+            **_employee_filter(index, all_employees)
+        },
+        {'_id': 0, 'employee_id': 1, 'start_date': 1, 'end_date': 1}
+    )
+    for leave in leaves:
+        i = index.get(leave['employee_id'])
+        if i is not None:
+            days[i] += count_working_days(
+                max(parse_date(leave['start_date']), first),
+                min(parse_date(leave['end_date']), last),
+                locations[i]
+            )
+    return days
+
+
+def prorate(employees, month_year, today=None, all_employees=False):
+    """Proration for a month, keyed by employee_id.
+
+    employees are salary snapshots (employee_id, salary, location and
+    joining date). Each result has working_days, payable_days,
+    loss_of_pay_days and loss_of_pay.
+    Attendance and leave queries are limited to these employees; pass
+    all_employees=True when they are the whole organisation to scan the
+    month without the employee filter.
+    """
+    if not employees:
+        return {}
+
+    first, last = month_bounds(month_year)
+    elapsed_end = min(last, today or date.today())
+    ids = [e['employee_id'] for e in employees]
+    index = {employee_id: i for i, employee_id in enumerate(ids)}
+    locations = [e.get('location') for e in employees]
+    gross = np.array([gross_salary(e.get('salary') or {}) for e in employees], dtype=np.float64)
+
+    # Working days only differ by location, so compute them once per location
+    working = np.empty(len(ids), dtype=np.float64)
+    elapsed = np.empty(len(ids), dtype=np.float64)
+    location_column = np.array([loc or Config.DEFAULT_LOCATION for loc in locations], dtype=object)
+    for location in set(location_column):
+        mask = location_column == location
+        working[mask] = count_working_days(first, last, location)
+        elapsed[mask] = count_working_days(first, elapsed_end, location)
+    
+    # Days before an employee joined are not absences
+    for i, employee in enumerate(employees):
+        joined = joining_date(employee)
+        if joined and joined > first:
+            elapsed[i] = count_working_days(joined, elapsed_end, locations[i])
+
+    present, half_day, leave = _attendance_counts(index, first, elapsed_end, all_employees)
+    unpaid_leave = _unpaid_leave_days(index, locations, first, last, all_employees)
+
+    if Config.PAYROLL_PRORATE_ABSENCES:
+        absent = np.clip(elapsed - present - half_day - leave, 0, None)
+    else:
+        absent = np.zeros(len(ids), dtype=np.float64)
+
+    loss_days = np.minimum(unpaid_leave + absent + 0.5 * half_day, working)
+    payable = working - loss_days
+    day_rate = np.divide(gross, working, out=np.zeros_like(gross), where=working > 0)
+    loss_of_pay = np.round(day_rate * loss_days, 2)
+
+    return {
+        employee_id: {
+            'working_days': int(w),
+            'payable_days': float(p),
+            'loss_of_pay_days': float(d),
+            'loss_of_pay': float(l)
+        }
+        for employee_id, w, p, d, l in zip(
+            ids, working.tolist(), payable.tolist(), loss_days.tolist(), loss_of_pay.tolist()
+        )
+    }
@@ -0,0 +1,80 @@
+"""In-process scheduler for recurring background work.
+
+Every web process runs one daemon thread that wakes up every
+SCHEDULER_POLL_SECONDS and runs the tasks that are due. Daily tasks run
+once per day, at or after their local "HH:MM" time. Each run is claimed
+by inserting a `scheduled_runs` document keyed by task and date, so with
+several web processes only one of them runs it. Interval tasks run in
+every process. Tasks should only queue work (e.g. submit a job), so the
+thread never blocks on a long run.
+"""
+import threading
+import time
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from database import db
+from config import Config
+
+
+class Scheduler:
+    """Runs registered daily and interval tasks on a background thread"""
+
+    def __init__(self):
+        self._daily = {}
+        self._interval = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def daily(self, name, at, func):
+        """Run func once a day at the local time `at` ("HH:MM")"""
+        hour, minute = (int(part) for part in at.split(':'))
+        self._daily[name] = (hour, minute, func)
+
+    def every(self, name, seconds, func):
+        """Run func every `seconds` seconds in this process"""
+        self._interval[name] = [seconds, func, 0]
+
+    def start(self):
+        """Start the scheduler thread; later calls are no-ops"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+                self._thread.start()
+
+    def _claim(self, name, day):
+        """Claim today's run of a daily task; False if another process has it"""
+        try:
+            db.scheduled_runs.insert_one({'_id': f'{name}:{day}', 'started_at': datetime.utcnow()})
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def run_due(self, now=None):
+        """Run every task that is due at `now` (local time)"""
+        now = now or datetime.now()
+        day = now.strftime('%Y-%m-%d')
+        for name, (hour, minute, func) in list(self._daily.items()):
+            if (now.hour, now.minute) >= (hour, minute) and self._claim(name, day):
+                self._run(name, func)
+
+        tick = time.monotonic()
+        for name, task in list(self._interval.items()):
+            seconds, func, last_run = task
+            if tick - last_run >= seconds:
+                task[2] = tick
+                self._run(name, func)
+
+    def _run(self, name, func):
+        try:
+            func()
+        except Exception as e:
+            print(f"Scheduled task {name} error: {e}")
+
+    def _loop(self):
+        while True:
+            self.run_due()
+            time.sleep(Config.SCHEDULER_POLL_SECONDS)
+
+
+# Singleton instance
+scheduler = Scheduler()
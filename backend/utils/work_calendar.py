@@ -0,0 +1,138 @@
+"""Working-day calendar (weekends and per-location public holidays).
+
+Holidays live in the `holidays` collection. For each (location, year) they
+are compiled once into a cumulative working-day array, so counting the
+working days between two dates is a couple of array lookups regardless of
+the span, which keeps leave and payroll batch calculations cheap.
+
+Compiled calendars are keyed by the `holidays` version counter, so a
+holiday edit in one process (bump_version) is picked up by every web and
+job worker process within HOLIDAY_VERSION_CHECK_INTERVAL seconds.
+"""
+from array import array
+from datetime import date, datetime, timedelta
+from database import db
+from config import Config
+from utils.cache import TTLCache
+from utils.http_cache import bump_version, get_versions
+
+# Saturday (5) and Sunday (6)
+WEEKEND_DAYS = (5, 6)
+
+# (location, year, holidays version) -> YearCalendar
+_compiled = TTLCache(ttl=Config.HOLIDAY_CACHE_TTL, max_entries=256)
+
+# Last holidays version read from the database
+_version = TTLCache(ttl=Config.HOLIDAY_VERSION_CHECK_INTERVAL, max_entries=1)
+
+
+def parse_date(value):
+    """Accept a YYYY-MM-DD string, date or datetime and return a date"""
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def iter_days(start_date, end_date):
+    """Yield every calendar date from start_date to end_date inclusive"""
+    current = parse_date(start_date)
+    end = parse_date(end_date)
+    while current <= end:
+        yield current
+        current += timedelta(days=1)
+
+
+def _location_filter(location):
+    # Holidays without a location are company-wide
+    return {'$in': [location or Config.DEFAULT_LOCATION, None]}
+
+
+def get_holidays(start_date, end_date, location=None):
+    """Set of holiday dates (YYYY-MM-DD strings) within the range for a location"""
+    start = parse_date(start_date).strftime('%Y-%m-%d')
+    end = parse_date(end_date).strftime('%Y-%m-%d')
+    return {
+        h['date'] for h in db.holidays.find(
+            {'date': {'$gte': start, '$lte': end}, 'location': _location_filter(location)},
+            {'date': 1, '_id': 0}
+        )
+    }
+
+
+class YearCalendar:
+    """Compiled working days of one year for one location.
+
+    cumulative[i] is the number of working days among the first i days of
+    the year, so the working days in any sub-range is a single subtraction.
+    """
+
+    def __init__(self, year, holidays):
+        self.year = year
+        self.start = date(year, 1, 1)
+        length = (date(year + 1, 1, 1) - self.start).days
+        self.cumulative = array('H', [0]) * (length + 1)
+        day = self.start
+        for i in range(length):
+            working = day.weekday() not in WEEKEND_DAYS and day.strftime('%Y-%m-%d') not in holidays
+            self.cumulative[i + 1] = self.cumulative[i] + (1 if working else 0)
+            day += timedelta(days=1)
+
+    def index(self, day):
+        return (day - self.start).days
+
+    def is_working_day(self, day):
+        i = self.index(day)
+        return self.cumulative[i + 1] > self.cumulative[i]
+
+    def count(self, first, last):
+        """Working days from first to last inclusive (both within this year)"""
+        return self.cumulative[self.index(last) + 1] - self.cumulative[self.index(first)]
+
+
+def holidays_version():
+    """Current holidays version, re-read at most every HOLIDAY_VERSION_CHECK_INTERVAL seconds"""
+    return _version.get_or_set('holidays', lambda: get_versions(['holidays'])[0])
+
+
+def get_year_calendar(year, location=None):
+    """Compiled calendar for a year and location (cached in process per holidays version)"""
+    location = location or Config.DEFAULT_LOCATION
+    return _compiled.get_or_set(
+        (location, year, holidays_version()),
+        lambda: YearCalendar(year, get_holidays(date(year, 1, 1), date(year, 12, 31), location))
+    )
+
+
+def invalidate_calendars():
+    """Publish a holidays change to every process and drop this process's calendars"""
+    bump_version('holidays')
+    _version.clear()
+    _compiled.clear()
+
+
+def is_working_day(day, location=None):
+    """Whether a date is neither a weekend nor a holiday"""
+    day = parse_date(day)
+    return get_year_calendar(day.year, location).is_working_day(day)
+
+
+def count_working_days(start_date, end_date, location=None):
+    """Working days from start_date to end_date inclusive"""
+    first = parse_date(start_date)
+    last = parse_date(end_date)
+    if last < first:
+        return 0
+    total = 0
+    for year in range(first.year, last.year + 1):
+        calendar = get_year_calendar(year, location)
+        total += calendar.count(max(first, date(year, 1, 1)), min(last, date(year, 12, 31)))
+    return total
+
+
+def iter_working_days(start_date, end_date, location=None):
+    """Yield YYYY-MM-DD strings for working days, skipping weekends and holidays"""
+    for day in iter_days(start_date, end_date):
+        if get_year_calendar(day.year, location).is_working_day(day):
+            yield day.strftime('%Y-%m-%d')
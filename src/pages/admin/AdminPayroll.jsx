@@ -6,6 +6,9 @@ import api from '../../services/api';
 
 const AdminPayroll = () => {
   const [employees, setEmployees] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [selectedEmployee, setSelectedEmployee] = useState(null);
@@ -19,6 +22,7 @@ const AdminPayroll = () => {
 
   useEffect(() => {
     fetchEmployees();
+    fetchSummary();
   }, []);
 
   useEffect(() => {
@@ -33,12 +37,35 @@ const AdminPayroll = () => {
     try {
       const response = await api.getPayrollEmployees(searchTerm);
       setEmployees(response.employees || []);
+      setNextCursor(response.next_cursor || null);
     } catch (err) {
       console.error('Failed to fetch employees:', err);
     }
     setLoading(false);
   };
 
+  const loadMoreEmployees = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.getPayrollEmployees(searchTerm, nextCursor);
+      setEmployees((prev) => [...prev, ...(response.employees || [])]);
+      setNextCursor(response.next_cursor || null);
+    } catch (err) {
+      console.error('Failed to load more employees:', err);
+    }
+    setLoadingMore(false);
+  };
+
+  const fetchSummary = async () => {
+    try {
+      const response = await api.getPayrollSummary();
+      setSummary(response.salary || null);
+    } catch (err) {
+      console.error('Failed to fetch payroll summary:', err);
+    }
+  };
+
   const handleEditSalary = (employee) => {
     setSelectedEmployee(employee);
     setSalaryData({
@@ -58,6 +85,7 @@ const AdminPayroll = () => {
       await api.updateEmployeeSalary(selectedEmployee.employee_id, salaryData);
       setMessage({ type: 'success', text: 'Salary updated successfully' });
       fetchEmployees();
+      fetchSummary();
       setTimeout(() => {
         setShowSalaryModal(false);
         setMessage({ type: '', text: '' });
@@ -131,14 +159,14 @@ const AdminPayroll = () => {
         <Card className="bg-gradient-to-br from-blue-500 to-blue-600 text-white">
           <div className="p-2">
             <p className="text-blue-100 text-sm">Total Employees</p>
-            <p className="text-3xl font-bold mt-1">{employees.length}</p>
+            <p className="text-3xl font-bold mt-1">{summary?.employees ?? 0}</p>
           </div>
         </Card>
         <Card className="bg-gradient-to-br from-green-500 to-green-600 text-white">
           <div className="p-2">
             <p className="text-green-100 text-sm">Salary Configured</p>
             <p className="text-3xl font-bold mt-1">
-              {employees.filter(e => e.salary?.net > 0).length}
+              {summary?.configured ?? 0}
             </p>
           </div>
         </Card>
@@ -146,7 +174,7 @@ const AdminPayroll = () => {
           <div className="p-2">
             <p className="text-yellow-100 text-sm">Pending Configuration</p>
             <p className="text-3xl font-bold mt-1">
-              {employees.filter(e => !e.salary?.net).length}
+              {summary?.pending_configuration ?? 0}
             </p>
           </div>
         </Card>
@@ -154,7 +182,7 @@ const AdminPayroll = () => {
           <div className="p-2">
             <p className="text-purple-100 text-sm">Total Monthly Payroll</p>
             <p className="text-2xl font-bold mt-1">
-              {formatCurrency(employees.reduce((sum, e) => sum + (e.salary?.net || 0), 0))}
+              {formatCurrency(summary?.total_net || 0)}
             </p>
           </div>
         </Card>
@@ -272,6 +300,17 @@ const AdminPayroll = () => {
             </tbody>
           </table>
         </div>
+        {nextCursor && (
+          <div className="px-6 py-4 border-t border-gray-200 text-center">
+            <button
+              onClick={loadMoreEmployees}
+              disabled={loadingMore}
+              className="px-4 py-2 text-sm font-medium text-blue-600 hover:text-blue-800 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              {loadingMore ? 'Loading...' : 'Load more employees'}
+            </button>
+          </div>
+        )}
       </Card>
 
       {/* Edit Salary Modal */}
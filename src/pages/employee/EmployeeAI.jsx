@@ -38,16 +38,21 @@ const EmployeeAI = () => {
     setLoading(true);
 
     try {
-      const response = await api.aiChat(userQuery);
-      
-      const aiMessage = {
-        id: messages.length + 2,
-        type: 'ai',
-        content: response.response || 'I apologize, but I couldn\'t process your request. Please try again.',
-      };
-      setMessages((prev) => [...prev, aiMessage]);
+      // Show the reply as it streams in
+      const aiMessageId = messages.length + 2;
+      setMessages((prev) => [...prev, { id: aiMessageId, type: 'ai', content: '' }]);
+
+      const content = await api.aiChatStream(userQuery, (delta) => {
+        setMessages((prev) => prev.map((m) => (m.id === aiMessageId ? { ...m, content: m.content + delta } : m)));
+      });
+
+      if (!content) {
+        setMessages((prev) => prev.map((m) => (m.id === aiMessageId ? { ...m, content: 'I apologize, but I couldn\'t process your request. Please try again.' } : m)));
+      }
     } catch (error) {
       console.error('AI chat error:', error);
+      // Drop the streaming placeholder before showing the error
+      setMessages((prev) => prev.filter((m) => m.id !== messages.length + 2));
       const errorMessage = {
         id: messages.length + 2,
         type: 'ai',
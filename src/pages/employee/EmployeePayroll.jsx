@@ -29,6 +29,21 @@ const EmployeePayroll = () => {
     setLoading(false);
   };
 
+  const handleDownloadPdf = async (payslip) => {
+    try {
+      const blob = await api.downloadPayslipPdf(payslip.id);
+      const url = URL.createObjectURL(blob);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `payslip_${payslip.month_year}.pdf`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      setError('Failed to download payslip');
+      console.error(err);
+    }
+  };
+
   const formatCurrency = (amount) => {
     return new Intl.NumberFormat('en-IN', {
       style: 'currency',
@@ -283,7 +298,13 @@ const EmployeePayroll = () => {
                 </div>
               </div>
 
-              <div className="mt-6 flex justify-end">
+              <div className="mt-6 flex justify-end space-x-3">
+                <button
+                  onClick={() => handleDownloadPdf(selectedPayslip)}
+                  className="px-4 py-2 bg-blue-600 text-white rounded-md hover:bg-blue-700"
+                >
+                  Download PDF
+                </button>
                 <button
                   onClick={() => setSelectedPayslip(null)}
                   className="px-4 py-2 bg-gray-100 text-gray-700 rounded-md hover:bg-gray-200"
@@ -36,10 +36,20 @@ const ManagerTimesheets = () => {
     setLoading(false);
   };
 
-  const handleReview = (timesheet) => {
+  const handleReview = async (timesheet) => {
     setSelectedTimesheet(timesheet);
     setComments('');
     setShowModal(true);
+
+    // List responses are summaries; load the attendance records on demand
+    try {
+      const detail = await api.getTimesheetDetail(timesheet.id);
+      setSelectedTimesheet((current) =>
+        current && current.id === timesheet.id ? { ...current, ...detail } : current
+      );
+    } catch (err) {
+      console.error(err);
+    }
   };
 
   const handleAction = async (action) => {
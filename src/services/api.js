@@ -231,6 +231,10 @@ class ApiService {
     return this.request(url);
   }
 
+  async getTimesheetDetail(timesheetId) {
+    return this.request(`/timesheet/manager/timesheet/${timesheetId}`);
+  }
+
   async reviewTimesheet(employeeId, weekStart, action, comments = '') {
     return this.request('/timesheet/manager/review', {
       method: 'POST',
@@ -424,12 +428,25 @@ class ApiService {
     return this.request(`/payroll/my-payslips?limit=${limit}`);
   }
 
-  async getPayrollEmployees(search = '') {
-    let url = '/payroll/admin/employees';
-    if (search) {
-      url += `?search=${encodeURIComponent(search)}`;
+  async downloadPayslipPdf(payslipId) {
+    const response = await fetch(`${this.baseUrl}/payroll/payslip/${payslipId}/pdf`, {
+      headers: { 'Authorization': `Bearer ${this.getToken()}` },
+    });
+    if (!response.ok) {
+      throw new Error('Failed to download payslip');
     }
-    return this.request(url);
+    return response.blob();
+  }
+
+  async getPayrollEmployees(search = '', cursor = null, limit = 100) {
+    const params = new URLSearchParams({ limit });
+    if (search) params.append('search', search);
+    if (cursor) params.append('cursor', cursor);
+    return this.request(`/payroll/admin/employees?${params.toString()}`);
+  }
+
+  async getPayrollSummary(months = 6) {
+    return this.request(`/payroll/admin/summary?months=${months}`);
   }
 
   async generatePayslip(employeeId, monthYear) {
@@ -464,6 +481,48 @@ class ApiService {
     });
   }
 
+  // Streams the reply as Server-Sent Events; onDelta receives each text chunk
+  async aiChatStream(message, onDelta) {
+    const response = await fetch(`${this.baseUrl}/ai/chat/stream`, {
+      method: 'POST',
+      headers: this.getHeaders(),
+      body: JSON.stringify({ message }),
+    });
+
+    if (!response.ok) {
+      const data = await response.json();
+      throw new Error(data.error || 'An error occurred');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let content = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const event of events) {
+        const lines = event.split('\n');
+        const name = lines.find((line) => line.startsWith('event: '))?.slice(7);
+        const data = JSON.parse(lines.find((line) => line.startsWith('data: '))?.slice(6) || '{}');
+        if (name === 'error') {
+          throw new Error(data.error || 'The response was interrupted');
+        }
+        if (data.delta) {
+          content += data.delta;
+          onDelta(data.delta);
+        }
+      }
+    }
+
+    return content;
+  }
+
   async generateAIInsights(type = 'general') {
     return this.request('/ai/insights', {
       method: 'POST',